@@ -1,26 +1,97 @@
-from typing import List, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Tuple, Sequence
 import math
-# from bisect import bisect_left
-from binary_search import bisect_left
 
-from trip import Walk, Bus
+import numpy as np
+
+from trip import Walk
+from unpacking import UnpackingTable
+
+EMPTY = array('i')
+
+
+def int_array(values: Sequence[int]) -> array:
+    """
+    Pack integer values into compact int32 array.
+    Empty arrays are shared between ATFs, arrays of ATF are never changed in place
+    :param values: Sequence[int] list, numpy array or array.array of integers
+    :return:
+    """
+    if not len(values):
+        return EMPTY
+    if isinstance(values, array) and values.typecode == 'i':
+        return values
+    if isinstance(values, np.ndarray):
+        packed = array('i')
+        packed.frombytes(memoryview(np.ascontiguousarray(values, dtype=np.int32)).cast('B'))
+        return packed
+    return array('i', values)
+
+
+def cut_mask(d: np.ndarray, a: np.ndarray, max_duration=None, edges: np.ndarray = None) -> np.ndarray:
+    """
+    Vectorized filter of dominated connections, the same as ATF.cut.
+    Connection is kept if it arrives strictly before all later connections (reverse running minimum of arrivals),
+    it is the first kept connection with its departure time and it is not slower than the walk
+    :param d: np.ndarray Departure times sorted inside of every edge
+    :param a: np.ndarray Arrival times
+    :param max_duration: Walk duration: scalar, array per connection (np.inf for edges without walk) or None
+    :param edges: np.ndarray Non-decreasing indexes of edges of connections, if connections of many edges
+                  are filtered at once
+    :return: Boolean mask of connections to keep
+    """
+    if not len(d):
+        return np.zeros(0, dtype=bool)
+    d = np.asarray(d, dtype=np.int64)
+    a = np.asarray(a, dtype=np.int64)
+    if edges is not None:
+        # edges are moved apart in time, so running minimum and equal departures never cross them
+        shift = (int(max(a.max(), d.max())) - int(min(a.min(), d.min())) + 1) * np.asarray(edges, dtype=np.int64)
+        d = d + shift
+        a = a + shift
+    later = np.minimum.accumulate(a[::-1])[::-1]
+    mask = np.ones(len(a), dtype=bool)
+    mask[:-1] = a[:-1] < later[1:]
+    kept = np.flatnonzero(mask)
+    mask[kept[1:][d[kept[1:]] == d[kept[:-1]]]] = False
+    if max_duration is not None:
+        mask &= a - d <= max_duration
+    return mask
 
 
 class ATF:
-    __slots__ = "walk", 'buses', 'size'
+    __slots__ = "walk", 'd', 'a', 'p', 'size'
 
-    def __init__(self, walk: Walk = None, buses: List[Bus] = None):
+    def __init__(self, walk: Walk = None, d: Sequence[int] = (), a: Sequence[int] = (), p: Sequence[int] = ()):
         """
         Arrival Time Function.
         More detailed you can find
          by link: https://oliviermarty.net/docs/olivier_marty_contraction_hierarchies_rapport.pdf
+        Connections are stored column-wise: departures and arrivals are int32 arrays sorted by departure,
+        with times relative to the service day start (TransportGraph.time_origin)
         :param walk: Walk profile between nodes
-        :param buses: List[Bus] , List of Buses between 2 nodes
+        :param d: Sequence[int] Departure times of connections
+        :param a: Sequence[int] Arrival times of connections
+        :param p: Sequence[int] Payloads of connections in UnpackingTable
         """
 
         self.walk = walk
-        self.buses = buses
-        self.size = len(buses)
+        self.d = int_array(d)
+        self.a = int_array(a)
+        self.p = int_array(p)
+        self.size = len(self.d)
+
+    def _take(self, indexes: np.ndarray):
+        """
+        Keep only connections with given indexes
+        :param indexes: np.ndarray Sorted indexes of connections to keep
+        :return:
+        """
+        self.d = int_array(np.frombuffer(self.d, dtype=np.int32)[indexes])
+        self.a = int_array(np.frombuffer(self.a, dtype=np.int32)[indexes])
+        self.p = int_array(np.frombuffer(self.p, dtype=np.int32)[indexes])
+        self.size = len(self.d)
 
     def cut(self):
         """
@@ -29,144 +100,146 @@ class ATF:
          by link: https://oliviermarty.net/docs/olivier_marty_contraction_hierarchies_rapport.pdf
         :return:
         """
-        r = list()
-        i = 0
-        while i < self.size:
-            if r:
-                d, a = r[-1].d, r[-1].a
-                if self.buses[i].a > a:
-                    if d < self.buses[i].d:
-                        if self.walk:
-                            if self.buses[i].a - self.buses[i].d <= self.walk.w:
-                                r.append(self.buses[i])
-                        else:
-                            r.append(self.buses[i])
-                    i += 1
-                else:
-                    r.pop()
-            else:
-                if self.walk:
-                    if self.buses[i].a - self.buses[i].d <= self.walk.w:
-                        r += [self.buses[i]]
-                else:
-                    r += [self.buses[i]]
-                i += 1
-        self.buses = r
-        self.size = len(r)
+        if self.size:
+            indexes = np.flatnonzero(cut_mask(np.frombuffer(self.d, dtype=np.int32),
+                                              np.frombuffer(self.a, dtype=np.int32),
+                                              self.walk.w if self.walk else None))
+            if len(indexes) < self.size:
+                self._take(indexes)
 
-    def composition(self, f):
+    def composition(self, f, node: int, table: UnpackingTable):
         """
-        Composition of 2 ATF's functions
+        Composition of 2 ATF's functions.
+        Candidates (connection of f followed by connection or walk of self, walk of f followed by connection of self)
+        are produced already sorted by departure, so they are merged in one sweep and filtered on the fly
+        by the same stack as in cut(). Both functions have to be cut before.
+        New connections are added to the unpacking table as shortcuts over node, only for connections left after cut
         :param f: ATF function
+        :param node: int Node between f and self
+        :param table: UnpackingTable Unpacking table of the graph
         :return: self(f)
         """
-        cc, cw, wc = [], [], []
-
-        walk = None
-        if self.walk and f.walk:
-            w = self.walk.w + f.walk.w
-            w_nodes = f.walk.nodes + self.walk.nodes[1:]
-            walk = Walk(nodes=w_nodes, w=w)
+        fd, fa, fp, f_size = f.d.tolist(), f.a.tolist(), f.p.tolist(), f.size
+        d, a, p, size = self.d.tolist(), self.a.tolist(), self.p.tolist(), self.size
+        w = self.walk.w if self.walk else None
+        fw = f.walk.w if f.walk else None
+        max_duration = w + fw if self.walk and f.walk else None
 
+        rd, ra, rf, rg = [], [], [], []
         i = 0
-        j = 0
-        while i < f.size and j < self.size:
-            if i + 1 < f.size and f.buses[i + 1].a <= self.buses[j].d:
-                if self.walk:
-                    new_a = f.buses[i].a + self.walk.w
-                    if new_a < self.buses[j].a:
-                        cw_c = (f.buses[i].d, new_a)
-                        cw_nodes = f.buses[i].nodes + self.walk.nodes[1:]
-                        cw_route_names = f.buses[i].route_names + self.walk.route_names
-                        bus = Bus(nodes=cw_nodes, c=cw_c, route_names=cw_route_names)
-                        cw.append(bus)
-
-                i += 1
-            elif f.buses[i].a <= self.buses[j].d:
-                big_path = True
-
-                if self.walk:
-                    new_a = f.buses[i].a + self.walk.w
-                    if new_a < self.buses[j].a:
-                        cw_c = (f.buses[i].d, new_a)
-                        cw_nodes = f.buses[i].nodes + self.walk.nodes[1:]
-                        cw_route_names = f.buses[i].route_names + self.walk.route_names
-                        bus = Bus(nodes=cw_nodes, c=cw_c, route_names=cw_route_names)
-                        cw.append(bus)
-                        big_path = False
-
-                if f.walk:
-                    new_d = self.buses[j].d - f.walk.w
-                    wc_c = (new_d, self.buses[j].a)
-                    wc_nodes = f.walk.nodes + self.buses[j].nodes[1:]
-                    wc_route_names = f.walk.route_names + self.buses[j].route_names
-                    bus = Bus(nodes=wc_nodes, c=wc_c, route_names=wc_route_names)
-                    wc.append(bus)
-
-                if big_path:
-                    cc_c = (f.buses[i].d, self.buses[j].a)
-                    cc_nodes = f.buses[i].nodes + self.buses[j].nodes[1:]
-                    cc_route_names = f.buses[i].route_names + self.buses[j].route_names
-                    bus = Bus(nodes=cc_nodes, c=cc_c, route_names=cc_route_names)
-                    cc.append(bus)
+        k = 0
+        j = 0 if f.walk else size
+        while i < f_size or j < size:
+            if i < f_size and (j == size or fd[i] <= d[j] - fw):
+                # connection i of f followed by the first catchable connection k of self or by walk
+                arrival = fa[i]
+                while k < size and d[k] < arrival:
+                    k += 1
+                cd = fd[i]
+                cf = fp[i]
+                if w is not None and (k == size or arrival + w < a[k]):
+                    ca = arrival + w
+                    cg = self.walk.payload
+                elif k < size and (i + 1 == f_size or fa[i + 1] > d[k]):
+                    ca = a[k]
+                    cg = p[k]
+                else:
+                    i += 1
+                    continue
                 i += 1
-                j += 1
             else:
-                if f.walk:
-                    wc_c = (self.buses[j].d - f.walk.w, self.buses[j].a)
-                    wc_nodes = f.walk.nodes + self.buses[j].nodes[1:]
-                    wc_route_names = f.walk.route_names + self.buses[j].route_names
-                    bus = Bus(nodes=wc_nodes, c=wc_c, route_names=wc_route_names)
-                    wc.append(bus)
+                # walk of f followed by connection j of self
+                cd = d[j] - fw
+                ca = a[j]
+                cf = f.walk.payload
+                cg = p[j]
                 j += 1
 
-        for s in range(i, f.size):
-            if self.walk:
-                cw_c = (f.buses[s].d, f.buses[s].a + self.walk.w)
-                cw_nodes = f.buses[s].nodes + self.walk.nodes[1:]
-                cw_route_names = f.buses[s].route_names + self.walk.route_names
-                bus = Bus(nodes=cw_nodes, c=cw_c, route_names=cw_route_names)
-                cw.append(bus)
-
-        for s in range(j, self.size):
-            if f.walk:
-                wc_c = (self.buses[s].d - f.walk.w, self.buses[s].a)
-                wc_nodes = f.walk.nodes + self.buses[s].nodes[1:]
-                wc_route_names = f.walk.route_names + self.buses[s].route_names
-                bus = Bus(nodes=wc_nodes, c=wc_c, route_names=wc_route_names)
-                wc.append(bus)
-
-        c = cc + cw + wc
-        c.sort()
-        if walk or c:
-            g = ATF(walk=walk, buses=c)
-            g.cut()
-            return g
-
-    def arrival(self, t: int) -> Tuple[int, List[int], List[str]]:
+            while ra and ca <= ra[-1]:
+                rd.pop()
+                ra.pop()
+                rf.pop()
+                rg.pop()
+            if rd and rd[-1] >= cd:
+                continue
+            if max_duration is None or ca - cd <= max_duration:
+                rd.append(cd)
+                ra.append(ca)
+                rf.append(cf)
+                rg.append(cg)
+
+        walk = None
+        if max_duration is not None:
+            walk = Walk(w=max_duration, payload=table.shortcut(node, f.walk.payload, self.walk.payload))
+        if walk or rd:
+            return ATF(walk=walk, d=rd, a=ra, p=table.shortcuts(node, rf, rg))
+
+    def restricted(self, departure: int, arrival: float) -> 'ATF':
+        """
+        Function restricted to connections departing not before departure and arriving not after arrival.
+        Connections are sorted by both departure and arrival, so they form a contiguous slice
+        :param departure: int Earliest departure
+        :param arrival: float Latest arrival
+        :return: self, if nothing is dropped, None, if nothing is left
+        """
+        lo = bisect_left(self.d, departure)
+        hi = bisect_right(self.a, arrival, lo) if arrival != math.inf else self.size
+        walk = self.walk if self.walk and departure + self.walk.w <= arrival else None
+        if lo == 0 and hi == self.size and walk is self.walk:
+            return self
+        if walk or lo < hi:
+            return ATF(walk=walk, d=self.d[lo:hi], a=self.a[lo:hi], p=self.p[lo:hi])
+
+    def bounds(self) -> Tuple[float, float]:
+        """
+        Time independent bounds of travel time over the edge.
+        Upper bound is finite only with walk, as there is no connection after the last departure
+        :return: (lower bound, upper bound) in seconds
+        """
+        lower = upper = self.walk.w if self.walk else math.inf
+        if self.size:
+            durations = np.frombuffer(self.a, dtype=np.int32) - np.frombuffer(self.d, dtype=np.int32)
+            lower = min(lower, int(durations.min()))
+        return lower, upper
+
+    def arrival(self, t: int) -> Tuple[int, int]:
         """
         Calculate arrival time to next station
         :param t: start_time
-        :return:
+        :return: (arrival time, payload of used connection)
         """
         l = math.inf
-        sequence_nodes = []
-        route_names = []
-        start_index = bisect_left(self.buses, t, key=lambda x: x.d, lo=0, hi=self.size)
+        payload = None
+        start_index = bisect_left(self.d, t)
         if start_index < self.size:
-            l = self.buses[start_index].a
-            sequence_nodes = self.buses[start_index].nodes
-            route_names = self.buses[start_index].route_names
+            l = self.a[start_index]
+            payload = self.p[start_index]
         if self.walk:
             walk_time = t + self.walk.w
             if walk_time < l:
-                return walk_time, self.walk.nodes, self.walk.route_names
-        return l, sequence_nodes, route_names
+                return walk_time, self.walk.payload
+        return l, payload
+
+    def arrivals(self, t: np.ndarray) -> np.ndarray:
+        """
+        Calculate arrival times to next station for many start times at once, as arrival() without payloads
+        :param t: np.ndarray Start times, np.inf for start times, which are not reached
+        :return: np.ndarray Arrival times, np.inf if there is no connection
+        """
+        result = np.full(len(t), np.inf)
+        if self.size:
+            index = np.searchsorted(np.frombuffer(self.d, dtype=np.int32), t)
+            caught = index < self.size
+            result[caught] = np.frombuffer(self.a, dtype=np.int32)[index[caught]]
+        if self.walk:
+            np.minimum(result, t + self.walk.w, out=result)
+        return result
 
 
 def min_atf(f1: ATF, f2: ATF) -> ATF:
     """
     Minimum of 2 ATF function.
+    Both functions are sorted by departure, so they are merged in linear time.
     Description could be found by link :
     https://oliviermarty.net/docs/olivier_marty_contraction_hierarchies_rapport.pdf
     :param f1:
@@ -183,8 +256,29 @@ def min_atf(f1: ATF, f2: ATF) -> ATF:
     else:
         walk = f2.walk
 
-    buses = f1.buses + f2.buses
-    buses.sort()
-    g = ATF(walk=walk, buses=buses)
-    g.cut()
-    return g
+    d1, a1, p1, size1 = f1.d.tolist(), f1.a.tolist(), f1.p.tolist(), f1.size
+    d2, a2, p2, size2 = f2.d.tolist(), f2.a.tolist(), f2.p.tolist(), f2.size
+    max_duration = walk.w if walk else None
+
+    # merge of connections sorted by departure, dominated connections are dropped by the stack as in cut()
+    rd, ra, rp = [], [], []
+    i = 0
+    j = 0
+    while i < size1 or j < size2:
+        if i < size1 and (j == size2 or d1[i] <= d2[j]):
+            cd, ca, cp = d1[i], a1[i], p1[i]
+            i += 1
+        else:
+            cd, ca, cp = d2[j], a2[j], p2[j]
+            j += 1
+        while ra and ca <= ra[-1]:
+            rd.pop()
+            ra.pop()
+            rp.pop()
+        if rd and rd[-1] >= cd:
+            continue
+        if max_duration is None or ca - cd <= max_duration:
+            rd.append(cd)
+            ra.append(ca)
+            rp.append(cp)
+    return ATF(walk=walk, d=rd, a=ra, p=rp)
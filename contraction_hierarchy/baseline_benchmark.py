@@ -0,0 +1,159 @@
+"""
+Measurements of the code before the columnar ATF (ATF over lists of Bus objects) for benchmark.py.
+The module is run in a separate process from the contraction_hierarchy folder of the baseline checkout,
+with this folder in PYTHONPATH, so atf, trip and graph are imported from the checkout:
+
+    cd <baseline>/contraction_hierarchy
+    PYTHONPATH=<this folder> python -m baseline_benchmark
+
+Name of the measurement and its arguments are read by pickle from stdin, result is written by pickle to stdout.
+Arguments and results are plain python objects, so they do not depend on classes of either version.
+Baseline modules are imported inside of the measurements, so the module could be imported and checked in this tree
+"""
+import pickle
+import sys
+import time
+import tracemalloc
+from typing import Callable, Tuple, Any, List, Union, Dict
+
+import pandas as pd
+
+
+def _atf(nodes: List[int], walk: Union[int, None], d: List[int], a: List[int], routes: List[str]):
+    """
+    ATF of the baseline over list of Bus objects
+    :param nodes: [start_node, end_node]
+    :param walk: int Walk duration or None
+    :param d: List[int] Departures
+    :param a: List[int] Arrivals
+    :param routes: List[str] Route names of connections
+    :return:
+    """
+    from atf import ATF
+    from trip import Bus, Walk
+
+    walk = Walk(nodes=nodes, w=walk) if walk else None
+    return ATF(walk=walk, buses=[Bus(nodes=nodes, c=c, route_names=[route]) for c, route in zip(zip(d, a), routes)])
+
+
+def _columns(f) -> Tuple[List[int], List[int], Union[int, None]]:
+    """
+    Departures, arrivals and walk duration of ATF of the baseline
+    :param f: ATF
+    :return:
+    """
+    return [bus.d for bus in f.buses], [bus.a for bus in f.buses], f.walk and f.walk.w
+
+
+def _best(function: Callable, repeat: int) -> Tuple[Any, float]:
+    """
+    Result and the best duration in seconds of several runs
+    :param function: Callable Function without arguments
+    :param repeat: int Count of runs
+    :return:
+    """
+    duration = float('inf')
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        duration = min(duration, time.perf_counter() - start_time)
+    return result, duration
+
+
+def loading(transport_path: str, walk_path: str, repeat: int) -> Tuple[float, float]:
+    """
+    Graph construction from the data frames
+    :param transport_path: str Path to network_temporal_day.csv
+    :param walk_path: str Path to network_walk.csv
+    :param repeat: int Count of runs
+    :return: (the best duration in seconds, the least peak memory in MB)
+    """
+    from graph import TransportGraph
+
+    def load():
+        transport_connections = pd.read_csv(transport_path, sep=';')
+        walk_connections = pd.read_csv(walk_path, sep=';')
+        walk_connections_invert = walk_connections.rename(columns={'from_stop_I': 'to_stop_I',
+                                                                   'to_stop_I': 'from_stop_I'})
+        return TransportGraph(transport_connections, pd.concat((walk_connections, walk_connections_invert)))
+
+    runs = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        load()
+        duration = time.perf_counter() - start_time
+        tracemalloc.start()
+        load()
+        runs.append((duration, tracemalloc.get_traced_memory()[1] / 2 ** 20))
+        tracemalloc.stop()
+    return min(x[0] for x in runs), min(x[1] for x in runs)
+
+
+def arrivals(edges: List[Tuple], sample: List[Tuple[int, int]]) -> Tuple[float, float, List[int]]:
+    """
+    Memory of functions of the edges and arrival() calls
+    :param edges: List[Tuple] Arguments of _atf for every edge
+    :param sample: List[Tuple[int, int]] (index of the edge, departure time) for every arrival() call
+    :return: (peak memory in MB, duration in seconds, arrival times)
+    """
+    tracemalloc.start()
+    functions = [_atf(*edge) for edge in edges]
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    start_time = time.perf_counter()
+    result = [functions[i].arrival(t)[0] for i, t in sample]
+    return peak, time.perf_counter() - start_time, result
+
+
+def composition(pairs: List[Tuple[Tuple, Tuple]], repeat: int) -> Tuple[float, List]:
+    """
+    Composition g(f) of pairs of adjacent edges
+    :param pairs: List[Tuple[Tuple, Tuple]] Arguments of _atf for f and g
+    :param repeat: int Count of runs
+    :return: (the best duration in seconds, columns of every composition or None)
+    """
+    functions = [(_atf(*f), _atf(*g)) for f, g in pairs]
+    result, duration = _best(lambda: [g.composition(f) for f, g in functions], repeat)
+    return duration, [h and _columns(h) for h in result]
+
+
+def cut(uncut: List[Tuple], merges: List[Tuple[Tuple, Tuple]], repeat: int) -> Tuple[float, List, float, List]:
+    """
+    cut() of every edge and min_atf of shortcuts with existing edges
+    :param uncut: List[Tuple] Arguments of _atf for edges with all connections
+    :param merges: List[Tuple[Tuple, Tuple]] Arguments of _atf for shortcuts and existing edges
+    :param repeat: int Count of runs
+    :return: (duration of cut, columns after cut, duration of min_atf, columns of minimums)
+    """
+    from atf import min_atf
+
+    def cut_all():
+        functions = [_atf(*edge) for edge in uncut]
+        for f in functions:
+            f.cut()
+        return functions
+
+    functions, cut_duration = _best(cut_all, repeat)
+    pairs = [(_atf(*f), _atf(*h)) for f, h in merges]
+    merged, min_atf_duration = _best(lambda: [min_atf(f, h) for f, h in pairs], repeat)
+    return cut_duration, [_columns(f) for f in functions], min_atf_duration, [_columns(f) for f in merged]
+
+
+MEASUREMENTS: Dict[str, Callable] = {
+    'loading': loading,
+    'arrivals': arrivals,
+    'composition': composition,
+    'cut': cut,
+}
+
+
+def main():
+    # prints of the baseline code go to stderr, stdout keeps only the pickled result
+    output, sys.stdout = sys.stdout.buffer, sys.stderr
+    name, arguments = pickle.load(sys.stdin.buffer)
+    pickle.dump(MEASUREMENTS[name](**arguments), output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from typing import Union, Dict, List, Tuple, Any, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from graph import TransportGraph
+from dijkstra import Dijkstra
+from forward_search import FCH
+from bidirectional_search import TCH
+from storage import load_graph
+
+QUERY_COLUMNS = ['start_time', 'start_node', 'end_node']
+ALGORITHMS = {'dijkstra': Dijkstra, 'fch': FCH, 'tch': TCH}
+
+# graph and search of the worker process, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(graph: Union[TransportGraph, str], algorithm: str, kwargs: Dict[str, Any]):
+    """
+    Keep graph and search of the worker process.
+    Forked workers get the graph of the parent process without copying, path of the graph file is opened
+    in every worker through memory map, so pages of the file are shared between workers
+    :param graph: TransportGraph or path of the contracted graph file
+    :param algorithm: str Name of the search in ALGORITHMS
+    :param kwargs: Parameters of shortest_path
+    :return:
+    """
+    _worker['graph'] = load_graph(graph) if isinstance(graph, str) else graph
+    _worker['search'] = ALGORITHMS[algorithm]
+    _worker['kwargs'] = kwargs
+
+
+def _run_queries(chunk: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Run chunk of queries in the worker process
+    :param chunk: (start times, start nodes, end nodes)
+    :return: Results of shortest_path in order of queries
+    """
+    graph, search, kwargs = _worker['graph'], _worker['search'], _worker['kwargs']
+    return [search(graph, start_time, start_node, end_node).shortest_path(**kwargs)
+            for start_time, start_node, end_node in zip(*(column.tolist() for column in chunk))]
+
+
+Queries = Union[pd.DataFrame, Sequence[Sequence[int]]]
+
+
+def _query_columns(queries: Queries) -> List[np.ndarray]:
+    """
+    :param queries: pd.DataFrame with QUERY_COLUMNS or sequence of rows (start_time, start_node, end_node)
+    :return: [start times, start nodes, end nodes]
+    """
+    if isinstance(queries, pd.DataFrame):
+        missing = [column for column in QUERY_COLUMNS if column not in queries.columns]
+        if missing:
+            raise ValueError(f'Queries have no columns: {", ".join(missing)}')
+        return [queries[column].to_numpy(dtype=np.int64) for column in QUERY_COLUMNS]
+    rows = np.asarray(queries, dtype=np.int64)
+    if not rows.size:
+        rows = rows.reshape(0, len(QUERY_COLUMNS))
+    if rows.ndim != 2 or rows.shape[1] != len(QUERY_COLUMNS):
+        raise ValueError(f'Query rows should have 3 values: {", ".join(QUERY_COLUMNS)}')
+    return list(rows.T)
+
+
+def batch_shortest_paths(graph: Union[TransportGraph, str], queries: Queries,
+                         algorithm: str = 'tch', processes: int = None, chunksize: int = 256, **kwargs
+                         ) -> Iterator[Dict[str, Any]]:
+    """
+    Run many shortest path queries in the process pool.
+    Queries are sent to workers in chunks and results are yielded in order of queries, as soon as they are ready.
+    Only a few chunks per worker are in flight, so memory does not grow with the count of queries
+    :param graph: TransportGraph for Dijkstra, ContactionTransportGraph or path of the contracted graph file
+    :param queries: pd.DataFrame with columns start_time, start_node, end_node
+                    or sequence of rows (start_time, start_node, end_node)
+    :param algorithm: str 'dijkstra', 'fch' or 'tch'
+    :param processes: int Count of worker processes, 0 to run queries in the current process, None for cpu count
+    :param chunksize: int Count of queries sent to the worker at once
+    :param kwargs: Parameters of shortest_path
+    :return: Results of shortest_path with duration of every query in milliseconds
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f'Unknown algorithm {algorithm}, expected one of {", ".join(ALGORITHMS)}')
+    columns = _query_columns(queries)
+    if algorithm == 'tch' and not isinstance(graph, str) and not graph.travel_time_bounds:
+        # bounds are calculated once before fork instead of once per worker
+        graph.travel_time_bounds_precomputation()
+    chunks = (tuple(column[start:start + chunksize] for column in columns)
+              for start in range(0, len(columns[0]), chunksize))
+
+    if processes == 0:
+        _init_worker(graph, algorithm, kwargs)
+        for chunk in chunks:
+            yield from _run_queries(chunk)
+        return
+
+    processes = processes or os.cpu_count()
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_worker,
+                             initargs=(graph, algorithm, kwargs)) as executor:
+        in_flight = 4 * processes
+        futures = deque()
+        for chunk in chunks:
+            futures.append(executor.submit(_run_queries, chunk))
+            if len(futures) >= in_flight:
+                yield from futures.popleft().result()
+        while futures:
+            yield from futures.popleft().result()
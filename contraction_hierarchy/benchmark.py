@@ -0,0 +1,1117 @@
+"""
+Benchmarks for preprocessing and path finding over the city networks.
+Run from the contraction_hierarchy folder, for example:
+
+    python benchmark.py loading --city kuopio --baseline ../baseline/contraction_hierarchy
+    python benchmark.py atf --baseline ../baseline/contraction_hierarchy
+    python benchmark.py composition --baseline ../baseline/contraction_hierarchy
+    python benchmark.py cut --baseline ../baseline/contraction_hierarchy
+
+loading, atf, composition and cut run the code before the columnar ATF (lists of Bus objects) in a separate
+process, so --baseline is a checkout of that code, for example made by `git worktree add ../baseline <revision>`
+    python benchmark.py shortcuts
+    python benchmark.py parallel --processes 1 2 4 8
+    python benchmark.py witness
+    python benchmark.py ordering
+    python benchmark.py contraction
+    python benchmark.py storage
+    python benchmark.py bidirectional
+    python benchmark.py profile
+    python benchmark.py matrix --sizes 100 1000
+    python benchmark.py batch --processes 1 2 4 8
+    python benchmark.py queues
+    python benchmark.py goal_directed
+    python benchmark.py query_graph
+    python benchmark.py containers
+    python benchmark.py container_build --processes 1 2 4
+    python benchmark.py fractional_cascading
+    python benchmark.py ttn
+    python benchmark.py router
+    python benchmark.py raptor
+    python benchmark.py csa
+"""
+import argparse
+import logging
+import math
+import os
+import pickle
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import sys
+from operator import itemgetter
+from typing import Callable, Tuple, Any, List, Union
+
+import pandas as pd
+
+from atf import ATF, min_atf
+from batch import batch_shortest_paths
+from csa import CSA
+from bidirectional_search import TCH
+from profile_search import ProfileSearch
+from queues import QUEUES
+from dijkstra import Dijkstra
+from forward_search import FCH
+from graph import TransportGraph, SECONDS_IN_DAY
+from ordering import ORDERINGS
+from query_graph import Router
+from raptor import Raptor
+from storage import save_graph, load_graph, source_checksum
+from timetable import Timetable
+from unpacking import UnpackingTable
+
+
+def _data_paths(city: str) -> Tuple[str, str]:
+    """
+    Paths to connections and walk files of the city
+    :param city: str Name of the folder inside data/
+    :return:
+    """
+    return f'data/{city}/network_temporal_day.csv', f'data/{city}/network_walk.csv'
+
+
+def _read_city(city: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read connections and walk files the same way as Run_pathfinding.ipynb does
+    :param city: str Name of the folder inside data/
+    :return:
+    """
+    transport_path, walk_path = _data_paths(city)
+    transport_connections = pd.read_csv(transport_path, sep=';')
+    walk_connections = pd.read_csv(walk_path, sep=';')
+    walk_connections_invert = walk_connections.rename(columns={'from_stop_I': 'to_stop_I',
+                                                               'to_stop_I': 'from_stop_I'})
+    return transport_connections, pd.concat((walk_connections, walk_connections_invert))
+
+
+def _measure(function: Callable, *args, **kwargs) -> Tuple[Any, float, float]:
+    """
+    Run function and measure its wall time and peak of python memory allocations.
+    Memory is traced in a separate run, so tracing overhead does not affect the time
+    :param function: Callable Function to measure
+    :return: (result, seconds, peak memory in MB)
+    """
+    start_time = time.perf_counter()
+    result = function(*args, **kwargs)
+    duration = time.perf_counter() - start_time
+    del result
+    tracemalloc.start()
+    result = function(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak / 2 ** 20
+
+
+def _run_baseline(path: str, measurement: str, **arguments) -> Any:
+    """
+    Run the measurement of baseline_benchmark over the baseline code in a separate process.
+    The process is started in the baseline folder with this folder in PYTHONPATH, so the baseline modules
+    are imported instead of the current ones. Arguments and result are passed by pickle of plain python objects
+    :param path: str Path to the contraction_hierarchy folder of the baseline code
+    :param measurement: str Name of the measurement in baseline_benchmark.MEASUREMENTS
+    :return: result of the measurement
+    """
+    if not os.path.isfile(os.path.join(path, 'trip.py')):
+        raise ValueError(f'{path} is not a contraction_hierarchy folder of the baseline code')
+    folder = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [folder, os.environ.get('PYTHONPATH')])))
+    process = subprocess.run([sys.executable, '-m', 'baseline_benchmark'], input=pickle.dumps((measurement, arguments)),
+                             stdout=subprocess.PIPE, cwd=path, env=environment, check=True)
+    return pickle.loads(process.stdout)
+
+
+def _baseline_edge(nodes: List[int], f: ATF, route_names: List[str]) -> Tuple:
+    """
+    Columns of ATF, which baseline_benchmark turns into ATF over list of Bus objects
+    :param nodes: [start_node, end_node]
+    :param f: ATF Function of the edge
+    :param route_names: List[str] Route names of the unpacking table, shortcuts are named 'shortcut'
+    :return: (nodes, walk duration or None, departures, arrivals, route names)
+    """
+    return (nodes, f.walk and f.walk.w, f.d.tolist(), f.a.tolist(),
+            [route_names[~payload] if payload < 0 else 'shortcut' for payload in f.p])
+
+
+def _columns(f: ATF) -> Tuple[List[int], List[int], Union[int, None]]:
+    """
+    Departures, arrivals and walk duration of ATF to compare it with the result of baseline_benchmark
+    :param f: ATF
+    :return:
+    """
+    return f.d.tolist(), f.a.tolist(), f.walk and f.walk.w
+
+
+def benchmark_loading(city: str, baseline: str, repeat: int = 3):
+    """
+    Compare load time and peak memory of graph construction: baseline loader, vectorized loader over
+    data frames and chunked loader straight from csv files
+    :param city: str Name of the folder inside data/
+    :param baseline: str Path to the contraction_hierarchy folder of the baseline code
+    :param repeat: int Count of runs, the best run is reported
+    :return:
+    """
+    transport_path, walk_path = _data_paths(city)
+
+    def vectorized():
+        return TransportGraph(*_read_city(city))
+
+    def chunked():
+        return TransportGraph.from_csv(transport_path, walk_path)
+
+    duration, peak = _run_baseline(baseline, 'loading', transport_path=os.path.abspath(transport_path),
+                                   walk_path=os.path.abspath(walk_path), repeat=repeat)
+    print(f'{"baseline":>12}: {duration:8.3f} s  peak {peak:8.1f} MB')
+    for name, function in [('vectorized', vectorized), ('from_csv', chunked)]:
+        runs = [_measure(function)[1:] for _ in range(repeat)]
+        duration = min(x[0] for x in runs)
+        peak = min(x[1] for x in runs)
+        print(f'{name:>12}: {duration:8.3f} s  peak {peak:8.1f} MB')
+
+
+def benchmark_atf(city: str, baseline: str, queries: int = 200000):
+    """
+    Compare memory per edge and speed of arrival() of columnar ATF against list of Bus objects of the baseline.
+    Arrival times of both are checked to be the same
+    :param city: str Name of the folder inside data/
+    :param baseline: str Path to the contraction_hierarchy folder of the baseline code
+    :param queries: int Count of arrival() calls
+    :return:
+    """
+    transport_path, walk_path = _data_paths(city)
+    tg = TransportGraph.from_csv(transport_path, walk_path)
+    edges = [(node1, node2, f) for node1, out in tg.graph.items() for node2, f in out.items() if f.size]
+    columns = [(f.walk, f.d.tolist(), f.a.tolist(), f.p.tolist()) for _, _, f in edges]
+
+    def atfs():
+        return [ATF(walk, d, a, p) for walk, d, a, p in columns]
+
+    columnar, _, columnar_peak = _measure(atfs)
+    random.seed(0)
+    start, end = min(min(x[1], default=0) for x in columns), max(max(x[1], default=0) for x in columns)
+    sample = [(random.randrange(len(edges)), random.randint(start, end)) for _ in range(queries)]
+    legacy_peak, legacy_duration, legacy_arrivals = _run_baseline(
+        baseline, 'arrivals', sample=sample,
+        edges=[_baseline_edge([node1, node2], f, tg.unpacking.route_names) for node1, node2, f in edges])
+    print(f'edges with connections: {len(edges)}, connections: {sum(f.size for _, _, f in edges)}')
+    print(f'{"Bus lists":>12}: {legacy_peak * 2 ** 20 / len(edges):10.1f} bytes per edge')
+    print(f'{"columnar":>12}: {columnar_peak * 2 ** 20 / len(edges):10.1f} bytes per edge')
+
+    start_time = time.perf_counter()
+    arrivals = [columnar[i].arrival(t)[0] for i, t in sample]
+    columnar_duration = time.perf_counter() - start_time
+    mismatches = sum(x != y for x, y in zip(arrivals, legacy_arrivals))
+    print(f'{"Bus lists":>12}: {legacy_duration / queries * 10 ** 9:10.1f} ns per arrival()')
+    print(f'{"columnar":>12}: {columnar_duration / queries * 10 ** 9:10.1f} ns per arrival()  '
+          f'arrival mismatches {mismatches}')
+
+
+def benchmark_composition(city: str, baseline: str, pairs: int = 20000, repeat: int = 3):
+    """
+    Compare single sweep ATF.composition against composition of the baseline on pairs of adjacent edges
+    of the original graph and of the contracted graph, where functions are much bigger.
+    Connections and walks of both results are checked to be the same
+    :param city: str Name of the folder inside data/
+    :param baseline: str Path to the contraction_hierarchy folder of the baseline code
+    :param pairs: int Maximum count of edge pairs of every graph
+    :param repeat: int Count of runs, the best one is reported
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    random.seed(0)
+    for name, graph in [('original', tg.graph), ('contracted', ch_tg.graph)]:
+        edge_pairs = [(node1, node, node2) for node1, out in graph.items() for node in out
+                      for node2 in graph.get(node, {}) if node1 != node2]
+        edge_pairs = random.sample(edge_pairs, min(pairs, len(edge_pairs)))
+        edge_pairs = [(graph[node1][node], graph[node][node2], node1, node, node2)
+                      for node1, node, node2 in edge_pairs]
+        route_names = ch_tg.unpacking.route_names
+        legacy_duration, legacy = _run_baseline(
+            baseline, 'composition', repeat=repeat,
+            pairs=[(_baseline_edge([node1, node], f, route_names), _baseline_edge([node, node2], g, route_names))
+                   for f, g, node1, node, node2 in edge_pairs])
+        duration = math.inf
+        for _ in range(repeat):
+            table = UnpackingTable()
+            start_time = time.perf_counter()
+            functions = [g.composition(f, node, table) for f, g, _, node, _ in edge_pairs]
+            duration = min(duration, time.perf_counter() - start_time)
+        for kernel_name, kernel_duration in [('baseline', legacy_duration), ('single sweep', duration)]:
+            print(f'{name:>10} {kernel_name:>12}: '
+                  f'{kernel_duration / len(edge_pairs) * 10 ** 6:8.2f} us per composition')
+        mismatches = sum((h and _columns(h)) != legacy_h for h, legacy_h in zip(functions, legacy))
+        print(f'{name:>10}: {len(edge_pairs)} pairs, mean sizes '
+              f'{sum(f.size for f, *_ in edge_pairs) / len(edge_pairs):.1f} and '
+              f'{sum(g.size for _, g, *_ in edge_pairs) / len(edge_pairs):.1f} connections, mismatches {mismatches}')
+
+
+def benchmark_cut(city: str, baseline: str, merges: int = 20000, repeat: int = 3):
+    """
+    Compare vectorized cut of all edges at graph construction against cut() of every edge of the baseline,
+    and linear merge min_atf against min_atf of the baseline on shortcuts, which are merged with existing edges
+    in contraction. Results of both implementations are checked to be the same
+    :param city: str Name of the folder inside data/
+    :param baseline: str Path to the contraction_hierarchy folder of the baseline code
+    :param merges: int Maximum count of shortcuts, which are merged with existing edges
+    :param repeat: int Count of runs, the best one is reported
+    :return:
+    """
+    transport_path, walk_path = _data_paths(city)
+    tg = TransportGraph.from_csv(transport_path, walk_path)
+    transport_connections = pd.read_csv(transport_path, sep=';').sort_values(by=['dep_time_ut', 'arr_time_ut'])
+    uncut = [(tg.graph[node1][node2], group['dep_time_ut'].to_numpy() - tg.time_origin,
+              group['arr_time_ut'].to_numpy() - tg.time_origin)
+             for (node1, node2), group in transport_connections.groupby(['from_stop_I', 'to_stop_I'])
+             if node2 in tg.graph.get(node1, {})]
+
+    duration = math.inf
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        TransportGraph.from_csv(transport_path, walk_path)
+        duration = min(duration, time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    ch_tg = tg.contraction_hierarchy()
+    print(f'contraction: {time.perf_counter() - start_time:.1f} s')
+    edge_pairs = [(node1, node, node2) for node1, out in ch_tg.graph.items() for node in out
+                  for node2 in ch_tg.graph.get(node, {}) if node1 != node2 and node2 in out]
+    random.seed(0)
+    edge_pairs = random.sample(edge_pairs, min(merges, len(edge_pairs)))
+    table = UnpackingTable()
+    merges = [(ch_tg.graph[node][node2].composition(ch_tg.graph[node1][node], node, table), ch_tg.graph[node1][node2])
+              for node1, node, node2 in edge_pairs]
+    merges = [(f, h) for f, h in merges if f]
+    route_names = ch_tg.unpacking.route_names
+    legacy_cut_duration, legacy_cut, legacy_duration, legacy_merged = _run_baseline(
+        baseline, 'cut', repeat=repeat,
+        uncut=[([0, 1], f.walk and f.walk.w, d.tolist(), a.tolist(), ['bus'] * len(d)) for f, d, a in uncut],
+        merges=[(_baseline_edge([0, 1], f, route_names), _baseline_edge([0, 1], h, route_names)) for f, h in merges])
+    mismatches = sum(_columns(f)[:2] != legacy_f[:2] for (f, _, _), legacy_f in zip(uncut, legacy_cut))
+    print(f'cut() of {len(uncut)} edges by baseline: {legacy_cut_duration:.3f} s, '
+          f'whole graph construction with vectorized cut: {duration:.3f} s, mismatches {mismatches}')
+
+    duration = math.inf
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        functions = [min_atf(f, h) for f, h in merges]
+        duration = min(duration, time.perf_counter() - start_time)
+    for name, kernel_duration in [('baseline', legacy_duration), ('linear merge', duration)]:
+        print(f'{name:>12}: {kernel_duration / len(merges) * 10 ** 6:8.2f} us per min_atf')
+    mismatches = sum(_columns(f) != legacy_f for f, legacy_f in zip(functions, legacy_merged))
+    print(f'{len(merges)} merges of shortcuts with existing edges, mean sizes '
+          f'{sum(f.size for f, _ in merges) / len(merges):.1f} and {sum(h.size for _, h in merges) / len(merges):.1f} '
+          f'connections, mismatches {mismatches}')
+
+
+def _shortcut_payloads_memory(graph) -> Tuple[int, int]:
+    """
+    Memory in bytes of shortcut connections payloads: payload ids with unpacking table
+    and the same paths materialized as (nodes, route_names) lists, as shortcuts kept them before the table
+    :param graph: ContactionTransportGraph
+    :return: (packed, materialized)
+    """
+    table = graph.unpacking
+    packed = sum(x.buffer_info()[1] * x.itemsize for x in (table.middle, table.first, table.second))
+    materialized = 0
+    for node1, out in graph.graph.items():
+        for node2, f in out.items():
+            for payload in f.p:
+                if payload >= 0:
+                    packed += f.p.itemsize
+                    nodes, route_names = table.unpack(payload, node1, node2)
+                    materialized += sys.getsizeof(nodes) + sys.getsizeof(route_names) + sys.getsizeof((nodes,
+                                                                                                       route_names))
+    return packed, materialized
+
+
+def benchmark_shortcuts(city: str):
+    """
+    Contraction time and memory of shortcut payloads: unpacking table against materialized paths
+    :param city: str Name of the folder inside data/
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    start_time = time.perf_counter()
+    ch_tg = tg.contraction_hierarchy()
+    duration = time.perf_counter() - start_time
+    packed, materialized = _shortcut_payloads_memory(ch_tg)
+    print(f'contraction: {duration:.1f} s, shortcut rows in unpacking table: {len(ch_tg.unpacking)}')
+    print(f'{"unpacking table":>18}: {packed / 2 ** 20:8.2f} MB')
+    print(f'{"materialized paths":>18}: {materialized / 2 ** 20:8.2f} MB')
+
+
+def _check_queries(tg: TransportGraph, ch_tg, queries: int = 200, seed: int = 0) -> int:
+    """
+    Compare arrivals of FCH over contracted graph with Dijkstra over the original one on random queries
+    :param tg: TransportGraph Original graph
+    :param ch_tg: ContactionTransportGraph Contracted graph with geometrical containers
+    :param queries: int Count of random queries
+    :param seed: int Random seed
+    :return: Count of queries with different arrival
+    """
+    random.seed(seed)
+    nodes = sorted(tg.nodes)
+    start, end = tg.time_origin, tg.time_origin + SECONDS_IN_DAY
+    mismatches = 0
+    for _ in range(queries):
+        start_time, start_node, end_node = random.randint(start, end), random.choice(nodes), random.choice(nodes)
+        expected = Dijkstra(tg, start_time, start_node, end_node).shortest_path(optimized_binary_search=False)
+        path = FCH(ch_tg, start_time, start_node, end_node).shortest_path(optimized_binary_search=False)
+        mismatches += expected['arrival'] != path['arrival']
+    return mismatches
+
+
+def benchmark_parallel(city: str, processes: List[int]):
+    """
+    Speedup of parallel contraction over independent sets of nodes against count of worker processes
+    :param city: str Name of the folder inside data/
+    :param processes: List[int] Counts of worker processes to measure
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    print(f'cpu count: {os.cpu_count()}')
+    sequential = None
+    for count in [0] + processes:
+        start_time = time.perf_counter()
+        ch_tg = tg.contraction_hierarchy(processes=count)
+        duration = time.perf_counter() - start_time
+        sequential = sequential or duration
+        ch_tg.geometrical_container()
+        mismatches = _check_queries(tg, ch_tg)
+        name = f'{count} processes' if count else 'sequential'
+        print(f'{name:>14}: {duration:8.1f} s  speedup {sequential / duration:5.2f}  edges {ch_tg.edges_cnt}  '
+              f'arrival mismatches {mismatches}')
+
+
+def benchmark_contraction(city: str):
+    """
+    Contraction time and peak of python memory allocations during contraction
+    :param city: str Name of the folder inside data/
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg, duration, peak = _measure(tg.contraction_hierarchy)
+    print(f'contraction: {duration:.1f} s  peak {peak:.1f} MB  edges {ch_tg.edges_cnt}  '
+          f'shortcut rows {len(ch_tg.unpacking)}')
+
+
+def benchmark_storage(city: str, queries: int = 200):
+    """
+    Cold start of contracted graph with all precomputations: pickle against memory mapped graph file
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries after loading
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    ch_tg.optimize_binary_search()
+    ch_tg.fractional_cascading_precomputation()
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path, graph_path = os.path.join(directory, 'graph.pkl'), os.path.join(directory, 'graph.pfch')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(ch_tg, f, pickle.HIGHEST_PROTOCOL)
+        save_graph(ch_tg, graph_path, source_checksum(*_data_paths(city)))
+
+        for name, path, load in [('pickle', pickle_path, lambda: pickle.load(open(pickle_path, 'rb'))),
+                                 ('graph file', graph_path, lambda: load_graph(graph_path))]:
+            start_time = time.perf_counter()
+            graph = load()
+            load_duration = time.perf_counter() - start_time
+            settled, query_duration = _settled_nodes(graph, queries)
+            print(f'{name:>12}: {os.path.getsize(path) / 2 ** 20:7.1f} MB  load {load_duration:8.3f} s  '
+                  f'first {queries} queries {query_duration:6.2f} ms per query')
+
+
+def benchmark_witness(city: str, queries: int = 200):
+    """
+    Contraction with and without witness search: count of shortcuts, sizes of functions and query speed
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries for correctness check
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    for witness_search in [False, True]:
+        start_time = time.perf_counter()
+        ch_tg = tg.contraction_hierarchy(witness_search=witness_search)
+        duration = time.perf_counter() - start_time
+        ch_tg.geometrical_container()
+        start_time = time.perf_counter()
+        mismatches = _check_queries(tg, ch_tg, queries)
+        check_duration = time.perf_counter() - start_time
+        stats = ch_tg.timetable_stats
+        print(f'witness search {"on" if witness_search else "off"}: contraction {duration:.1f} s, '
+              f'shortcuts {ch_tg.edges_cnt - tg.edges_cnt}, edges {ch_tg.edges_cnt}, '
+              f'unpacking rows {len(ch_tg.unpacking)}')
+        print(f'    timetable sizes: mean {stats["mean_size"]:.1f}, std {stats["std_size"]:.1f}, '
+              f'max {stats["max_size"]}; {queries} queries with check {check_duration:.1f} s, '
+              f'arrival mismatches {mismatches}')
+
+
+def benchmark_bidirectional(city: str, queries: int = 300):
+    """
+    Compare bidirectional TCH query against FCH with geometrical containers and Dijkstra over the original graph:
+    mean duration of query, mean count of settled nodes and arrival mismatches with Dijkstra
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    ch_tg.travel_time_bounds_precomputation()
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    arrivals = {}
+    algorithms = [('Dijkstra', lambda *query: Dijkstra(tg, *query), {'optimized_binary_search': False}),
+                  ('FCH', lambda *query: FCH(ch_tg, *query), {'optimized_binary_search': False}),
+                  ('TCH', lambda *query: TCH(ch_tg, *query), {})]
+    for name, algorithm, kwargs in algorithms:
+        settled = 0
+        duration = 0
+        arrivals[name] = []
+        for query in sample:
+            search = algorithm(*query)
+            start_time = time.perf_counter()
+            arrivals[name].append(search.shortest_path(**kwargs)['arrival'])
+            duration += time.perf_counter() - start_time
+            settled += len(search.candidate_weights) - len(search.candidate_priorities)
+        mismatches = sum(x != y for x, y in zip(arrivals[name], arrivals['Dijkstra']))
+        print(f'{name:>10}: {duration / queries * 1000:6.2f} ms per query  settled {settled / queries:7.1f}  '
+              f'arrival mismatches {mismatches}')
+
+
+def benchmark_profile(city: str, queries: int = 40, window: int = 7200, step: int = 60):
+    """
+    Compare profile query against point TCH queries for every step of the departure window
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random profile queries
+    :param window: int Duration of the departure window in seconds
+    :param step: int Step between departures of point queries in seconds
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.travel_time_bounds_precomputation()
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    profile_duration = point_duration = 0
+    journeys = mismatches = 0
+    for _ in range(queries):
+        start_node, end_node = random.choice(nodes), random.choice(nodes)
+        start_time = random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY - window)
+        query_start_time = time.perf_counter()
+        profile = ProfileSearch(ch_tg, start_time, start_time + window, start_node, end_node).profile()
+        profile_duration += time.perf_counter() - query_start_time
+        journeys += len(profile['journeys'])
+        f = profile['profile']
+        for t in range(start_time, start_time + window + 1, step):
+            query_start_time = time.perf_counter()
+            arrival = TCH(ch_tg, t, start_node, end_node).shortest_path()['arrival']
+            point_duration += time.perf_counter() - query_start_time
+            expected, _ = f.arrival(t - ch_tg.time_origin)
+            if start_node == end_node:
+                expected = t - ch_tg.time_origin
+            mismatches += arrival != expected + ch_tg.time_origin
+    print(f'profile query: {profile_duration / queries * 1000:8.2f} ms, {journeys / queries:.1f} journeys')
+    print(f'{window // step + 1} point queries: {point_duration / queries * 1000:8.2f} ms, '
+          f'arrival mismatches {mismatches}')
+
+
+def benchmark_matrix(city: str, sizes: List[int], pairs: int = 10000):
+    """
+    Compare travel time matrix against the loop of TCH queries over all pairs.
+    For big matrices the loop is measured on random pairs and extrapolated.
+    Sources and targets are sampled with repetitions, as the network could be smaller than the matrix
+    :param city: str Name of the folder inside data/
+    :param sizes: List[int] Counts of sources and targets
+    :param pairs: int Count of pairs checked with TCH queries
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.travel_time_bounds_precomputation()
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    for size in sizes:
+        sources = [random.choice(nodes) for _ in range(size)]
+        targets = [random.choice(nodes) for _ in range(size)]
+        departure_times = [random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY) for _ in sources]
+        start_time = time.perf_counter()
+        matrix = ch_tg.travel_time_matrix(sources, targets, departure_times)
+        matrix_duration = time.perf_counter() - start_time
+
+        sample = [(i, j) for i in range(size) for j in range(size)] if size * size <= pairs else \
+            [(random.randrange(size), random.randrange(size)) for _ in range(pairs)]
+        mismatches = 0
+        start_time = time.perf_counter()
+        for i, j in sample:
+            arrival = TCH(ch_tg, departure_times[i], sources[i], targets[j]).shortest_path()['arrival']
+            if sources[i] == targets[j]:
+                arrival = departure_times[i]
+            mismatches += arrival != matrix[i, j]
+        loop_duration = (time.perf_counter() - start_time) / len(sample) * size * size
+        print(f'{size:>5} x {size:<5}: matrix {matrix_duration:8.2f} s, TCH loop {loop_duration:8.2f} s'
+              f'{"" if len(sample) == size * size else " (extrapolated)"}, '
+              f'arrival mismatches {mismatches} of {len(sample)}')
+
+
+def benchmark_batch(city: str, processes: List[int], queries: int = 5000):
+    """
+    Throughput of batch TCH queries against count of worker processes
+    :param city: str Name of the folder inside data/
+    :param processes: List[int] Counts of worker processes to measure
+    :param queries: int Count of random queries
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.travel_time_bounds_precomputation()
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = pd.DataFrame({'start_time': [random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY)
+                                          for _ in range(queries)],
+                           'start_node': [random.choice(nodes) for _ in range(queries)],
+                           'end_node': [random.choice(nodes) for _ in range(queries)]})
+    print(f'cpu count: {os.cpu_count()}')
+    sequential = None
+    expected = None
+    for count in [0] + processes:
+        start_time = time.perf_counter()
+        arrivals = [result['arrival'] for result in batch_shortest_paths(ch_tg, sample, 'tch', processes=count)]
+        duration = time.perf_counter() - start_time
+        sequential = sequential or duration
+        expected = expected or arrivals
+        mismatches = sum(x != y for x, y in zip(arrivals, expected))
+        name = f'{count} processes' if count else 'sequential'
+        print(f'{name:>14}: {duration:8.2f} s  {queries / duration:8.1f} queries/s  '
+              f'speedup {sequential / duration:5.2f}  arrival mismatches {mismatches}')
+
+
+def benchmark_queues(city: str, queries: int = 300, repeat: int = 3):
+    """
+    Compare priority queues of labels in Dijkstra, FCH and TCH and in goal directed Dijkstra and FCH (ALT)
+    on the same random queries: best of repeats of mean duration of query and arrival mismatches with heapdict.
+    Radix heap requires monotone integer priorities, queries where TCH breaks it are counted as errors
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :param repeat: int Count of repeats
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    ch_tg.travel_time_bounds_precomputation()
+    tg.landmarks_precomputation()
+    ch_tg.landmarks_precomputation()
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    for name, algorithm, kwargs in [('Dijkstra', lambda *query, **queue: Dijkstra(tg, *query, **queue),
+                                     {'optimized_binary_search': False}),
+                                    ('FCH', lambda *query, **queue: FCH(ch_tg, *query, **queue),
+                                     {'optimized_binary_search': False}),
+                                    ('TCH', lambda *query, **queue: TCH(ch_tg, *query, **queue), {}),
+                                    ('Dijkstra ALT',
+                                     lambda *query, **queue: Dijkstra(tg, *query, goal_directed=True, **queue),
+                                     {'optimized_binary_search': False}),
+                                    ('FCH ALT', lambda *query, **queue: FCH(ch_tg, *query, goal_directed=True, **queue),
+                                     {'optimized_binary_search': False})]:
+        expected = None
+        for queue in QUEUES:
+            durations = []
+            for _ in range(repeat):
+                arrivals = []
+                errors = 0
+                start_time = time.perf_counter()
+                for query in sample:
+                    try:
+                        arrivals.append(algorithm(*query, queue=queue).shortest_path(**kwargs)['arrival'])
+                    except ValueError:
+                        arrivals.append(None)
+                        errors += 1
+                durations.append(time.perf_counter() - start_time)
+            expected = expected or arrivals
+            mismatches = sum(x != y for x, y in zip(arrivals, expected) if x is not None)
+            print(f'{name:>12} {queue:>9}: {min(durations) / queries * 1000:6.2f} ms per query  '
+                  f'arrival mismatches {mismatches}  errors {errors}')
+
+
+def benchmark_goal_directed(city: str, queries: int = 300, candidates: int = 3000):
+    """
+    Compare goal directed search (ALT) against plain search in Dijkstra and FCH: mean count of settled nodes,
+    mean duration of query and arrival mismatches. Long queries are the ones with the largest landmark lower bound
+    of travel time among random reachable pairs
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of queries in every set
+    :param candidates: int Count of random pairs to choose long queries from
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    start_time = time.perf_counter()
+    tg.landmarks_precomputation()
+    ch_tg.landmarks_precomputation()
+    print(f'landmarks precomputation: {time.perf_counter() - start_time:.2f} s')
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(candidates)]
+    bounds = [tg.landmarks.potentials(end_node)[start_node] for _, start_node, end_node in sample]
+    long_sample = [query for bound, query in sorted(zip(bounds, sample), key=itemgetter(0), reverse=True)
+                   if bound < math.inf][:queries]
+    for sample_name, queries_sample in [('random', sample[:queries]), ('long', long_sample)]:
+        for name, algorithm in [('Dijkstra', lambda *query, **kwargs: Dijkstra(tg, *query, **kwargs)),
+                                ('FCH', lambda *query, **kwargs: FCH(ch_tg, *query, **kwargs))]:
+            arrivals = {}
+            for goal_directed in [False, True]:
+                settled = 0
+                duration = 0
+                arrivals[goal_directed] = []
+                for query in queries_sample:
+                    # potentials are calculated in the constructor
+                    query_start_time = time.perf_counter()
+                    search = algorithm(*query, goal_directed=goal_directed)
+                    arrivals[goal_directed].append(search.shortest_path(optimized_binary_search=False)['arrival'])
+                    duration += time.perf_counter() - query_start_time
+                    settled += len(search.candidate_weights) - len(search.candidate_priorities)
+                mismatches = sum(x != y for x, y in zip(arrivals[goal_directed], arrivals[False]))
+                print(f'{sample_name:>7} {name:>9} {"ALT" if goal_directed else "plain":>5}: '
+                      f'{duration / len(queries_sample) * 1000:6.2f} ms per query  '
+                      f'settled {settled / len(queries_sample):7.1f}  arrival mismatches {mismatches}')
+
+
+def benchmark_query_graph(city: str, queries: int = 500, repeat: int = 3):
+    """
+    Compare Dijkstra and FCH over the compiled query graph (dense indexes and CSR arrays) against dictionaries
+    of the graph: best of repeats of mean duration of query, arrival mismatches and paths, which differ
+    (equal arrivals could be reached by different paths, as ties are broken by another order of nodes)
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :param repeat: int Count of repeats
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    start_time = time.perf_counter()
+    query_tg = tg.query_graph()
+    query_ch_tg = ch_tg.query_graph()
+    print(f'compilation: {time.perf_counter() - start_time:.3f} s')
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    for name, algorithm, graph, compiled_graph in [('Dijkstra', Dijkstra, tg, query_tg),
+                                                   ('FCH', FCH, ch_tg, query_ch_tg)]:
+        results = {}
+        for graph_name, query_graph in [('dict', graph), ('compiled', compiled_graph)]:
+            durations = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                results[graph_name] = [algorithm(query_graph, *query).shortest_path(optimized_binary_search=False)
+                                       for query in sample]
+                durations.append(time.perf_counter() - start_time)
+            mismatches = sum(x['arrival'] != y['arrival'] for x, y in zip(results[graph_name], results['dict']))
+            paths = sum(x['path'] != y['path'] for x, y in zip(results[graph_name], results['dict']))
+            print(f'{name:>10} {graph_name:>9}: {min(durations) / queries * 1000:6.2f} ms per query  '
+                  f'arrival mismatches {mismatches}  different paths {paths}')
+
+
+def benchmark_containers(city: str, queries: int = 300, repeat: int = 3):
+    """
+    Memory of geometrical containers as sets of nodes against intervals and bitsets of DFS post-order numbers,
+    and mean duration of FCH query with both of them
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :param repeat: int Count of repeats
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+
+    def sets():
+        containers = {}
+        for node in ch_tg.nodes:
+            visited = set()
+            stack = [node]
+            while stack:
+                next_node = stack.pop()
+                if next_node not in visited:
+                    visited.add(next_node)
+                    stack.extend(neighbour for neighbour in ch_tg.graph[next_node]
+                                 if ch_tg.hierarchy[neighbour] < ch_tg.hierarchy[next_node])
+            containers[node] = visited
+        return containers
+
+    def compact():
+        ch_tg.geometrical_container()
+        return ch_tg.geometrical_containers
+
+    random.seed(0)
+    nodes = sorted(ch_tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    results = {}
+    for name, build in [('sets', sets), ('compact', compact)]:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        containers = build()
+        build_duration = time.perf_counter() - start_time
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        ch_tg.geometrical_containers = containers
+        durations = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            results[name] = [FCH(ch_tg, *query).shortest_path()['arrival'] for query in sample]
+            durations.append(time.perf_counter() - start_time)
+        mismatches = sum(x != y for x, y in zip(results[name], results['sets']))
+        print(f'{name:>8}: {memory / 2 ** 20:7.2f} MB  build {build_duration:6.3f} s  '
+              f'query {min(durations) / queries * 1000:6.2f} ms  arrival mismatches {mismatches}')
+
+
+def benchmark_container_build(city: str, processes: List[int], repeat: int = 3):
+    """
+    Preprocessing time and peak memory of geometrical containers: separate DFS from every node against
+    one bottom-up pass over the downward graph with compaction in the process pool
+    :param city: str Name of the folder inside data/
+    :param processes: List[int] Counts of worker processes
+    :param repeat: int Count of repeats
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+
+    def dfs_from_every_node():
+        for node in ch_tg.nodes:
+            visited = set()
+            stack = [node]
+            while stack:
+                next_node = stack.pop()
+                if next_node not in visited:
+                    visited.add(next_node)
+                    stack.extend(neighbour for neighbour in ch_tg.graph[next_node]
+                                 if ch_tg.hierarchy[neighbour] < ch_tg.hierarchy[next_node])
+
+    builds = [('DFS per node', dfs_from_every_node)]
+    builds += [(f'bottom-up {count} processes', lambda count=count: ch_tg.geometrical_container(count))
+               for count in processes]
+    for name, build in builds:
+        durations = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            build()
+            durations.append(time.perf_counter() - start_time)
+        tracemalloc.start()
+        build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{name:>24}: {min(durations):8.3f} s  peak {peak / 2 ** 20:7.2f} MB')
+
+
+def benchmark_fractional_cascading(city: str, queries: int = 300):
+    """
+    Build time and memory of fractional cascading indexes of the standard and the contracted graph
+    and mean duration of Dijkstra and FCH query with them
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    for name, build in [('TransportGraph', tg.fractional_cascading_precomputation),
+                        ('ContactionTransportGraph', ch_tg.fractional_cascading_precomputation),
+                        ('ContactionTransportGraph old', ch_tg.fractional_cascading_precomputation_old)]:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        build()
+        duration = time.perf_counter() - start_time
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'{name:>28}: build {duration:7.3f} s  {memory / 2 ** 20:7.2f} MB')
+
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    for name, query in [('Dijkstra', lambda q: Dijkstra(tg, *q).shortest_path(optimized_binary_search=False)),
+                        ('Dijkstra cascading', lambda q: Dijkstra(tg, *q).shortest_path(fractional_cascading=True)),
+                        ('FCH', lambda q: FCH(ch_tg, *q).shortest_path(optimized_binary_search=False)),
+                        ('FCH cascading', lambda q: FCH(ch_tg, *q).shortest_path(fractional_cascading=True))]:
+        start_time = time.perf_counter()
+        for q in sample:
+            query(q)
+        print(f'{name:>28}: {(time.perf_counter() - start_time) / queries * 1000:6.2f} ms per query')
+
+
+def benchmark_ttn(city: str, queries: int = 300):
+    """
+    Build time and memory of TTN indexes of the standard and the contracted graph
+    and mean duration of Dijkstra and FCH query with and without them
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    for name, graph in [('TransportGraph', tg), ('ContactionTransportGraph', ch_tg)]:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        graph.optimize_binary_search()
+        duration = time.perf_counter() - start_time
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'{name:>24}: build {duration:7.3f} s  {memory / 2 ** 20:7.2f} MB')
+
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    for name, algorithm, graph in [('Dijkstra', Dijkstra, tg), ('FCH', FCH, ch_tg)]:
+        for optimized_binary_search in [False, True]:
+            start_time = time.perf_counter()
+            for query in sample:
+                algorithm(graph, *query).shortest_path(optimized_binary_search=optimized_binary_search)
+            print(f'{name + (" TTN" if optimized_binary_search else ""):>24}: '
+                  f'{(time.perf_counter() - start_time) / queries * 1000:6.2f} ms per query')
+
+
+def benchmark_router(city: str, queries: int = 1000, repeat: int = 3):
+    """
+    Throughput of many queries: new search object per query over dictionaries of the graph,
+    over the compiled query graph (which keeps its Router) and new Router per query against one Router,
+    which keeps its labels between queries, the last two also with goal directed search
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :param repeat: int Count of repeats
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    for name, algorithm, graph in [('Dijkstra', Dijkstra, tg), ('FCH', FCH, ch_tg)]:
+        query_graph = graph.query_graph()
+        query_graph.landmarks_precomputation()
+        router = Router(query_graph)
+        goal_directed_router = Router(query_graph, goal_directed=True)
+        runs = [('dict', lambda q: algorithm(graph, *q).shortest_path(optimized_binary_search=False)),
+                ('compiled', lambda q: algorithm(query_graph, *q).shortest_path()),
+                ('new router', lambda q: Router(query_graph).query(q[1], q[2], q[0])),
+                ('router', lambda q: router.query(q[1], q[2], q[0])),
+                ('new router ALT', lambda q: Router(query_graph, goal_directed=True).query(q[1], q[2], q[0])),
+                ('router ALT', lambda q: goal_directed_router.query(q[1], q[2], q[0]))]
+        results = {}
+        for run_name, run in runs:
+            durations = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                results[run_name] = [run(query)['arrival'] for query in sample]
+                durations.append(time.perf_counter() - start_time)
+            mismatches = sum(x != y for x, y in zip(results[run_name], results['dict']))
+            print(f'{name:>10} {run_name:>14}: {queries / min(durations):8.1f} queries per second  '
+                  f'arrival mismatches {mismatches}')
+
+
+def benchmark_raptor(city: str, queries: int = 300):
+    """
+    RAPTOR over the raw timetable against Dijkstra and FCH: preprocessing time and mean duration of query
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :return:
+    """
+    start_time = time.perf_counter()
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    print(f'{"TransportGraph":>10}: build {time.perf_counter() - start_time:7.3f} s')
+    start_time = time.perf_counter()
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    print(f'{"FCH":>10}: build {time.perf_counter() - start_time:7.3f} s')
+    start_time = time.perf_counter()
+    timetable = Timetable.from_csv(*_data_paths(city))
+    print(f'{"Timetable":>10}: build {time.perf_counter() - start_time:7.3f} s')
+
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    runs = [('Dijkstra', lambda q: Dijkstra(tg, *q).shortest_path(optimized_binary_search=False)),
+            ('FCH', lambda q: FCH(ch_tg, *q).shortest_path(optimized_binary_search=False)),
+            ('RAPTOR', lambda q: Raptor(timetable, *q).shortest_path())]
+    results = {}
+    for name, run in runs:
+        start_time = time.perf_counter()
+        results[name] = [run(query)['arrival'] for query in sample]
+        duration = time.perf_counter() - start_time
+        mismatches = sum(x != y for x, y in zip(results[name], results['Dijkstra']))
+        print(f'{name:>10}: {duration / queries * 1000:6.2f} ms per query  arrival mismatches {mismatches}')
+
+
+def benchmark_csa(city: str, queries: int = 300):
+    """
+    Connection scan over the raw timetable against Dijkstra, FCH and RAPTOR: mean duration of query
+    and of arrivals to all stops
+    :param city: str Name of the folder inside data/
+    :param queries: int Count of random queries
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    start_time = time.perf_counter()
+    timetable = Timetable.from_csv(*_data_paths(city))
+    print(f'{"Timetable":>10}: build {time.perf_counter() - start_time:7.3f} s  '
+          f'{len(timetable.connections)} connections')
+
+    random.seed(0)
+    nodes = sorted(tg.nodes)
+    sample = [(random.randint(tg.time_origin, tg.time_origin + SECONDS_IN_DAY), random.choice(nodes),
+               random.choice(nodes)) for _ in range(queries)]
+    runs = [('Dijkstra', lambda q: Dijkstra(tg, *q).shortest_path(optimized_binary_search=False)),
+            ('FCH', lambda q: FCH(ch_tg, *q).shortest_path(optimized_binary_search=False)),
+            ('RAPTOR', lambda q: Raptor(timetable, *q).shortest_path()),
+            ('CSA', lambda q: CSA(timetable, *q).shortest_path())]
+    results = {}
+    for name, run in runs:
+        start_time = time.perf_counter()
+        results[name] = [run(query)['arrival'] for query in sample]
+        duration = time.perf_counter() - start_time
+        mismatches = sum(x != y for x, y in zip(results[name], results['Dijkstra']))
+        print(f'{name:>10}: {duration / queries * 1000:6.2f} ms per query  arrival mismatches {mismatches}')
+
+    start_time = time.perf_counter()
+    for query_start_time, start_node, _ in sample:
+        CSA(timetable, query_start_time, start_node).earliest_arrivals()
+    print(f'{"CSA all":>10}: {(time.perf_counter() - start_time) / queries * 1000:6.2f} ms per query')
+
+
+def _settled_nodes(ch_tg, queries: int = 200, seed: int = 0) -> Tuple[float, float]:
+    """
+    Mean count of settled nodes and mean duration of FCH query on random queries
+    :param ch_tg: ContactionTransportGraph Contracted graph with geometrical containers
+    :param queries: int Count of random queries
+    :param seed: int Random seed
+    :return: (settled nodes, milliseconds)
+    """
+    random.seed(seed)
+    nodes = sorted(ch_tg.nodes)
+    start, end = ch_tg.time_origin, ch_tg.time_origin + SECONDS_IN_DAY
+    settled = 0
+    duration = 0
+    for _ in range(queries):
+        start_time, start_node, end_node = random.randint(start, end), random.choice(nodes), random.choice(nodes)
+        fch = FCH(ch_tg, start_time, start_node, end_node)
+        query_start_time = time.perf_counter()
+        fch.shortest_path(optimized_binary_search=False)
+        duration += time.perf_counter() - query_start_time
+        settled += len(fch.candidate_weights) - len(fch.candidate_priorities)
+    return settled / queries, duration / queries * 1000
+
+
+def benchmark_ordering(city: str):
+    """
+    Compare orderings of nodes contraction: contraction time, count and sizes of functions, FCH query cost
+    :param city: str Name of the folder inside data/
+    :return:
+    """
+    tg = TransportGraph.from_csv(*_data_paths(city))
+    orderings = [('default', None)]
+    for name, ordering in ORDERINGS.items():
+        orderings += [(f'{name} lazy', ordering(lazy=True)), (f'{name} eager', ordering(lazy=False))]
+    for name, ordering in orderings:
+        start_time = time.perf_counter()
+        ch_tg = tg.contraction_hierarchy(ordering=ordering)
+        duration = time.perf_counter() - start_time
+        ch_tg.geometrical_container()
+        stats = ch_tg.timetable_stats
+        settled, query_duration = _settled_nodes(ch_tg)
+        mismatches = _check_queries(tg, ch_tg)
+        print(f'{name:>22}: contraction {duration:6.1f} s  edges {ch_tg.edges_cnt:6}  '
+              f'max size {stats["max_size"]:4}  mean size {stats["mean_size"]:5.1f}  '
+              f'settled {settled:6.1f}  query {query_duration:6.2f} ms  arrival mismatches {mismatches}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=['loading', 'atf', 'composition', 'cut', 'shortcuts', 'parallel',
+                                              'witness', 'ordering', 'contraction', 'storage', 'bidirectional',
+                                              'profile', 'matrix', 'batch', 'queues', 'goal_directed', 'query_graph',
+                                              'containers', 'container_build', 'fractional_cascading', 'ttn',
+                                              'router', 'raptor', 'csa'])
+    parser.add_argument('--city', default='kuopio')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--baseline', default=None,
+                        help='path to the contraction_hierarchy folder of the code before the columnar ATF, '
+                             'which loading, atf, composition and cut compare against')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if args.benchmark in ('loading', 'atf', 'composition', 'cut') and args.baseline is None:
+        parser.error(f'{args.benchmark} requires --baseline')
+
+    if args.benchmark == 'loading':
+        benchmark_loading(args.city, args.baseline, args.repeat)
+    elif args.benchmark == 'atf':
+        benchmark_atf(args.city, args.baseline)
+    elif args.benchmark == 'composition':
+        benchmark_composition(args.city, args.baseline)
+    elif args.benchmark == 'cut':
+        benchmark_cut(args.city, args.baseline)
+    elif args.benchmark == 'shortcuts':
+        benchmark_shortcuts(args.city)
+    elif args.benchmark == 'parallel':
+        benchmark_parallel(args.city, args.processes)
+    elif args.benchmark == 'witness':
+        benchmark_witness(args.city)
+    elif args.benchmark == 'ordering':
+        benchmark_ordering(args.city)
+    elif args.benchmark == 'contraction':
+        benchmark_contraction(args.city)
+    elif args.benchmark == 'storage':
+        benchmark_storage(args.city)
+    elif args.benchmark == 'bidirectional':
+        benchmark_bidirectional(args.city)
+    elif args.benchmark == 'profile':
+        benchmark_profile(args.city)
+    elif args.benchmark == 'matrix':
+        benchmark_matrix(args.city, args.sizes)
+    elif args.benchmark == 'batch':
+        benchmark_batch(args.city, args.processes)
+    elif args.benchmark == 'queues':
+        benchmark_queues(args.city, repeat=args.repeat)
+    elif args.benchmark == 'goal_directed':
+        benchmark_goal_directed(args.city)
+    elif args.benchmark == 'query_graph':
+        benchmark_query_graph(args.city, repeat=args.repeat)
+    elif args.benchmark == 'containers':
+        benchmark_containers(args.city, repeat=args.repeat)
+    elif args.benchmark == 'container_build':
+        benchmark_container_build(args.city, args.processes, args.repeat)
+    elif args.benchmark == 'fractional_cascading':
+        benchmark_fractional_cascading(args.city)
+    elif args.benchmark == 'ttn':
+        benchmark_ttn(args.city)
+    elif args.benchmark == 'router':
+        benchmark_router(args.city, repeat=args.repeat)
+    elif args.benchmark == 'raptor':
+        benchmark_raptor(args.city)
+    elif args.benchmark == 'csa':
+        benchmark_csa(args.city)
+
+
+if __name__ == '__main__':
+    main()
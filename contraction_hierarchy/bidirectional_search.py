@@ -0,0 +1,162 @@
+from typing import Union, Dict, List, Tuple
+import heapq
+import time
+import math
+import logging
+
+from graph import ContactionTransportGraph
+from algorithms_wrapper import _check_running_time
+from utils import to_milliseconds
+from queues import priority_queue
+from unpacking import follow_parents
+
+
+def backward_search(graph: ContactionTransportGraph, target: int) -> Tuple[Dict[int, float], Dict[int, float]]:
+    """
+    Backward search from the target over reversed down moves (in-going edges from higher nodes).
+    Nodes are processed in order of hierarchy, so bounds of all lower nodes are final, when node is processed
+    :param graph: ContactionTransportGraph Contracted graph
+    :param target: int Target node
+    :return: (lower bounds, upper bounds) of travel time to the target for nodes of the corridor
+    """
+    if not graph.travel_time_bounds:
+        graph.travel_time_bounds_precomputation()
+    hierarchy = graph.hierarchy
+    travel_time_bounds = graph.travel_time_bounds
+    lower_bounds = {target: 0}
+    upper_bounds = {target: 0}
+    queue = [(hierarchy[target], target)]
+    while queue:
+        _, node = heapq.heappop(queue)
+        lower, upper = lower_bounds[node], upper_bounds[node]
+        for previous_node, (edge_lower, edge_upper) in travel_time_bounds.get(node, {}).items():
+            if previous_node in lower_bounds:
+                if lower + edge_lower < lower_bounds[previous_node]:
+                    lower_bounds[previous_node] = lower + edge_lower
+                if upper + edge_upper < upper_bounds[previous_node]:
+                    upper_bounds[previous_node] = upper + edge_upper
+            else:
+                lower_bounds[previous_node] = lower + edge_lower
+                upper_bounds[previous_node] = upper + edge_upper
+                heapq.heappush(queue, (hierarchy[previous_node], previous_node))
+    return lower_bounds, upper_bounds
+
+
+class TCH:
+    def __init__(self, graph: ContactionTransportGraph, start_time: int, start_node: int, end_node: int,
+                 queue: str = 'heapq'):
+        """
+        Bidirectional query over Time-dependent Contraction Hierarchy.
+        Backward search from the target marks the corridor of nodes, from which the target is reachable by down moves,
+        with time independent bounds of travel time to the target. Forward search moves down only inside of the
+        corridor, so containers of nodes are not needed. After the first down move the rest of the path stays in the
+        corridor, so such nodes are prioritized by arrival plus lower bound, and upper bounds prune the search.
+        More information could be found by the next link:
+        https://i11www.iti.kit.edu/extra/publications/bdsv-tdch-09.pdf
+
+        :param graph: ContactionTransportGraph Contracted graph on which we run the search
+        :param start_time: int Start time in unix time
+        :param start_node: int Start node
+        :param end_node: int End node
+        :param queue: str Priority queue of labels: 'heapdict', 'heapq', 'indexed' or 'radix', see queues.priority_queue
+        """
+        self.graph = graph
+
+        self.source = start_node
+        self.target = end_node
+        self.start_time = start_time - graph.time_origin
+
+        self.lower_bounds = {}
+        self.upper_bounds = {}
+
+        self.candidate_weights = {self.source: self.start_time}
+        self.candidate_priorities = priority_queue(queue)
+        # a node could get better arrival after it was settled, as nodes are prioritized with lower bounds,
+        # so parent pointers refer to labels (relaxations) instead of nodes
+        self.candidate_labels = {self.source: 0}
+        self.label_nodes = [self.source]
+        self.label_parents = [None]
+        self.label_payloads = [None]
+        self.candidate_down_move = {self.source: False}
+
+    def shortest_path(self, duration: Union[float, None] = None) -> Dict[str, Union[List[Union[int, str]], int]]:
+        """
+        Find shortest path query
+
+        :param duration: Maximum allowed duration of process time in seconds
+        :return:
+        """
+        exception = None
+        start_time = time.monotonic()
+
+        self.lower_bounds, self.upper_bounds = backward_search(self.graph, self.target)
+        lower_bounds = self.lower_bounds
+        upper_bounds = self.upper_bounds
+        hierarchy = self.graph.hierarchy
+        best_upper_bound = math.inf
+
+        winner_node = self.source
+        winner_weight = self.start_time
+        while (winner_node != self.target) and (not exception):
+            exception = _check_running_time(start_time, duration, "TCH")
+            if winner_node in upper_bounds:
+                best_upper_bound = min(best_upper_bound, winner_weight + upper_bounds[winner_node])
+            down_move = self.candidate_down_move[winner_node]
+            for node, f in self.graph.graph[winner_node].items():
+                if hierarchy[node] > hierarchy[winner_node]:
+                    if not down_move:
+                        self._update_vertex(node, winner_node, winner_weight, False, f, 0, best_upper_bound)
+                elif node in lower_bounds:
+                    self._update_vertex(node, winner_node, winner_weight, True, f,
+                                        lower_bounds[node], best_upper_bound)
+            try:
+                winner_node, _ = self.candidate_priorities.popitem()
+                winner_weight = self.candidate_weights[winner_node]
+            except IndexError:
+                message = f"Target {self.target} not reachable from node {self.source}"
+                logging.warning(message)
+                return {
+                    'path': [],
+                    'routes': [],
+                    'roots': [],
+                    'arrival': math.inf,
+                    'duration': to_milliseconds(time.monotonic() - start_time)
+                }
+        roots, payloads = follow_parents(self.candidate_labels[winner_node], self.label_parents, self.label_payloads,
+                                         self.label_nodes)
+        path, routes = self.graph.unpacking.unpack_path(roots, payloads)
+        return {
+            'path': path,
+            'routes': routes,
+            'roots': roots,
+            'arrival': winner_weight + self.graph.time_origin,
+            'duration': to_milliseconds(time.monotonic() - start_time)
+        }
+
+    def _update_vertex(self, node: int, winner_node: int, winner_weight: int, down_move: bool, f,
+                       lower_bound: float, best_upper_bound: float):
+        """
+        Update vertex iteration in the forward search.
+        Priority of the node is arrival plus lower bound of travel time to the target,
+        nodes which cannot improve the best upper bound are skipped
+
+        :param node: int Node information about which we update
+        :param winner_node: int. Parent node from each we reach this node
+        :param winner_weight: Time at which we have been at winner_node
+        :param down_move: bool True in case of movement down
+        :param f: ATF Function of the edge from winner_node to node
+        :param lower_bound: Lower bound of travel time from node to the target, 0 for up moves
+        :param best_upper_bound: Best upper bound of arrival to the target
+        :return:
+        """
+        new_weight, payload = f.arrival(winner_weight)
+        if new_weight + lower_bound > best_upper_bound:
+            return
+        if new_weight < self.candidate_weights.get(node, math.inf):
+            self.candidate_down_move[node] = down_move
+            self.candidate_weights[node] = new_weight
+            self.candidate_priorities[node] = new_weight + lower_bound
+            self.candidate_labels[node] = len(self.label_nodes)
+            self.label_nodes.append(node)
+            self.label_parents.append(self.candidate_labels[winner_node])
+            self.label_payloads.append(payload)
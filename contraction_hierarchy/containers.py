@@ -0,0 +1,199 @@
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Iterable, Mapping, Union, Tuple
+
+INTERVAL_SIZE = 2 * array('i').itemsize
+
+
+class IntervalContainer:
+    __slots__ = 'numbers', 'starts', 'ends'
+
+    def __init__(self, numbers: Dict[int, int], starts: array, ends: array):
+        """
+        Geometrical container as sorted disjoint intervals of DFS post-order numbers.
+        For the tree-like part of the downward graph all nodes below the node get one interval
+        :param numbers: Dict[int, int] DFS post-order number of every node, shared by all containers
+        :param starts: array Starts of intervals
+        :param ends: array Ends of intervals, inclusive
+        """
+        self.numbers = numbers
+        self.starts = starts
+        self.ends = ends
+
+    def __contains__(self, node: int) -> bool:
+        number = self.numbers.get(node, -1)
+        i = bisect_right(self.starts, number) - 1
+        return i >= 0 and number <= self.ends[i]
+
+    def post_order(self) -> List[int]:
+        """
+        :return: List[int] Sorted post-order numbers of nodes in the container
+        """
+        return [number for start, end in zip(self.starts, self.ends) for number in range(start, end + 1)]
+
+    def nbytes(self) -> int:
+        return len(self.starts) * INTERVAL_SIZE
+
+
+class BitsetContainer:
+    __slots__ = 'numbers', 'base', 'bits'
+
+    def __init__(self, numbers: Dict[int, int], base: int, bits: int):
+        """
+        Geometrical container as bitset of DFS post-order numbers, which starts from the smallest number in it.
+        Bitset is kept in python int, so the check is a single shift
+        :param numbers: Dict[int, int] DFS post-order number of every node, shared by all containers
+        :param base: int The smallest post-order number in the container
+        :param bits: int Bit number - base is set for every node in the container
+        """
+        self.numbers = numbers
+        self.base = base
+        self.bits = bits
+
+    def __contains__(self, node: int) -> bool:
+        number = self.numbers.get(node, -1) - self.base
+        return number >= 0 and bool(self.bits >> number & 1)
+
+    def post_order(self) -> List[int]:
+        """
+        :return: List[int] Sorted post-order numbers of nodes in the container
+        """
+        return [self.base + i for i in range(self.bits.bit_length()) if self.bits >> i & 1]
+
+    def nbytes(self) -> int:
+        return (self.bits.bit_length() + 7) // 8
+
+
+Container = Union[IntervalContainer, BitsetContainer]
+
+
+class Corridor(dict):
+    def __init__(self, containers: Mapping[int, Container], target: int):
+        """
+        Nodes with the target in geometrical container, filled lazily during one query.
+        The container of the node is checked once, then corridor[node] is plain dict lookup
+        :param containers: Mapping[int, Container] Geometrical containers of all nodes
+        :param target: int Target node of the query
+        """
+        super().__init__()
+        self.containers = containers
+        self.target = target
+
+    def __missing__(self, node: int) -> bool:
+        inside = self[node] = self.target in self.containers[node]
+        return inside
+
+
+def post_order_numbers(down: Dict[int, List[int]], roots: Iterable[int]) -> Dict[int, int]:
+    """
+    Number nodes in post-order of depth first search over the downward graph
+    :param down: Dict[int, List[int]] Lower neighbours of every node
+    :param roots: Iterable[int] Start nodes of the search, the highest first
+    :return: Dict[int, int]
+    """
+    numbers = {}
+    visited = set()
+    for root in roots:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(down.get(root, ())))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(down.get(child, ()))))
+                    break
+            else:
+                stack.pop()
+                numbers[node] = len(numbers)
+    return numbers
+
+
+def compact_container(numbers: Dict[int, int], bits: int) -> Container:
+    """
+    The smallest representation of the container: intervals or bitset
+    :param numbers: Dict[int, int] DFS post-order number of every node
+    :param bits: int Bitset of post-order numbers of nodes in the container
+    :return:
+    """
+    starts = array('i')
+    ends = array('i')
+    rest = bits
+    while rest:
+        # adding the lowest bit clears the lowest run of ones and sets the bit after it
+        start = (rest & -rest).bit_length() - 1
+        rest += rest & -rest
+        end = (rest & -rest).bit_length() - 2
+        rest -= rest & -rest
+        starts.append(start)
+        ends.append(end)
+    base = starts[0] if starts else 0
+    if len(starts) * INTERVAL_SIZE <= ((bits >> base).bit_length() + 7) // 8:
+        return IntervalContainer(numbers, starts, ends)
+    return BitsetContainer(numbers, base, bits >> base)
+
+
+def _compact_containers(chunk: List[Tuple[int, int]]) -> List[Tuple[int, Container]]:
+    """
+    Compact containers of the chunk in the worker process, post-order numbers are set by the parent process
+    :param chunk: [(node, bitset of post-order numbers)]
+    :return: [(node, container)]
+    """
+    return [(node, compact_container(None, bits)) for node, bits in chunk]
+
+
+def geometrical_containers(down: Dict[int, List[int]], order: List[int], processes: int = 1
+                           ) -> Dict[int, Container]:
+    """
+    Geometrical containers of all nodes: nodes reachable by down moves, including the node itself.
+    Downward graph is DAG, so containers are built bottom-up in one pass without recursion: bitset of the node
+    is the union of bitsets of its lower neighbours. Bitset is compacted into intervals or trimmed bitset,
+    as soon as it is built, and dropped, when all higher neighbours got it, so only the frontier of bitsets
+    is kept. In the process pool full chunks of bitsets are submitted, while the pass goes on
+    :param down: Dict[int, List[int]] Lower neighbours of every node
+    :param order: List[int] Nodes from the highest to the lowest one
+    :param processes: int Count of worker processes for compaction, 1 to compact in the current process
+    :return: Dict[int, Container]
+    """
+    numbers = post_order_numbers(down, order)
+    remaining_parents = dict.fromkeys(order, 0)
+    for node in order:
+        for child in down.get(node, ()):
+            remaining_parents[child] += 1
+
+    containers = {}
+    executor = ProcessPoolExecutor(processes) if processes > 1 else None
+    chunksize = max(1, len(order) // (4 * processes))
+    chunk = []
+    futures = []
+    reachable = {}
+    try:
+        for node in reversed(order):
+            bits = 1 << numbers[node]
+            for child in down.get(node, ()):
+                bits |= reachable[child]
+                remaining_parents[child] -= 1
+                if not remaining_parents[child]:
+                    del reachable[child]
+            if remaining_parents[node]:
+                reachable[node] = bits
+            if executor is None:
+                containers[node] = compact_container(numbers, bits)
+                continue
+            chunk.append((node, bits))
+            if len(chunk) == chunksize:
+                futures.append(executor.submit(_compact_containers, chunk))
+                chunk = []
+        if chunk:
+            futures.append(executor.submit(_compact_containers, chunk))
+        for future in futures:
+            for node, container in future.result():
+                container.numbers = numbers
+                containers[node] = container
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return containers
@@ -0,0 +1,184 @@
+import heapq
+import logging
+import math
+import time
+from typing import Union, Dict, List, Tuple
+
+import numpy as np
+
+from timetable import Timetable
+from algorithms_wrapper import _check_running_time
+from utils import to_milliseconds
+
+# connections are taken from numpy columns by blocks, so early termination does not convert the whole day
+CONNECTION_BLOCK = 1024
+
+
+class CSA:
+    def __init__(self, timetable: Timetable, start_time: int, start_node: int, end_node: Union[int, None] = None):
+        """
+        Connection Scan Algorithm over the raw timetable, no preprocessing is needed.
+        Connections are scanned once in order of departure from the first one after the start time.
+        Connection is taken, when its trip is already reached or its departure stop is reached in time.
+        Walk connections are not transitively closed, so they are relaxed by Dijkstra, which runs along the scan.
+        Scan stops, when departure passes the arrival to the target. Without the target all stops are found.
+        More information could be found by the next link:
+        https://arxiv.org/abs/1703.05997
+
+        :param timetable: Timetable Raw timetable of the city
+        :param start_time: int Start time in unix
+        :param start_node: int Start stop
+        :param end_node: int Target stop or None to find arrivals to all stops
+        """
+        self.timetable = timetable
+        self.source = start_node
+        self.target = end_node
+        self.start_time = start_time - timetable.time_origin
+
+        n = len(timetable)
+        self.arrivals = [math.inf] * n
+        # (previous stop, boarding connection, alighting connection) or (previous stop, None, None) for walk
+        self.parents = [None] * n
+        # boarding connection of every reached trip or -1
+        self.boardings = [-1] * timetable.connections.trip_count
+
+    def shortest_path(self, duration: Union[float, None] = None) -> Dict[str, Union[List[Union[int, str]], int]]:
+        """
+        Find shortest path query
+
+        :param duration: Maximum allowed duration of process time in seconds
+        :return: {'path', 'routes', 'roots', 'arrival', 'duration'} as in Dijkstra
+        """
+        start_time = time.monotonic()
+        index = self.timetable.index
+        source = index.get(self.source)
+        target = index.get(self.target)
+        if source is not None and target is not None:
+            self._scan(source, target, start_time, duration)
+
+        if target is None or self.arrivals[target] == math.inf:
+            message = f"Target {self.target} not reachable from node {self.source}"
+            logging.warning(message)
+            return {
+                'path': [],
+                'routes': [],
+                'roots': [],
+                'arrival': math.inf,
+                'duration': to_milliseconds(time.monotonic() - start_time)
+            }
+        path, routes = self._journey(source, target)
+        return {
+            'path': path,
+            'routes': routes,
+            'roots': path,
+            'arrival': self.arrivals[target] + self.timetable.time_origin,
+            'duration': to_milliseconds(time.monotonic() - start_time)
+        }
+
+    def earliest_arrivals(self, duration: Union[float, None] = None) -> Dict[int, int]:
+        """
+        Earliest arrivals to all stops, the target is not used
+
+        :param duration: Maximum allowed duration of process time in seconds
+        :return: {stop: arrival in unix} for reachable stops
+        """
+        source = self.timetable.index.get(self.source)
+        if source is None:
+            return {}
+        self._scan(source, None, time.monotonic(), duration)
+        time_origin = self.timetable.time_origin
+        return {stop: arrival + time_origin
+                for stop, arrival in zip(self.timetable.stops, self.arrivals) if arrival != math.inf}
+
+    def _scan(self, source: int, target: Union[int, None], start_time: float, duration: Union[float, None]):
+        """
+        Scan connections departing after the start time
+        :param source: int Dense index of the source
+        :param target: int Dense index of the target or None to scan the whole day
+        :param start_time: float Start of the process time
+        :param duration: Maximum allowed duration of process time in seconds
+        :return:
+        """
+        connections = self.timetable.connections
+        arrivals, parents, boardings = self.arrivals, self.parents, self.boardings
+        arrivals[source] = self.start_time
+        queue = [(self.start_time, source)]
+
+        first = int(np.searchsorted(connections.departures, self.start_time))
+        for block in range(first, len(connections), CONNECTION_BLOCK):
+            if _check_running_time(start_time, duration, "CSA"):
+                return
+            end = block + CONNECTION_BLOCK
+            for connection, from_stop, to_stop, departure, arrival, trip in zip(
+                    range(block, end),
+                    connections.from_stops[block:end].tolist(),
+                    connections.to_stops[block:end].tolist(),
+                    connections.departures[block:end].tolist(),
+                    connections.arrivals[block:end].tolist(),
+                    connections.trips[block:end].tolist()):
+                if queue and queue[0][0] <= departure:
+                    self._footpaths(queue, departure, target)
+                if target is not None and departure >= arrivals[target]:
+                    self._footpaths(queue, arrivals[target], target)
+                    return
+                boarding = boardings[trip]
+                if boarding < 0:
+                    if arrivals[from_stop] > departure:
+                        continue
+                    boardings[trip] = boarding = connection
+                if arrival < arrivals[to_stop]:
+                    arrivals[to_stop] = arrival
+                    parents[to_stop] = (int(connections.from_stops[boarding]), boarding, connection)
+                    heapq.heappush(queue, (arrival, to_stop))
+        self._footpaths(queue, math.inf, target)
+
+    def _footpaths(self, queue: List[Tuple[int, int]], until: float, target: Union[int, None]):
+        """
+        Relax walk connections by Dijkstra, which is shared by the whole scan: stops are settled in order
+        of arrival, when the scan reaches their arrival, so walk paths of many connections are found
+        and walk connections of every stop are relaxed about once
+        :param queue: [(arrival, stop)] Improved stops, which are not settled yet
+        :param until: Settle stops with arrival not later than this time
+        :param target: int Dense index of the target or None
+        :return:
+        """
+        footpaths = self.timetable.footpaths
+        arrivals, parents = self.arrivals, self.parents
+        while queue and queue[0][0] <= until:
+            arrival, stop = heapq.heappop(queue)
+            if arrival > arrivals[stop]:
+                continue
+            bound = arrivals[target] if target is not None else math.inf
+            for next_stop, walk_duration in footpaths[stop]:
+                new_arrival = arrival + walk_duration
+                if new_arrival < arrivals[next_stop] and new_arrival < bound:
+                    arrivals[next_stop] = new_arrival
+                    parents[next_stop] = (stop, None, None)
+                    heapq.heappush(queue, (new_arrival, next_stop))
+
+    def _journey(self, source: int, target: int) -> Tuple[List[int], List[str]]:
+        """
+        Restore stops and route names of the path from parents of labels
+        :param source: int Dense index of the source
+        :param target: int Dense index of the target
+        :return: (stops, route names of every move between consecutive stops)
+        """
+        timetable = self.timetable
+        connections = timetable.connections
+        legs = []
+        stop = target
+        while stop != source:
+            previous_stop, boarding, alighting = self.parents[stop]
+            if boarding is None:
+                legs.append(([stop], ['walk']))
+            else:
+                trip = connections.trip_order[connections.positions[boarding]:connections.positions[alighting] + 1]
+                stops = connections.to_stops[trip].tolist()
+                legs.append((stops, [str(connections.routes[alighting])] * len(stops)))
+            stop = previous_stop
+        path = [timetable.stops[source]]
+        routes = []
+        for stops, route_names in reversed(legs):
+            path.extend(timetable.stops[stop] for stop in stops)
+            routes.extend(route_names)
+        return path, routes
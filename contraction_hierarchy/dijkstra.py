@@ -1,20 +1,23 @@
 from typing import Union, Dict, List
-import heapdict
+from collections import defaultdict
 import time
 import math
 import logging
-# from bisect import bisect_left
-from binary_search import bisect_left
+from bisect import bisect_left
 
 from graph import TransportGraph
+from query_graph import QueryGraph
 from algorithms_wrapper import _check_running_time
 from utils import to_milliseconds
+from queues import priority_queue
+from unpacking import follow_parents
 from ttf import TTF
 from atf import ATF
 
 
 class Dijkstra:
-    def __init__(self, graph: TransportGraph, start_time: int, start_node: int, end_node: int):
+    def __init__(self, graph: TransportGraph, start_time: int, start_node: int, end_node: int,
+                 queue: str = 'heapq', goal_directed: bool = False):
         """
         Realization of Dijkstra algorithm
         https://en.wikipedia.org/wiki/Dijkstra%27s_algorithm
@@ -23,18 +26,28 @@ class Dijkstra:
         :param start_time: int Start time in unix
         :param start_node: int Start node from, which we build a path
         :param end_node: int Target node
+        :param queue: str Priority queue of labels: 'heapdict', 'heapq', 'indexed' or 'radix', see queues.priority_queue
+        :param goal_directed: bool A* search: labels are prioritized by arrival plus lower bound of travel time
+                              to the target from landmarks (graph.landmarks_precomputation), result is the same.
+                              Nodes, from which the target is not reachable by lower bounds, are not visited
         """
         self.graph = graph
 
         self.source = start_node
         self.target = end_node
-        self.start_time = start_time
-
-        self.candidate_weights = {self.source: start_time}
-        self.candidate_priorities = heapdict.heapdict({self.source: start_time})
-        self.candidate_sequences = {self.source: [self.source]}
-        self.candidate_route_names = {self.source: []}
-        self.candidate_roots = {self.source: [self.source]}
+        self.start_time = start_time - graph.time_origin
+
+        self.candidate_weights = {self.source: self.start_time}
+        if goal_directed and graph.landmarks is None:
+            graph.landmarks_precomputation()
+        self.goal_directed = goal_directed
+        # compiled graph fills potentials of the target in its Router
+        self.potentials = (graph.landmarks.potentials(end_node) if goal_directed and not isinstance(graph, QueryGraph)
+                           else defaultdict(int))
+        self.queue = queue
+        self.candidate_priorities = priority_queue(queue, {self.source: self.start_time})
+        self.candidate_parents = {self.source: None}
+        self.candidate_payloads = {}
 
     def shortest_path(self,
                       duration: Union[float, None] = None,
@@ -42,6 +55,11 @@ class Dijkstra:
                       fractional_cascading: bool = False
                       ) -> Dict[str, Union[List[Union[int, str]], int]]:
 
+        if isinstance(self.graph, QueryGraph):
+            # compiled graph has its own search over dense indexes, TTN and fractional cascading are not used
+            return self.graph.shortest_path(self.start_time, self.source, self.target, duration, self.queue,
+                                            self.goal_directed, algorithm="Dijkstra")
+
         exception = None
 
         winner_node = self.source
@@ -58,7 +76,8 @@ class Dijkstra:
                     reachable_nodes = self.graph.reachable_nodes.get(winner_node)
                     out = self.graph.graph.get(winner_node)
                     if pointers:
-                        start_index, next_loc = pointers[0][bisect_left(m_arr[0], winner_weight)]
+                        position = 2 * bisect_left(m_arr[0], winner_weight)
+                        start_index, next_loc = pointers[0][position], pointers[0][position + 1]
 
                         node = reachable_nodes[0]
                         self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node, winner_weight,
@@ -66,9 +85,11 @@ class Dijkstra:
 
                         for i in range(1, len(m_arr)):
                             if winner_weight <= m_arr[i][next_loc - 1]:
-                                start_index, next_loc = pointers[i][next_loc - 1]
+                                position = 2 * next_loc - 2
+                                start_index, next_loc = pointers[i][position], pointers[i][position + 1]
                             else:
-                                start_index, next_loc = pointers[i][next_loc]
+                                position = 2 * next_loc
+                                start_index, next_loc = pointers[i][position], pointers[i][position + 1]
 
                             node = reachable_nodes[i]
                             self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node,
@@ -79,7 +100,8 @@ class Dijkstra:
                                                                                               winner_weight, out, node)
 
                     try:
-                        winner_node, winner_weight = self.candidate_priorities.popitem()
+                        winner_node, _ = self.candidate_priorities.popitem()
+                        winner_weight = self.candidate_weights[winner_node]
                     except IndexError:
                         message = f"Target {self.target} not reachable from node {self.source}"
                         logging.warning(message)
@@ -97,13 +119,18 @@ class Dijkstra:
                     exception = _check_running_time(start_time, duration, "Dijkstra")
 
                     departure = bisect_left(self.graph.nodes_schedule[winner_node], winner_weight)
-                    nodes_indexes = self.graph.position_in_edge[winner_node].get(departure) #{nodeA: start_index, nodeB: start_index}
+                    out = self.graph.graph[winner_node]
+                    # row of the departure in TTN matrix, None after the last departure
+                    row = departure * len(out) if departure < len(self.graph.nodes_schedule[winner_node]) else None
+                    positions = self.graph.position_in_edge[winner_node]
 
-                    for node, f in self.graph.graph[winner_node].items():
-                        self._update_vertex_with_node_index(node, winner_node, winner_weight, nodes_indexes)
+                    for column, node in enumerate(out):
+                        start_index = positions[row + column] if row is not None else None
+                        self._update_vertex_with_node_index(node, winner_node, winner_weight, start_index)
 
                     try:
-                        winner_node, winner_weight = self.candidate_priorities.popitem()
+                        winner_node, _ = self.candidate_priorities.popitem()
+                        winner_weight = self.candidate_weights[winner_node]
                     except IndexError:
                         message = f"Target {self.target} not reachable from node {self.source}"
                         logging.warning(message)
@@ -124,7 +151,8 @@ class Dijkstra:
                     self._update_vertex(node, winner_node, winner_weight, f)
 
                 try:
-                    winner_node, winner_weight = self.candidate_priorities.popitem()
+                    winner_node, _ = self.candidate_priorities.popitem()
+                    winner_weight = self.candidate_weights[winner_node]
                 except IndexError:
                     message = f"Target {self.target} not reachable from node {self.source}"
                     logging.warning(message)
@@ -135,20 +163,13 @@ class Dijkstra:
                         'arrival': math.inf,
                         'duration': to_milliseconds(time.monotonic() - start_time)
                     }
-        if exception:
-            return {
-                'path': self.candidate_sequences[winner_node],
-                'routes': self.candidate_route_names[winner_node],
-                'roots': self.candidate_roots[winner_node],
-                'arrival': winner_weight,
-                'duration': to_milliseconds(time.monotonic() - start_time)
-            }
-
+        roots, payloads = follow_parents(winner_node, self.candidate_parents, self.candidate_payloads)
+        path, routes = self.graph.unpacking.unpack_path(roots, payloads)
         return {
-            'path': self.candidate_sequences[self.target],
-            'routes': self.candidate_route_names[winner_node],
-            'roots': self.candidate_roots[winner_node],
-            'arrival': winner_weight,
+            'path': path,
+            'routes': routes,
+            'roots': roots,
+            'arrival': winner_weight + self.graph.time_origin,
             'duration': to_milliseconds(time.monotonic() - start_time)
         }
 
@@ -162,63 +183,56 @@ class Dijkstra:
         :param f: Union[ATF, TTF] Function, which represent movement from winner_node to node
         :return:
         """
-        new_weight, sequence_nodes, route_names = f.arrival(winner_weight)
+        new_weight, payload = f.arrival(winner_weight)
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
     def _update_vertex_with_node_index(self, node: int, winner_node: int, winner_weight: int,
-                                       nodes_indexes: Dict[int, int]):
+                                       start_index: Union[int, None]):
         """
         Update vertex in TTN mode
 
         :param node: int Node information about which we update
         :param winner_node: int. Parent node from each we reach this node
         :param winner_weight: Time in unix at which we have been at winner_node
-        :param nodes_indexes: Dict[int, int] Dictionaries, where key values are nodes
-                            and values is index in ATF Bus profile
+        :param start_index: int Index of the first connection not earlier than winner_weight from TTN
+                            or None after the last departure from winner_node
         :return:
         """
         l = walk_time = math.inf
-        sequence_nodes = []
-        route_names = []
+        payload = None
         f = self.graph.graph[winner_node][node]
-        if nodes_indexes:
-            start_index = nodes_indexes[node]
+        if start_index is not None:
             if start_index < f.size:
-                l = f.buses[start_index].a
-                sequence_nodes = f.buses[start_index].nodes
-                route_names = f.buses[start_index].route_names
+                l = f.a[start_index]
+                payload = f.p[start_index]
         if f.walk:
             walk_time = winner_weight + f.walk.w
         if walk_time < l:
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+            new_weight, payload = walk_time, f.walk.payload
         else:
-            new_weight, sequence_nodes, route_names = l, sequence_nodes, route_names
+            new_weight = l
 
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
     def _update_vertex_with_node_index_fractional_cascading_bus_profile(self, winner_node: int, winner_weight: int, out,
                                                                         node, start_index):
@@ -231,33 +245,29 @@ class Dijkstra:
         """
         f = out[node]
         l = walk_time = math.inf
-        sequence_nodes = []
-        route_names = []
+        payload = None
         if start_index is not None:
             if start_index < f.size:
-                l = f.buses[start_index].a
-                sequence_nodes = f.buses[start_index].nodes
-                route_names = f.buses[start_index].route_names
+                l = f.a[start_index]
+                payload = f.p[start_index]
         if f.walk:
             walk_time = winner_weight + f.walk.w
         if walk_time < l:
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+            new_weight, payload = walk_time, f.walk.payload
         else:
-            new_weight, sequence_nodes, route_names = l, sequence_nodes, route_names
+            new_weight = l
 
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
     def _update_vertex_with_node_index_fractional_cascading_walk_profile(self, winner_node: int, winner_weight: int,
                                                                          out, node):
@@ -272,18 +282,16 @@ class Dijkstra:
         f = out[node]
         if f.walk:
             walk_time = winner_weight + f.walk.w
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+            new_weight, payload = walk_time, f.walk.payload
             if node in self.candidate_weights.keys():
                 if new_weight < self.candidate_weights[node]:
                     self.candidate_weights[node] = new_weight
-                    self.candidate_priorities[node] = new_weight
-                    self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                    self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                    self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-            elif new_weight != math.inf:
+                    self.candidate_priorities[node] = new_weight + self.potentials[node]
+                    self.candidate_parents[node] = winner_node
+                    self.candidate_payloads[node] = payload
+            elif new_weight + self.potentials[node] != math.inf:
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
 
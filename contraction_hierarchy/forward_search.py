@@ -1,18 +1,22 @@
 from typing import Union, Dict, List
-import heapdict
+from collections import defaultdict
 import time
 import math
 import logging
-# from bisect import bisect_left
-from binary_search import bisect_left
+from bisect import bisect_left
 
+from containers import Corridor
 from graph import ContactionTransportGraph
+from query_graph import QueryGraph
 from algorithms_wrapper import _check_running_time
 from utils import to_milliseconds
+from queues import priority_queue
+from unpacking import follow_parents
 
 
 class FCH:
-    def __init__(self, graph: ContactionTransportGraph, start_time: int, start_node: int, end_node: int):
+    def __init__(self, graph: ContactionTransportGraph, start_time: int, start_node: int, end_node: int,
+                 queue: str = 'heapq', goal_directed: bool = False):
         """
         Forward Search over Contraction Hieararchy
         More information could bw found by the next link:
@@ -22,28 +26,34 @@ class FCH:
         :param start_time: int Start time in unix time
         :param start_node: int Start node
         :param end_node: int End node
+        :param queue: str Priority queue of labels: 'heapdict', 'heapq', 'indexed' or 'radix', see queues.priority_queue
+        :param goal_directed: bool A* search: labels are prioritized by arrival plus lower bound of travel time
+                              to the target from landmarks (graph.landmarks_precomputation), result is the same.
+                              Nodes, from which the target is not reachable by lower bounds, are not visited
         """
         self.graph = graph
 
         self.source = start_node
         self.target = end_node
-        self.start_time = start_time
-
-        self.candidate_weights = {self.source: start_time}
-        self.candidate_priorities = heapdict.heapdict({self.source: start_time})
-        self.candidate_sequences = {self.source: [self.source]}
-        self.candidate_roots = {self.source: [self.source]}
-        self.candidate_route_names = {self.source: []}
+        self.start_time = start_time - graph.time_origin
+
+        self.candidate_weights = {self.source: self.start_time}
+        if goal_directed and graph.landmarks is None:
+            graph.landmarks_precomputation()
+        self.goal_directed = goal_directed
+        # compiled graph fills potentials of the target in its Router
+        self.potentials = (graph.landmarks.potentials(end_node) if goal_directed and not isinstance(graph, QueryGraph)
+                           else defaultdict(int))
+        self.queue = queue
+        self.candidate_priorities = priority_queue(queue, {self.source: self.start_time})
+        self.candidate_parents = {self.source: None}
+        self.candidate_payloads = {}
         self.candidate_down_move = {self.source: False}
-        self.lower_upper_index = {self.source: (0, None)}
-        self.lower_index = {self.source: 0}
-        self.candidate_schedule = {self.source: self.graph.nodes_schedule[start_node]}
 
     def shortest_path(self,
                       duration: Union[float, None] = None,
                       geometrical_containers=True,
                       optimized_binary_search: bool = True,
-                      next_index_optimization=False,  # Tested, but not working jet
                       fractional_cascading=False,
                       fractional_cascading_old=False
                       ) -> Dict[str, Union[List[Union[int, str]], int]]:
@@ -53,10 +63,14 @@ class FCH:
         :param duration: Maximum allowed duration of process time in seconds
         :param geometrical_containers: bool Boolean switcher for Geometrical containers in FS
         :param optimized_binary_search: bool Boolean switcher for TTN mode
-        :param next_index_optimization: bool Work in progress.
         :return:
         """
 
+        if isinstance(self.graph, QueryGraph):
+            # compiled graph has its own search over dense indexes, TTN and fractional cascading are not used
+            return self.graph.shortest_path(self.start_time, self.source, self.target, duration, self.queue,
+                                            self.goal_directed, geometrical_containers, algorithm="FCH")
+
         exception = None
 
         winner_node = self.source
@@ -66,6 +80,7 @@ class FCH:
         nodes_schedule = self.graph.nodes_schedule
 
         if geometrical_containers:
+            corridor = Corridor(self.graph.geometrical_containers, self.target)
             if optimized_binary_search:
                 if fractional_cascading_old:
 
@@ -79,7 +94,8 @@ class FCH:
                         out = self.graph.graph.get(winner_node)
                         down_move = self.candidate_down_move[winner_node]
                         if pointers:
-                            start_index, next_loc = pointers[0][bisect_left(m_arr[0], winner_weight)]
+                            position = 2 * bisect_left(m_arr[0], winner_weight)
+                            start_index, next_loc = pointers[0][position], pointers[0][position + 1]
 
                             node = reachable_nodes[0]
                             if not down_move:
@@ -90,7 +106,7 @@ class FCH:
                                         out, node,
                                         start_index,
                                         False)
-                                elif self.target in self.graph.geometrical_containers[node]:
+                                elif corridor[node]:
                                     self._update_vertex_with_node_index_fractional_cascading_bus_profile(
                                         winner_node,
                                         winner_weight,
@@ -98,7 +114,7 @@ class FCH:
                                         start_index,
                                         True)
                             elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                                  (self.target in self.graph.geometrical_containers[node])):
+                                  (corridor[node])):
                                 self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node,
                                                                                                      winner_weight,
                                                                                                      out, node,
@@ -106,9 +122,11 @@ class FCH:
                                                                                                      True)
                             for i in range(1, len(m_arr)):
                                 if winner_weight <= m_arr[i][next_loc - 1]:
-                                    start_index, next_loc = pointers[i][next_loc - 1]
+                                    position = 2 * next_loc - 2
+                                    start_index, next_loc = pointers[i][position], pointers[i][position + 1]
                                 else:
-                                    start_index, next_loc = pointers[i][next_loc]
+                                    position = 2 * next_loc
+                                    start_index, next_loc = pointers[i][position], pointers[i][position + 1]
 
                                 node = reachable_nodes[i]
                                 if not down_move:
@@ -119,7 +137,7 @@ class FCH:
                                             out, node,
                                             start_index,
                                             False)
-                                    elif self.target in self.graph.geometrical_containers[node]:
+                                    elif corridor[node]:
                                         self._update_vertex_with_node_index_fractional_cascading_bus_profile(
                                             winner_node,
                                             winner_weight,
@@ -127,7 +145,7 @@ class FCH:
                                             start_index,
                                             True)
                                 elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                                      (self.target in self.graph.geometrical_containers[node])):
+                                      (corridor[node])):
                                     self._update_vertex_with_node_index_fractional_cascading_bus_profile(
                                         winner_node,
                                         winner_weight,
@@ -142,21 +160,22 @@ class FCH:
                                         winner_weight,
                                         out, node,
                                         False)
-                                elif self.target in self.graph.geometrical_containers[node]:
+                                elif corridor[node]:
                                     self._update_vertex_with_node_index_fractional_cascading_walk_profile(
                                         winner_node,
                                         winner_weight,
                                         out, node,
                                         True)
                             elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                                  (self.target in self.graph.geometrical_containers[node])):
+                                  (corridor[node])):
                                 self._update_vertex_with_node_index_fractional_cascading_walk_profile(winner_node,
                                                                                                       winner_weight,
                                                                                                       out, node,
                                                                                                       True)
 
                         try:
-                            winner_node, winner_weight = self.candidate_priorities.popitem()
+                            winner_node, _ = self.candidate_priorities.popitem()
+                            winner_weight = self.candidate_weights[winner_node]
                         except IndexError:
                             message = f"Target {self.target} not reachable from node {self.source}"
                             logging.warning(message)
@@ -180,22 +199,24 @@ class FCH:
                             node = reachable_nodes[0]
 
                             if not down_move:
-                                start_index, next_loc = pointers[0][bisect_left(m_arr[0], winner_weight)]
+                                position = 2 * bisect_left(m_arr[0], winner_weight)
+                                start_index, next_loc = pointers[0][position], pointers[0][position + 1]
                                 if self.graph.hierarchy[node] > self.graph.hierarchy[winner_node]:
                                     self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node,
                                                                                                          winner_weight,
                                                                                                          out, node,
                                                                                                          start_index,
                                                                                                          False)
-                                elif self.target in self.graph.geometrical_containers[node]:
+                                elif corridor[node]:
                                     self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node,
                                                                                                          winner_weight,
                                                                                                          out, node,
                                                                                                          start_index,
                                                                                                          True)
                             elif self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]:
-                                start_index, next_loc = pointers[0][bisect_left(m_arr[0], winner_weight)]
-                                if self.target in self.graph.geometrical_containers[node]:
+                                position = 2 * bisect_left(m_arr[0], winner_weight)
+                                start_index, next_loc = pointers[0][position], pointers[0][position + 1]
+                                if corridor[node]:
                                     self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node,
                                                                                                          winner_weight,
                                                                                                          out, node,
@@ -210,9 +231,11 @@ class FCH:
                                     node = reachable_nodes[i]
                                     if not down_move:
                                         if winner_weight <= m_arr[i][next_loc - 1]:
-                                            start_index, next_loc = pointers[i][next_loc - 1]
+                                            position = 2 * next_loc - 2
+                                            start_index, next_loc = pointers[i][position], pointers[i][position + 1]
                                         else:
-                                            start_index, next_loc = pointers[i][next_loc]
+                                            position = 2 * next_loc
+                                            start_index, next_loc = pointers[i][position], pointers[i][position + 1]
                                         if self.graph.hierarchy[node] > self.graph.hierarchy[winner_node]:
                                             self._update_vertex_with_node_index_fractional_cascading_bus_profile(
                                                 winner_node,
@@ -220,7 +243,7 @@ class FCH:
                                                 out, node,
                                                 start_index,
                                                 False)
-                                        elif self.target in self.graph.geometrical_containers[node]:
+                                        elif corridor[node]:
                                             self._update_vertex_with_node_index_fractional_cascading_bus_profile(
                                                 winner_node,
                                                 winner_weight,
@@ -229,10 +252,12 @@ class FCH:
                                                 True)
                                     elif self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]:
                                         if winner_weight <= m_arr[i][next_loc - 1]:
-                                            start_index, next_loc = pointers[i][next_loc - 1]
+                                            position = 2 * next_loc - 2
+                                            start_index, next_loc = pointers[i][position], pointers[i][position + 1]
                                         else:
-                                            start_index, next_loc = pointers[i][next_loc]
-                                        if self.target in self.graph.geometrical_containers[node]:
+                                            position = 2 * next_loc
+                                            start_index, next_loc = pointers[i][position], pointers[i][position + 1]
+                                        if corridor[node]:
                                             self._update_vertex_with_node_index_fractional_cascading_bus_profile(winner_node,
                                                                                                              winner_weight,
                                                                                                              out, node,
@@ -250,21 +275,22 @@ class FCH:
                                         winner_weight,
                                         out, node,
                                         False)
-                                elif self.target in self.graph.geometrical_containers[node]:
+                                elif corridor[node]:
                                     self._update_vertex_with_node_index_fractional_cascading_walk_profile(
                                         winner_node,
                                         winner_weight,
                                         out, node,
                                         True)
                             elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                                  (self.target in self.graph.geometrical_containers[node])):
+                                  (corridor[node])):
                                 self._update_vertex_with_node_index_fractional_cascading_walk_profile(winner_node,
                                                                                                       winner_weight,
                                                                                                       out, node,
                                                                                                       True)
 
                         try:
-                            winner_node, winner_weight = self.candidate_priorities.popitem()
+                            winner_node, _ = self.candidate_priorities.popitem()
+                            winner_weight = self.candidate_weights[winner_node]
                         except IndexError:
                             message = f"Target {self.target} not reachable from node {self.source}"
                             logging.warning(message)
@@ -274,67 +300,36 @@ class FCH:
                                 'arrival': math.inf,
                                 'duration': to_milliseconds(time.monotonic() - start_time)
                             }
-                elif not next_index_optimization:
+                else:
 
                     start_time = time.monotonic()
                     while (winner_node != self.target) and (not exception):
                         exception = _check_running_time(start_time, duration, "FCH")
                         departure = bisect_left(nodes_schedule[winner_node], winner_weight)
-                        nodes_indexes = position_in_edge[winner_node].get(departure)
-                        for node in self.graph.graph[winner_node]:
-                            if not self.candidate_down_move[winner_node]:
-                                if self.graph.hierarchy[node] > self.graph.hierarchy[winner_node]:
-                                    self._update_vertex_with_node_index(node, winner_node, winner_weight, False,
-                                                                        nodes_indexes)
-                                elif self.target in self.graph.geometrical_containers[node]:
-                                    self._update_vertex_with_node_index(node, winner_node, winner_weight, True,
-                                                                        nodes_indexes)
-                            elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                                  (self.target in self.graph.geometrical_containers[node])):
-                                self._update_vertex_with_node_index(node, winner_node, winner_weight, True,
-                                                                    nodes_indexes)
-
-                        try:
-                            winner_node, winner_weight = self.candidate_priorities.popitem()
-                        except IndexError:
-                            message = f"Target {self.target} not reachable from node {self.source}"
-                            logging.warning(message)
-                            return {
-                                'path': [],
-                                'routes': [],
-                                'arrival': math.inf,
-                                'duration': to_milliseconds(time.monotonic() - start_time)
-                            }
-
-                else:
-                    # TODO Work in progress
-                    start_time = time.monotonic()
-                    while (winner_node != self.target) and (not exception):
-                        exception = _check_running_time(start_time, duration, "FCH")
-
-                        departure = (self.lower_index[winner_node]
-                                     + bisect_left(self.candidate_schedule[winner_node], winner_weight))
-                        nodes_indexes = position_in_edge[winner_node].get(departure)
-                        for node in self.graph.graph[winner_node]:
-
+                        # row of the departure in TTN matrix, None after the last departure
+                        row = (departure * len(self.graph.graph[winner_node])
+                               if departure < len(nodes_schedule[winner_node]) else None)
+                        positions = position_in_edge[winner_node]
+                        for column, node in enumerate(self.graph.graph[winner_node]):
                             if not self.candidate_down_move[winner_node]:
                                 if self.graph.hierarchy[node] > self.graph.hierarchy[winner_node]:
-                                    self._update_vertex_with_node_index_new(node, winner_node, winner_weight, False,
-                                                                            nodes_indexes,
-                                                                            self.graph.nodes_schedule[node]
-                                                                            )
-                                elif self.target in self.graph.geometrical_containers[node]:
-                                    self._update_vertex_with_node_index_new(node, winner_node, winner_weight, True,
-                                                                            nodes_indexes,
-                                                                            self.graph.nodes_schedule_down[node])
+                                    down_move = False
+                                elif corridor[node]:
+                                    down_move = True
+                                else:
+                                    continue
                             elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                                  (self.target in self.graph.geometrical_containers[node])):
-                                self._update_vertex_with_node_index_new(node, winner_node, winner_weight, True,
-                                                                        nodes_indexes,
-                                                                        self.graph.nodes_schedule_down[node])
+                                  (corridor[node])):
+                                down_move = True
+                            else:
+                                continue
+                            start_index = positions[row + column] if row is not None else None
+                            self._update_vertex_with_node_index(node, winner_node, winner_weight, down_move,
+                                                                start_index)
 
                         try:
-                            winner_node, winner_weight = self.candidate_priorities.popitem()
+                            winner_node, _ = self.candidate_priorities.popitem()
+                            winner_weight = self.candidate_weights[winner_node]
                         except IndexError:
                             message = f"Target {self.target} not reachable from node {self.source}"
                             logging.warning(message)
@@ -354,13 +349,14 @@ class FCH:
                         if not self.candidate_down_move[winner_node]:
                             if self.graph.hierarchy[node] > self.graph.hierarchy[winner_node]:
                                 self._update_vertex(node, winner_node, winner_weight, False)
-                            elif self.target in self.graph.geometrical_containers[node]:
+                            elif corridor[node]:
                                 self._update_vertex(node, winner_node, winner_weight, True)
                         elif ((self.graph.hierarchy[node] < self.graph.hierarchy[winner_node]) &
-                              (self.target in self.graph.geometrical_containers[node])):
+                              (corridor[node])):
                             self._update_vertex(node, winner_node, winner_weight, True)
                     try:
-                        winner_node, winner_weight = self.candidate_priorities.popitem()
+                        winner_node, _ = self.candidate_priorities.popitem()
+                        winner_weight = self.candidate_weights[winner_node]
                     except IndexError:
                         message = f"Target {self.target} not reachable from node {self.source}"
                         logging.warning(message)
@@ -386,7 +382,8 @@ class FCH:
                         self._update_vertex(node, winner_node, winner_weight, True)
 
                 try:
-                    winner_node, winner_weight = self.candidate_priorities.popitem()
+                    winner_node, _ = self.candidate_priorities.popitem()
+                    winner_weight = self.candidate_weights[winner_node]
                 except IndexError:
                     message = f"Target {self.target} not reachable from node {self.source}"
                     logging.warning(message)
@@ -397,20 +394,13 @@ class FCH:
                         'arrival': math.inf,
                         'duration': to_milliseconds(time.monotonic() - start_time)
                     }
-        if exception:
-            return {
-                'path': self.candidate_sequences[winner_node],
-                'routes': self.candidate_route_names[winner_node],
-                'roots': self.candidate_roots[winner_node],
-                'arrival': winner_weight,
-                'duration': to_milliseconds(time.monotonic() - start_time)
-            }
-
+        roots, payloads = follow_parents(winner_node, self.candidate_parents, self.candidate_payloads)
+        path, routes = self.graph.unpacking.unpack_path(roots, payloads)
         return {
-            'path': self.candidate_sequences[self.target],
-            'routes': self.candidate_route_names[winner_node],
-            'roots': self.candidate_roots[winner_node],
-            'arrival': winner_weight,
+            'path': path,
+            'routes': routes,
+            'roots': roots,
+            'arrival': winner_weight + self.graph.time_origin,
             'duration': to_milliseconds(time.monotonic() - start_time)
         }
 
@@ -426,24 +416,22 @@ class FCH:
         :return:
         """
 
-        new_weight, sequence_nodes, route_names = self.graph.graph[winner_node][node].arrival(winner_weight)
+        new_weight, payload = self.graph.graph[winner_node][node].arrival(winner_weight)
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_down_move[node] = down_move
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_down_move[node] = down_move
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
-    def _update_vertex_with_node_index(self, node, winner_node, winner_weight, down_move: bool, nodes_indexes):
+    def _update_vertex_with_node_index(self, node, winner_node, winner_weight, down_move: bool, start_index):
         """
         Update vertex iteration in Forward Search
 
@@ -451,41 +439,38 @@ class FCH:
         :param winner_node: int. Parent node from each we reach this node
         :param winner_weight: Time in unix at which we have been at winner_node
         :param down_move: bool True in case of movement down
+        :param start_index: int Index of the first connection not earlier than winner_weight from TTN
+                            or None after the last departure from winner_node
         :return:
         """
 
         l = walk_time = math.inf
-        sequence_nodes = []
-        route_names = []
+        payload = None
         f = self.graph.graph[winner_node][node]
-        if nodes_indexes:
-            start_index = nodes_indexes[node]
+        if start_index is not None:
             if start_index < f.size:
-                l = f.buses[start_index].a
-                sequence_nodes = f.buses[start_index].nodes
-                route_names = f.buses[start_index].route_names
+                l = f.a[start_index]
+                payload = f.p[start_index]
         if f.walk:
             walk_time = winner_weight + f.walk.w
         if walk_time < l:
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+            new_weight, payload = walk_time, f.walk.payload
         else:
-            new_weight, sequence_nodes, route_names = l, sequence_nodes, route_names
+            new_weight = l
 
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_down_move[node] = down_move
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_down_move[node] = down_move
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
     def _update_vertex_with_node_index_fractional_cascading(self, node, winner_node, winner_weight, down_move: bool,
                                                             nodes_indexes):
@@ -500,83 +485,34 @@ class FCH:
         """
 
         l = walk_time = math.inf
-        sequence_nodes = []
-        route_names = []
+        payload = None
         f = self.graph.graph[winner_node][node]
         if nodes_indexes:
             start_index = nodes_indexes.get(node)
             if start_index is not None:
                 if start_index < f.size:
-                    l = f.buses[start_index].a
-                    sequence_nodes = f.buses[start_index].nodes
-                    route_names = f.buses[start_index].route_names
+                    l = f.a[start_index]
+                    payload = f.p[start_index]
         if f.walk:
             walk_time = winner_weight + f.walk.w
         if walk_time < l:
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+            new_weight, payload = walk_time, f.walk.payload
         else:
-            new_weight, sequence_nodes, route_names = l, sequence_nodes, route_names
+            new_weight = l
 
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_down_move[node] = down_move
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
-            self.candidate_down_move[node] = down_move
-            self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-
-    def _update_vertex_with_node_index_new(self, node, winner_node, winner_weight, down_move: bool, nodes_indexes,
-                                           schedule):
-        # TODO Work in progress
-        l = walk_time = math.inf
-        sequence_nodes = []
-        route_names = []
-        lower_index = 0
-        f = self.graph.graph[winner_node][node]
-        if nodes_indexes:
-            start_index = nodes_indexes[node]
-            if start_index < f.size:
-                bus = f.buses[start_index]
-                schedule = bus.next_nodes_schedule
-                lower_index = bus.lower_index
-                l = bus.a
-                sequence_nodes = bus.nodes
-                route_names = bus.route_names
-
-        if f.walk:
-            walk_time = winner_weight + f.walk.w
-        if walk_time < l:
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
-        else:
-            new_weight, sequence_nodes, route_names = l, sequence_nodes, route_names
-
-        if node in self.candidate_weights:
-            if new_weight < self.candidate_weights[node]:
-                self.candidate_down_move[node] = down_move
-                self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-                self.candidate_schedule[node] = schedule
-                self.lower_index[node] = lower_index
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_down_move[node] = down_move
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-            self.candidate_schedule[node] = schedule
-            self.lower_index[node] = lower_index
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
     def _update_vertex_with_node_index_fractional_cascading_bus_profile(self, winner_node: int, winner_weight: int, out,
                                                                         node, start_index, down_move):
@@ -589,35 +525,31 @@ class FCH:
         """
         f = out[node]
         l = walk_time = math.inf
-        sequence_nodes = []
-        route_names = []
+        payload = None
         if start_index is not None:
             if start_index < f.size:
-                l = f.buses[start_index].a
-                sequence_nodes = f.buses[start_index].nodes
-                route_names = f.buses[start_index].route_names
+                l = f.a[start_index]
+                payload = f.p[start_index]
         if f.walk:
             walk_time = winner_weight + f.walk.w
         if walk_time < l:
-            new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+            new_weight, payload = walk_time, f.walk.payload
         else:
-            new_weight, sequence_nodes, route_names = l, sequence_nodes, route_names
+            new_weight = l
 
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_down_move[node] = down_move
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_down_move[node] = down_move
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
 
     def _update_vertex_with_node_index_fractional_cascading_walk_profile(self, winner_node: int, winner_weight: int,
                                                                          out, node, down_move):
@@ -631,19 +563,17 @@ class FCH:
 
         f = out[node]
         walk_time = winner_weight + f.walk.w
-        new_weight, sequence_nodes, route_names = walk_time, f.walk.nodes, f.walk.route_names
+        new_weight, payload = walk_time, f.walk.payload
         if node in self.candidate_weights.keys():
             if new_weight < self.candidate_weights[node]:
                 self.candidate_down_move[node] = down_move
                 self.candidate_weights[node] = new_weight
-                self.candidate_priorities[node] = new_weight
-                self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-                self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-                self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
-        elif new_weight != math.inf:
+                self.candidate_priorities[node] = new_weight + self.potentials[node]
+                self.candidate_parents[node] = winner_node
+                self.candidate_payloads[node] = payload
+        elif new_weight + self.potentials[node] != math.inf:
             self.candidate_down_move[node] = down_move
             self.candidate_weights[node] = new_weight
-            self.candidate_priorities[node] = new_weight
-            self.candidate_sequences[node] = self.candidate_sequences[winner_node] + sequence_nodes[1:]
-            self.candidate_roots[node] = self.candidate_roots[winner_node] + [node]
-            self.candidate_route_names[node] = self.candidate_route_names[winner_node] + route_names
+            self.candidate_priorities[node] = new_weight + self.potentials[node]
+            self.candidate_parents[node] = winner_node
+            self.candidate_payloads[node] = payload
@@ -1,17 +1,138 @@
 import pandas as pd
 import numpy as np
-from copy import deepcopy
 from collections import defaultdict
 from tqdm import tqdm
 import heapdict
-from copy import copy
-# from bisect import bisect_left
-from binary_search import bisect_left
-from typing import Set, Dict
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left
+from typing import Set, Dict, List, Tuple, Union, Sequence
 
-from atf import ATF, min_atf
+from atf import ATF, min_atf, int_array, cut_mask
 from ttf import TTF
-from trip import Bus, Walk
+from trip import Walk
+from unpacking import UnpackingTable
+from witness import witness_paths, witnessed, witness_subgraph
+from ordering import Ordering, node_stats
+from landmarks import Landmarks
+from query_graph import QueryGraph
+from containers import geometrical_containers
+
+
+TRANSPORT_COLUMNS = ['from_stop_I', 'to_stop_I', 'dep_time_ut', 'arr_time_ut', 'route_I']
+WALK_COLUMNS = ['from_stop_I', 'to_stop_I', 'd_walk']
+SECONDS_IN_DAY = 86400
+UNPACKING_COMPACT_SIZE = 1000000
+FRACTIONAL_CASCADING_END = 100000000000
+
+
+def _transport_columns(transport_connections: pd.DataFrame) -> List[np.ndarray]:
+    """
+    Extract columns needed for the graph from the connections data frame without copying the whole frame
+    :param transport_connections: pd.DataFrame. File format related to network_temporal_day.csv
+    :return: [from_stop, to_stop, dep_time, arr_time, route]
+    """
+    return [transport_connections[column].to_numpy() for column in TRANSPORT_COLUMNS]
+
+
+def _node_shortcuts(task: Tuple[int, Dict[int, ATF], Dict[int, ATF], Dict[int, Dict[int, ATF]]]
+                    ) -> Tuple[int, List[Tuple[int, int, ATF]], UnpackingTable]:
+    """
+    Shortcuts, which replace contracted node. Runs in worker process of parallel contraction,
+    so new shortcut rows are written into the separate unpacking table
+    :param task: (node, in-going functions, out-going functions, witness subgraph or None) of contracted node
+    :return: (node, [(previous_node, next_node, function)], table with new rows)
+    """
+    node, in_functions, out_functions, subgraph = task
+    table = UnpackingTable()
+    shortcuts = []
+    for previous_node, f in in_functions.items():
+        witnesses = {}
+        if subgraph is not None:
+            witnesses = witness_paths(subgraph, previous_node, {node}, out_functions)
+        for next_node, g in out_functions.items():
+            if previous_node != next_node:
+                new_f = g.composition(f, node, table)
+                if new_f and not witnessed(witnesses.get(next_node), new_f):
+                    shortcuts.append((previous_node, next_node, new_f))
+    return node, shortcuts, table
+
+
+def _share_functions(edges: Dict[int, Dict[int, ATF]]) -> Dict[int, Dict[int, ATF]]:
+    """
+    Copy of adjacency dictionaries, which shares ATF functions with the original graph.
+    Functions of the graph are not changed in place, so contraction changes only its own dictionaries:
+    removed edges and new shortcuts
+    :param edges: Dict[int, Dict[int, ATF]] Out-going or in-going edges of the graph
+    :return:
+    """
+    return defaultdict(dict, {node: dict(out) for node, out in edges.items()})
+
+
+def _shift_payloads(f: ATF, offset: int):
+    """
+    Move payloads of function, calculated in worker process, to the rows appended to the unpacking table of the graph
+    :param f: ATF Function with payloads only from the worker table
+    :param offset: int Offset of appended rows
+    :return:
+    """
+    if f.size:
+        f.p = int_array(np.frombuffer(f.p, dtype=np.int32) + offset)
+    if f.walk:
+        f.walk = Walk(w=f.walk.w, payload=f.walk.payload + offset)
+
+
+def _timetable_node(out: Dict[int, ATF]) -> Tuple[array, array]:
+    """
+    TTN index of the node: all departures of out-going functions and position of the first connection
+    not earlier than every departure in every function, found with one vectorized searchsorted per function
+    :param out: Dict[int, ATF] Out-going functions of the node
+    :return: (schedule, positions) Positions are int32 matrix of shape (len(schedule), len(out)) flattened
+             row by row, columns are in order of out-going functions
+    """
+    departures = [np.asarray(f.d, dtype=np.int64) for f in out.values()]
+    schedule = np.unique(np.concatenate(departures)) if departures else np.zeros(0, dtype=np.int64)
+    positions = np.zeros((len(schedule), len(out)), dtype=np.int32)
+    for column, d in enumerate(departures):
+        if len(d):
+            positions[:, column] = np.searchsorted(d, schedule)
+    return int_array(schedule), int_array(positions.ravel())
+
+
+def _fractional_cascading(functions: List[Tuple[int, ATF]]) -> Tuple[List[array], List[array], List[int], List[int]]:
+    """
+    Fractional cascading index over departures of out-going functions of the node.
+    Level of the function is union of its departures and every second element of the previous level
+    with sentinels at both ends, levels are kept in reversed order.
+    Pointers of the level are int32 array of shape (k, 2) flattened row by row: position of every level element
+    in departures of the function and in the next level
+    :param functions: [(next_node, function)] Out-going functions in order of cascading
+    :return: (levels, pointers, reachable nodes, walking nodes)
+    """
+    levels = []
+    departures = []
+    reachable_nodes = []
+    walking_nodes = []
+    for next_node, f in functions:
+        if not f.size:
+            walking_nodes.append(next_node)
+            continue
+        d = np.asarray(f.d, dtype=np.int64)
+        merged = np.union1d(d, levels[-1][1::2]) if levels else d
+        levels.append(np.concatenate(([-1], merged, [FRACTIONAL_CASCADING_END])))
+        departures.append(d)
+        reachable_nodes.append(next_node)
+    levels.reverse()
+    departures.reverse()
+    reachable_nodes.reverse()
+    pointers = []
+    for i, level in enumerate(levels):
+        pointer = np.zeros((len(level), 2), dtype=np.int32)
+        pointer[:, 0] = np.searchsorted(departures[i], level)
+        if i + 1 < len(levels):
+            pointer[:, 1] = np.searchsorted(levels[i + 1], level)
+        pointers.append(int_array(pointer.ravel()))
+    return [array('q', level.tolist()) for level in levels], pointers, reachable_nodes, walking_nodes
 
 
 class TransportGraph:
@@ -26,17 +147,93 @@ class TransportGraph:
         :param walk_connections: File format related to network_walk.csv by link: https://zenodo.org/records/1136378
         """
 
-        transport_connections_df = transport_connections.copy(deep=True)
-        transport_connections_df = transport_connections_df.sort_values(by='dep_time_ut')
-        transport_connections_df['dep_arr'] = list(zip(transport_connections_df['dep_time_ut'],
-                                                       transport_connections_df['arr_time_ut']))
-        transport_connections_df['route_I'] = transport_connections_df['route_I'].astype(str)
-        transport_connections_dict = transport_connections_df.groupby(by=['from_stop_I', 'to_stop_I']
-                                                                      ).agg({'dep_arr': list, 'route_I': list}
-                                                                            ).to_dict('index')
+        self._build(*_transport_columns(transport_connections), walk_connections)
+
+    @classmethod
+    def from_csv(cls,
+                 transport_path: str,
+                 walk_path: str,
+                 sep: str = ';',
+                 chunksize: int = 100000,
+                 symmetric_walk: bool = True) -> 'TransportGraph':
+        """
+        Build Multimodal Transport Network straight from the csv files.
+        Connections file is read in chunks, only needed columns are kept as contiguous numpy arrays
+        :param transport_path: str Path to network_temporal_day.csv
+        :param walk_path: str Path to network_walk.csv
+        :param sep: str Separator used in csv files
+        :param chunksize: int Count of rows in one chunk of connections file
+        :param symmetric_walk: bool Add inverted walk connections, as walk network is stored in one direction
+        :return:
+        """
+        columns = {column: [] for column in TRANSPORT_COLUMNS}
+        for chunk in pd.read_csv(transport_path, sep=sep, usecols=TRANSPORT_COLUMNS, chunksize=chunksize):
+            for column in TRANSPORT_COLUMNS:
+                columns[column].append(chunk[column].to_numpy())
+        arrays = [np.concatenate(columns[column]) if columns[column] else np.array([], dtype=np.int64)
+                  for column in TRANSPORT_COLUMNS]
+
+        walk_connections = pd.read_csv(walk_path, sep=sep, usecols=WALK_COLUMNS)
+        if symmetric_walk:
+            walk_connections_invert = walk_connections.rename(columns={'from_stop_I': 'to_stop_I',
+                                                                       'to_stop_I': 'from_stop_I'})
+            walk_connections = pd.concat((walk_connections, walk_connections_invert))
+
+        graph = cls.__new__(cls)
+        graph._build(*arrays, walk_connections)
+        return graph
+
+    def _build(self,
+               from_stop: np.ndarray,
+               to_stop: np.ndarray,
+               dep_time: np.ndarray,
+               arr_time: np.ndarray,
+               route: np.ndarray,
+               walk_connections: pd.DataFrame):
+        """
+        Build graph from columns of connections.
+        Connections are sorted once by (from_stop, to_stop, dep_time, arr_time) and each edge gets
+        contiguous slice of departures and arrivals.
+        Times inside of ATF functions are stored relative to the start of the service day (time_origin)
+        :param from_stop: np.ndarray Departure stops of connections
+        :param to_stop: np.ndarray Arrival stops of connections
+        :param dep_time: np.ndarray Departure times in unix
+        :param arr_time: np.ndarray Arrival times in unix
+        :param route: np.ndarray Route identifiers of connections
+        :param walk_connections: pd.DataFrame File format related to network_walk.csv
+        :return:
+        """
+        self.time_origin = int(dep_time.min()) // SECONDS_IN_DAY * SECONDS_IN_DAY if len(dep_time) else 0
+
+        order = np.lexsort((arr_time, dep_time, to_stop, from_stop))
+        from_stop = from_stop[order]
+        to_stop = to_stop[order]
+        dep_time = (dep_time[order] - self.time_origin).astype(np.int32)
+        arr_time = (arr_time[order] - self.time_origin).astype(np.int32)
+        self.unpacking = UnpackingTable()
+        route_values, route_codes = np.unique(route[order], return_inverse=True)
+        route_payloads = np.array([self.unpacking.route(str(x)) for x in route_values.tolist()], dtype=np.int32)
+        payloads = route_payloads[route_codes]
+
+        edge_starts = np.flatnonzero((from_stop[1:] != from_stop[:-1]) | (to_stop[1:] != to_stop[:-1])) + 1
+        edge_starts = np.concatenate(([0], edge_starts)) if len(order) else edge_starts
 
         walk_connections_dict = walk_connections.set_index(['from_stop_I', 'to_stop_I'])['d_walk'].to_dict()
 
+        # dominated connections of all edges are filtered at once
+        edge_from, edge_to = from_stop[edge_starts].tolist(), to_stop[edge_starts].tolist()
+        edges = np.repeat(np.arange(len(edge_starts)), np.diff(np.append(edge_starts, len(order))))
+        walk_durations = np.array([walk_connections_dict.get(key) or np.inf for key in zip(edge_from, edge_to)])
+        mask = cut_mask(dep_time, arr_time, walk_durations[edges], edges)
+        dep_time, arr_time, payloads = dep_time[mask], arr_time[mask], payloads[mask]
+        edge_starts = np.searchsorted(edges[mask], np.arange(len(edge_starts)))
+        edge_ends = np.append(edge_starts[1:], len(dep_time))
+
+        transport_connections_dict = {
+            (adjacent_node, node): (start, end)
+            for adjacent_node, node, start, end in zip(edge_from, edge_to, edge_starts.tolist(), edge_ends.tolist())
+        }
+
         self.graph = defaultdict(dict)
         self.in_nodes = defaultdict(dict)
         self.nodes = set()
@@ -44,19 +241,13 @@ class TransportGraph:
         self.position_in_edge = defaultdict(dict)
 
         for adjacent_node, node in set(transport_connections_dict.keys()).union(set(walk_connections_dict.keys())):
-            nodes_sequence = [adjacent_node, node]
             walk_duration = walk_connections_dict.get((adjacent_node, node))
             walk = None
             if walk_duration:
-                walk = Walk(nodes=nodes_sequence, w=walk_duration)
-            transport_connections_nodes_dict = transport_connections_dict.get((adjacent_node, node),
-                                                                              {'dep_arr': [], 'route_I': []})
-            buses = [Bus(nodes=nodes_sequence, c=c,
-                         route_names=[transport_connections_nodes_dict['route_I'][i]])
-                     for i, c in enumerate(transport_connections_nodes_dict['dep_arr'])]
-            g = ATF(walk=walk, buses=buses)
-            g.cut()
-            if walk or buses:
+                walk = Walk(w=walk_duration)
+            start, end = transport_connections_dict.get((adjacent_node, node), (0, 0))
+            g = ATF(walk=walk, d=dep_time[start:end], a=arr_time[start:end], p=payloads[start:end])
+            if walk or g.size:
                 self.in_nodes[node][adjacent_node] = self.graph[adjacent_node][node] = g
                 self.nodes.add(adjacent_node)
                 self.nodes.add(node)
@@ -65,6 +256,7 @@ class TransportGraph:
         self.pointers = {}
         self.reachable_nodes = {}
         self.walking_nodes = {}
+        self.landmarks = None
 
     @property
     def edges_cnt(self) -> int:
@@ -96,7 +288,7 @@ class TransportGraph:
         for i, v in self.graph.items():
             for i0, v0 in v.items():
                 if type(v0) is ATF:
-                    timetables += [len(v0.buses)]
+                    timetables += [v0.size]
                 elif type(v0) is TTF:
                     timetables += [len(v0.transports)]
         timetables = np.array(timetables)
@@ -126,27 +318,42 @@ class TransportGraph:
 
         return shortcuts_inserted - edges_removed
 
-    def contraction_hierarchy(self):
+    def contraction_hierarchy(self, processes: int = None, witness_search: bool = False, ordering: Ordering = None):
         """
         Contraction Hierarchy algorithm.
+        :param processes: int Count of worker processes. If set, independent sets of nodes are contracted in rounds
+                          and compositions of functions are calculated in the process pool
+        :param witness_search: bool If True, shortcuts dominated by witness paths, which avoid contracted node,
+                               are not added. Witness paths are found by bounded search (witness.py)
+        :param ordering: Ordering Order of nodes contraction (ordering.py). By default nodes are ordered
+                         by edge difference and depth, which are updated eagerly
         :return:
         """
-        new_graph = ContactionTransportGraph(self.graph, self.in_nodes, self.nodes)
-        in_nodes = deepcopy(self.in_nodes)
-        graph = deepcopy(self.graph)
+        if processes:
+            return self._parallel_contraction_hierarchy(processes, witness_search, ordering)
+
+        new_graph = ContactionTransportGraph(self.graph, self.in_nodes, self.nodes, self.time_origin, self.unpacking,
+                                             ordering)
+        in_nodes = _share_functions(self.in_nodes)
+        graph = _share_functions(self.graph)
+        compact_size = UNPACKING_COMPACT_SIZE
         for index in tqdm(range(len(self.nodes))):
-            node = new_graph.contraction_priority.popitem()[0]
+            node = new_graph.pop_node(graph, in_nodes)
             new_depth = new_graph.depth[node] + 1
+            neighbours = set(in_nodes[node]).union(graph[node])
             if in_nodes[node]:
 
                 while in_nodes[node]:
                     previous_node, f = in_nodes[node].popitem()
+                    witnesses = {}
+                    if witness_search:
+                        witnesses = witness_paths(graph, previous_node, {node}, graph[node])
                     for next_node, g in graph[node].items():
                         if previous_node != next_node:
                             # calculate new connection function
 
-                            new_f = g.composition(f)
-                            if new_f:
+                            new_f = g.composition(f, node, new_graph.unpacking)
+                            if new_f and not witnessed(witnesses.get(next_node), new_f):
                                 h = graph[previous_node].get(next_node, None)
                                 if h:
                                     new_f = min_atf(new_f, h)
@@ -155,132 +362,170 @@ class TransportGraph:
                                     next_node] = new_f
                             if not in_nodes[node]:
                                 new_graph.depth[next_node] = max(new_graph.depth[next_node], new_depth)
-                                new_graph.contraction_priority[next_node] = (new_graph.edge_difference(next_node)
-                                                                             + new_graph.depth[next_node])
+                                new_graph.update_priority(next_node)
                         if not in_nodes[node]:
                             del in_nodes[next_node][node]
                     new_graph.depth[previous_node] = max(new_graph.depth[previous_node], new_depth)
-                    new_graph.contraction_priority[previous_node] = (new_graph.edge_difference(previous_node)
-                                                                     + new_graph.depth[previous_node])
+                    new_graph.update_priority(previous_node)
                     del graph[previous_node][node]
             else:
                 while graph[node]:
                     next_node, g = graph[node].popitem()
                     new_graph.depth[next_node] = max(new_graph.depth[next_node], new_depth)
-                    new_graph.contraction_priority[next_node] = (new_graph.edge_difference(next_node)
-                                                                 + new_graph.depth[next_node])
+                    new_graph.update_priority(next_node)
                     del in_nodes[next_node][node]
 
             del graph[node], in_nodes[node]
+            new_graph.contracted(neighbours.difference([node]), graph, in_nodes)
 
             new_graph.hierarchy[node] = index
 
+            if len(new_graph.unpacking) > compact_size:
+                new_graph.compact_unpacking()
+                compact_size = max(2 * len(new_graph.unpacking), UNPACKING_COMPACT_SIZE)
+        new_graph.compact_unpacking()
+
+        return new_graph
+
+    def _parallel_contraction_hierarchy(self, processes: int, witness_search: bool = False, ordering: Ordering = None):
+        """
+        Contraction Hierarchy algorithm, which contracts independent sets of nodes in rounds.
+        Nodes of one round are not adjacent, so their shortcuts do not depend on each other: shortcuts are calculated
+        in the process pool and added to the graph in one batch after the round.
+        Witness paths could not go through any node of the round, as all of them are removed together
+        :param processes: int Count of worker processes
+        :param witness_search: bool If True, dominated shortcuts are skipped after witness search
+        :param ordering: Ordering Order of nodes contraction, priorities of neighbours are updated after each round
+        :return:
+        """
+        new_graph = ContactionTransportGraph(self.graph, self.in_nodes, self.nodes, self.time_origin, self.unpacking,
+                                             ordering)
+        in_nodes = _share_functions(self.in_nodes)
+        graph = _share_functions(self.graph)
+        compact_size = UNPACKING_COMPACT_SIZE
+        index = 0
+        with ProcessPoolExecutor(processes) as executor, tqdm(total=len(self.nodes)) as progress:
+            while new_graph.contraction_priority:
+                nodes = new_graph.independent_nodes(graph, in_nodes)
+                excluded = set(nodes)
+                tasks = [(node, in_nodes[node], graph[node],
+                          witness_subgraph(graph, in_nodes[node], excluded, graph[node]) if witness_search else None)
+                         for node in nodes]
+                chunksize = max(1, len(tasks) // (4 * processes))
+                for node, shortcuts, table in executor.map(_node_shortcuts, tasks, chunksize=chunksize):
+                    offset = new_graph.unpacking.extend(table)
+                    for previous_node, next_node, new_f in shortcuts:
+                        _shift_payloads(new_f, offset)
+                        h = graph[previous_node].get(next_node, None)
+                        if h:
+                            new_f = min_atf(new_f, h)
+                        in_nodes[next_node][previous_node] = graph[previous_node][next_node] = new_f
+                        new_graph.in_nodes[next_node][previous_node] = new_graph.graph[previous_node][next_node] = new_f
+
+                neighbours = set()
+                for node in nodes:
+                    new_depth = new_graph.depth[node] + 1
+                    for neighbour in set(in_nodes[node]).union(graph[node]):
+                        new_graph.depth[neighbour] = max(new_graph.depth[neighbour], new_depth)
+                        neighbours.add(neighbour)
+                    for previous_node in in_nodes[node]:
+                        del graph[previous_node][node]
+                    for next_node in graph[node]:
+                        del in_nodes[next_node][node]
+                    del graph[node], in_nodes[node], new_graph.contraction_priority[node]
+                    new_graph.hierarchy[node] = index
+                    index += 1
+                for neighbour in neighbours.difference(nodes):
+                    new_graph.contracted_neighbours[neighbour] += 1
+                    new_graph.contraction_priority[neighbour] = new_graph.node_priority(neighbour, graph, in_nodes)
+                progress.update(len(nodes))
+
+                if len(new_graph.unpacking) > compact_size:
+                    new_graph.compact_unpacking()
+                    compact_size = max(2 * len(new_graph.unpacking), UNPACKING_COMPACT_SIZE)
+        new_graph.compact_unpacking()
+
         return new_graph
 
+    def query_graph(self) -> QueryGraph:
+        """
+        Compile graph with dense node indexes and CSR arrays of edges for Dijkstra and FCH queries.
+        Compiled graph shares functions and unpacking table with this graph
+        :return:
+        """
+        return QueryGraph(self)
+
+    def landmarks_precomputation(self, count: int = 16):
+        """
+        Precalculate landmarks and lower bounds of travel time from and to them for goal directed search (ALT)
+        :param count: int Count of landmarks
+        :return:
+        """
+        self.landmarks = Landmarks(self.graph, sorted(self.nodes), count)
+
     def optimize_binary_search(self):
         """
-        TTN algorithm over the standard graph
+        TTN algorithm over the standard graph, positions of every node are int32 matrix, see _timetable_node
         :return:
         """
         for node1, out in tqdm(self.graph.items()):
-            self.position_in_edge[node1] = {}
-            full_list = []
-            for node2, f in out.items():
-                full_list += [bus.d for bus in f.buses]
-
-            full_list = list(set(full_list))
-            full_list.sort()
-            self.nodes_schedule[node1] = full_list
-            for i, dep in enumerate(full_list):
-                self.position_in_edge[node1][i] = {}
-                for node2, f in out.items():
-                    self.position_in_edge[node1][i][node2] = bisect_left(f.buses, dep, key=lambda x: x.d)
+            self.nodes_schedule[node1], self.position_in_edge[node1] = _timetable_node(out)
 
     def fractional_cascading_precomputation(self):
+        """
+        Precalculate fractional cascading indexes of out-going functions of all nodes, smallest functions first.
+        Levels and pointers are built with numpy, see _fractional_cascading
+        :return:
+        """
         for node1, out in tqdm(self.graph.items()):
-            m_arr = []
-            arr = []
-            reachable_nodes = []
-            walking_nodes = []
-            i = 0
-
-            for node2, f in sorted(out.items(), key=lambda x: len(x[1].buses)):
-                if i == 0:
-                    full_list = [bus.d for bus in f.buses]
-                    if full_list:
-                        arr.append(copy(full_list))
-                        full_list = [-1] + full_list + [100000000000]
-                        m_arr.append(copy(full_list))
-                        reachable_nodes.append(node2)
-                        i += 1
-                    else:
-                        walking_nodes.append(node2)
-                else:
-                    full_list = [bus.d for bus in f.buses]
-                    if full_list:
-                        arr.append(copy(full_list))
-                        full_list += [x for k, x in enumerate(m_arr[i - 1]) if k % 2]
-                        full_list = list(set(full_list))
-                        full_list.sort()
-                        full_list = [-1] + full_list + [100000000000]
-                        m_arr.append(copy(full_list))
-                        reachable_nodes.append(node2)
-                        i += 1
-                    else:
-                        walking_nodes.append(node2)
-            m_arr = m_arr[::-1]
-            arr = arr[::-1]
-            reachable_nodes = reachable_nodes[::-1]
-            self.pointers[node1] = []
-            for i in range(len(m_arr)):
-                self.pointers[node1].append([])
-                for j in range(len(m_arr[i])):
-                    self.pointers[node1][i].append([[]] * len(arr[i]))
-                    self.pointers[node1][i][j] = [-1] * 2
-            for i, l in enumerate(m_arr):
-                for j, m in enumerate(m_arr[i]):
-                    self.pointers[node1][i][j] = [
-                        bisect_left(arr[i], m_arr[i][j]),
-                        0 if i == len(m_arr) - 1 else bisect_left(m_arr[i + 1], m_arr[i][j]),
-                    ]
-            self.m_arr_fractional[node1] = m_arr
-            self.reachable_nodes[node1] = reachable_nodes
-            self.walking_nodes[node1] = walking_nodes
+            (self.m_arr_fractional[node1], self.pointers[node1], self.reachable_nodes[node1],
+             self.walking_nodes[node1]) = _fractional_cascading(sorted(out.items(), key=lambda x: x[1].size))
 
     def get_positions_fractional_cascading(self, x, node):
         locations = {}
         m_arr = self.m_arr_fractional.get(node)
         pointers = self.pointers.get(node)
         if pointers:
-            loc, next_loc = pointers[0][bisect_left(m_arr[0], x)]
+            position = 2 * bisect_left(m_arr[0], x)
+            loc, next_loc = pointers[0][position], pointers[0][position + 1]
             locations[self.reachable_nodes[node][0]] = loc
             for i in range(1, len(m_arr)):
                 if x <= m_arr[i][next_loc - 1]:
-                    loc, next_loc = pointers[i][next_loc - 1]
+                    position = 2 * next_loc - 2
+                    loc, next_loc = pointers[i][position], pointers[i][position + 1]
                 else:
-                    loc, next_loc = pointers[i][next_loc]
+                    position = 2 * next_loc
+                    loc, next_loc = pointers[i][position], pointers[i][position + 1]
                 locations[self.reachable_nodes[node][i]] = loc
         return locations
 
 
 class ContactionTransportGraph(TransportGraph):
 
-    def __init__(self, graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]], nodes: Set[int]):
+    def __init__(self, graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]], nodes: Set[int],
+                 time_origin: int = 0, unpacking: UnpackingTable = None, ordering: Ordering = None):
         """
         CH-graph class
 
         :param graph:  Dict[int, Dict[int, ATF]] Dictionary of out-going edges contains ATF functions between 2 nodes
         :param in_nodes: Dict[int, Dict[int, ATF]] Dictionary of in-going edges contains ATF functions between 2 nodes
         :param nodes: Set of all nodes
+        :param time_origin: int Start of the service day in unix, ATF times are relative to it
+        :param unpacking: UnpackingTable Unpacking table of the graph, shortcuts are added to its copy
+        :param ordering: Ordering Order of nodes contraction, edge difference with depth by default
         """
-        self.graph = deepcopy(graph)
-        self.in_nodes = deepcopy(in_nodes)
-        self.nodes = deepcopy(nodes)
+        self.time_origin = time_origin
+        self.unpacking = unpacking.copy() if unpacking is not None else UnpackingTable()
+        self.graph = _share_functions(graph)
+        self.in_nodes = _share_functions(in_nodes)
+        self.nodes = set(nodes)
         self.hierarchy = {}
         self.geometrical_containers = {}
         self.nodes_schedule = defaultdict(list)
         self.position_in_edge = defaultdict(dict)
         self.depth = defaultdict(int)
+        self.contracted_neighbours = defaultdict(int)
+        self.ordering = ordering
         self.contraction_priority = heapdict.heapdict()
         self.m_arr_fractional = {}
         self.pointers = {}
@@ -290,149 +535,207 @@ class ContactionTransportGraph(TransportGraph):
         self.pointers_old = {}
         self.reachable_nodes_old = {}
         self.walking_nodes_old = {}
+        self.travel_time_bounds = {}
+        self.up_travel_time_bounds = {}
+        self.landmarks = None
         for x in nodes:
-            self.contraction_priority[x] = self.edge_difference(x) + self.depth[x]
+            self.contraction_priority[x] = self.node_priority(x, self.graph, self.in_nodes)
+
+    def node_priority(self, node: int, graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]]
+                      ) -> float:
+        """
+        Contraction priority of the node
+        :param node: int Node
+        :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+        :param in_nodes: Dict[int, Dict[int, ATF]] In-going edges of not contracted part of the graph
+        :return:
+        """
+        if self.ordering is None:
+            return self.edge_difference(node) + self.depth[node]
+        return self.ordering.priority(node_stats(graph, in_nodes, node, self.contracted_neighbours[node],
+                                                 self.depth[node]))
 
-    def geometrical_container(self):
+    def update_priority(self, node: int):
+        """
+        Eager update of the default priority during contraction of the neighbour node
+        :param node: int Node
+        :return:
+        """
+        if self.ordering is None:
+            self.contraction_priority[node] = self.edge_difference(node) + self.depth[node]
+
+    def contracted(self, neighbours: Set[int], graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]]):
+        """
+        Update neighbours of the contracted node after its contraction.
+        Priorities of the default ordering are updated eagerly during contraction (update_priority)
+        :param neighbours: Set[int] Neighbours of the contracted node
+        :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+        :param in_nodes: Dict[int, Dict[int, ATF]] In-going edges of not contracted part of the graph
+        :return:
+        """
+        for node in neighbours:
+            self.contracted_neighbours[node] += 1
+            if self.ordering is not None:
+                self.contraction_priority[node] = self.node_priority(node, graph, in_nodes)
+
+    def pop_node(self, graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]]) -> int:
+        """
+        Pop the next node for contraction.
+        With lazy ordering priority of the popped node is recalculated, the node is pushed back to the queue
+        while its new priority is higher than the current minimum
+        :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+        :param in_nodes: Dict[int, Dict[int, ATF]] In-going edges of not contracted part of the graph
+        :return:
+        """
+        node, priority = self.contraction_priority.popitem()
+        if self.ordering is None or not self.ordering.lazy:
+            return node
+        while self.contraction_priority:
+            priority = self.node_priority(node, graph, in_nodes)
+            if priority <= self.contraction_priority.peekitem()[1]:
+                break
+            self.contraction_priority[node] = priority
+            node, priority = self.contraction_priority.popitem()
+        return node
+
+    def independent_nodes(self, graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]]) -> List[int]:
+        """
+        Independent set of not contracted nodes for one round of parallel contraction:
+        nodes, which priority is lower than priority of all their neighbours (ties are broken by node id)
+        :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+        :param in_nodes: Dict[int, Dict[int, ATF]] In-going edges of not contracted part of the graph
+        :return:
+        """
+        priority = self.contraction_priority
+        nodes = []
+        for node in priority:
+            key = (priority[node], node)
+            if all(key < (priority[neighbour], neighbour) for neighbour in graph[node] if neighbour != node) and \
+                    all(key < (priority[neighbour], neighbour) for neighbour in in_nodes[node] if neighbour != node):
+                nodes.append(node)
+        return nodes
+
+    def compact_unpacking(self):
+        """
+        Drop rows of unpacking table, which are not used by connections of the graph anymore.
+        Shortcuts of dominated connections are left in the table after merging of functions with min_atf
+        :return:
+        """
+        functions = list({id(f): f for out in self.graph.values() for f in out.values()}.values())
+        payloads = [np.frombuffer(f.p, dtype=np.int32) for f in functions if f.size]
+        payloads.append(np.array([f.walk.payload for f in functions if f.walk], dtype=np.int32))
+        remap = self.unpacking.compact(np.concatenate(payloads))
+        del payloads
+        for f in functions:
+            # functions without shortcut connections are shared with the original graph and stay the same
+            if f.size and max(f.p) >= 0:
+                f.p = int_array(self.unpacking.remap(np.frombuffer(f.p, dtype=np.int32), remap))
+            if f.walk and f.walk.payload >= 0:
+                f.walk = Walk(w=f.walk.w, payload=int(remap[f.walk.payload]))
+
+    def travel_time_matrix(self, sources: List[int], targets: List[int], departure_time: Union[int, Sequence[int]]
+                           ) -> np.ndarray:
+        """
+        Earliest arrival times from every source to every target.
+        Arrivals of all sources are kept in one array per node: upward sweep over nodes in order of hierarchy
+        propagates them over up moves, downward sweep in reversed order propagates them over down moves
+        only inside of the union of corridors of the targets (nodes, from which any target is reachable by down moves)
+        :param sources: List[int] Start nodes
+        :param targets: List[int] End nodes
+        :param departure_time: Start time in unix, the same for all sources or one for every source
+        :return: np.ndarray Matrix (sources x targets) of arrival times in unix, np.inf for not reachable targets
+        """
+        departure_times = np.broadcast_to(np.asarray(departure_time, dtype=np.float64) - self.time_origin,
+                                          (len(sources),))
+        order = sorted(self.nodes, key=self.hierarchy.__getitem__)
+
+        corridor = set(targets)
+        stack = list(corridor)
+        while stack:
+            node = stack.pop()
+            for previous_node in self.in_nodes[node]:
+                if self.hierarchy[previous_node] > self.hierarchy[node] and previous_node not in corridor:
+                    corridor.add(previous_node)
+                    stack.append(previous_node)
+
+        arrivals = {}
+        for i, (source, t) in enumerate(zip(sources, departure_times)):
+            arrivals.setdefault(source, np.full(len(sources), np.inf))[i] = t
+        for node in order:
+            for previous_node, f in self.in_nodes[node].items():
+                if self.hierarchy[previous_node] < self.hierarchy[node] and previous_node in arrivals:
+                    new_arrivals = f.arrivals(arrivals[previous_node])
+                    if node in arrivals:
+                        np.minimum(arrivals[node], new_arrivals, out=arrivals[node])
+                    else:
+                        arrivals[node] = new_arrivals
+        for node in reversed(order):
+            if node in corridor:
+                for previous_node, f in self.in_nodes[node].items():
+                    if (self.hierarchy[previous_node] > self.hierarchy[node] and previous_node in corridor
+                            and previous_node in arrivals):
+                        new_arrivals = f.arrivals(arrivals[previous_node])
+                        if node in arrivals:
+                            np.minimum(arrivals[node], new_arrivals, out=arrivals[node])
+                        else:
+                            arrivals[node] = new_arrivals
+
+        not_reached = np.full(len(sources), np.inf)
+        return np.column_stack([arrivals.get(target, not_reached) for target in targets]
+                               ).reshape(len(sources), len(targets)) + self.time_origin
+
+    def geometrical_container(self, processes: int = 1):
         """
-        Precalculate Geometrical Containers for all nodes in down-mode move. Needed for Forward Search algorithm
+        Precalculate Geometrical Containers for all nodes in down-mode move. Needed for Forward Search algorithm.
+        Nodes are numbered in DFS post-order from the highest nodes, so the container is mostly a few intervals
+        of numbers, otherwise it is a bitset, see containers.geometrical_containers
+        :param processes: int Count of worker processes for compaction of containers
         :return:
         """
-        for node in tqdm(self.nodes):
-            visited = set()
-            self._dfs(visited, node)
-            self.geometrical_containers[node] = visited
+        order = sorted(self.nodes, key=lambda node: (self.hierarchy.get(node, -1), node), reverse=True)
+        down = {node: [neighbour for neighbour in out if self.hierarchy[neighbour] < self.hierarchy[node]]
+                for node, out in self.graph.items()}
+        self.geometrical_containers = geometrical_containers(down, order, processes)
 
-    def _dfs(self, visited: Set[int], node: int):
+    def travel_time_bounds_precomputation(self):
         """
-        Deep first search for building an Geometrical containers for each node in down movement
-        :param visited: Set[int] Set of already visited nodes
-        :param node: int Node for which we run DFS
+        Precalculate time independent bounds of travel time for in-going edges of all nodes in down-mode move,
+        i.e. from nodes higher in hierarchy, and for out-going edges in up-mode move.
+        Needed for backward search of TCH algorithm and pruning of profile search
         :return:
         """
-        if node not in visited:
-            visited.add(node)
-            for neighbour in self.graph[node]:
-                if self.hierarchy[neighbour] < self.hierarchy[node]:
-                    self._dfs(visited, neighbour)
+        for node, in_edges in self.in_nodes.items():
+            self.travel_time_bounds[node] = {previous_node: f.bounds() for previous_node, f in in_edges.items()
+                                             if self.hierarchy[previous_node] > self.hierarchy[node]}
+        for node, out in self.graph.items():
+            self.up_travel_time_bounds[node] = {next_node: f.bounds() for next_node, f in out.items()
+                                                if self.hierarchy[next_node] > self.hierarchy[node]}
 
     def optimize_binary_search(self):
         """
-        TTN algorithm realization
+        TTN algorithm realization, positions of every node are int32 matrix, see _timetable_node
         :return:
         """
         for node1, out in tqdm(self.graph.items()):
-            self.position_in_edge[node1] = {}
-            full_list = []
-            for node2, f in out.items():
-                full_list += [bus.d for bus in f.buses]
-
-            full_list = list(set(full_list))
-            full_list.sort()
-            self.nodes_schedule[node1] = full_list
-            for i, dep in enumerate(full_list):
-                self.position_in_edge[node1][i] = {}
-                for node2, f in out.items():
-                    self.position_in_edge[node1][i][node2] = bisect_left(f.buses, dep, key=lambda x: x.d)
+            self.nodes_schedule[node1], self.position_in_edge[node1] = _timetable_node(out)
 
     def fractional_cascading_precomputation(self):
+        """
+        Precalculate fractional cascading indexes of out-going functions of all nodes, the highest next nodes first.
+        Levels and pointers are built with numpy, see _fractional_cascading
+        :return:
+        """
         for node1, out in tqdm(self.graph.items()):
-            m_arr = []
-            arr = []
-            reachable_nodes = []
-            walking_nodes = []
-            i = 0
-
-            for node2, f in sorted(out.items(), key=lambda x: -self.hierarchy[x[0]]):
-                if i == 0:
-                    full_list = [bus.d for bus in f.buses]
-                    if full_list:
-                        arr.append(copy(full_list))
-                        full_list = [-1] + full_list + [100000000000]
-                        m_arr.append(copy(full_list))
-                        reachable_nodes.append(node2)
-                        i += 1
-                    else:
-                        walking_nodes.append(node2)
-                else:
-                    full_list = [bus.d for bus in f.buses]
-                    if full_list:
-                        arr.append(copy(full_list))
-                        full_list += [x for k, x in enumerate(m_arr[i - 1]) if k % 2]
-                        full_list = list(set(full_list))
-                        full_list.sort()
-                        full_list = [-1] + full_list + [100000000000]
-                        m_arr.append(copy(full_list))
-                        reachable_nodes.append(node2)
-                        i += 1
-                    else:
-                        walking_nodes.append(node2)
-            m_arr = m_arr[::-1]
-            arr = arr[::-1]
-            reachable_nodes = reachable_nodes[::-1]
-            self.pointers[node1] = []
-            for i in range(len(m_arr)):
-                self.pointers[node1].append([])
-                for j in range(len(m_arr[i])):
-                    self.pointers[node1][i].append([[]] * len(arr[i]))
-                    self.pointers[node1][i][j] = [-1] * 2
-            for i, l in enumerate(m_arr):
-                for j, m in enumerate(m_arr[i]):
-                    self.pointers[node1][i][j] = [
-                        bisect_left(arr[i], m_arr[i][j]),
-                        0 if i == len(m_arr) - 1 else bisect_left(m_arr[i + 1], m_arr[i][j]),
-                    ]
-            self.m_arr_fractional[node1] = m_arr
-            self.reachable_nodes[node1] = reachable_nodes
-            self.walking_nodes[node1] = walking_nodes
+            (self.m_arr_fractional[node1], self.pointers[node1], self.reachable_nodes[node1],
+             self.walking_nodes[node1]) = _fractional_cascading(sorted(out.items(),
+                                                                       key=lambda x: -self.hierarchy[x[0]]))
 
     def fractional_cascading_precomputation_old(self):
+        """
+        Precalculate fractional cascading indexes of out-going functions of all nodes, smallest functions first.
+        Levels and pointers are built with numpy, see _fractional_cascading
+        :return:
+        """
         for node1, out in tqdm(self.graph.items()):
-            m_arr = []
-            arr = []
-            reachable_nodes = []
-            walking_nodes = []
-            i = 0
-
-            for node2, f in sorted(out.items(), key=lambda x: len(x[1].buses)):
-                if i == 0:
-                    full_list = [bus.d for bus in f.buses]
-                    if full_list:
-                        arr.append(copy(full_list))
-                        full_list = [-1] + full_list + [100000000000]
-                        m_arr.append(copy(full_list))
-                        reachable_nodes.append(node2)
-                        i += 1
-                    else:
-                        walking_nodes.append(node2)
-                else:
-                    full_list = [bus.d for bus in f.buses]
-                    if full_list:
-                        arr.append(copy(full_list))
-                        full_list += [x for k, x in enumerate(m_arr[i - 1]) if k % 2]
-                        full_list = list(set(full_list))
-                        full_list.sort()
-                        full_list = [-1] + full_list + [100000000000]
-                        m_arr.append(copy(full_list))
-                        reachable_nodes.append(node2)
-                        i += 1
-                    else:
-                        walking_nodes.append(node2)
-            m_arr = m_arr[::-1]
-            arr = arr[::-1]
-            reachable_nodes = reachable_nodes[::-1]
-            self.pointers_old[node1] = []
-            for i in range(len(m_arr)):
-                self.pointers_old[node1].append([])
-                for j in range(len(m_arr[i])):
-                    self.pointers_old[node1][i].append([[]] * len(arr[i]))
-                    self.pointers_old[node1][i][j] = [-1] * 2
-            for i, l in enumerate(m_arr):
-                for j, m in enumerate(m_arr[i]):
-                    self.pointers_old[node1][i][j] = [
-                        bisect_left(arr[i], m_arr[i][j]),
-                        0 if i == len(m_arr) - 1 else bisect_left(m_arr[i + 1], m_arr[i][j]),
-                    ]
-            self.m_arr_fractional_old[node1] = m_arr
-            self.reachable_nodes_old[node1] = reachable_nodes
-            self.walking_nodes_old[node1] = walking_nodes
+            (self.m_arr_fractional_old[node1], self.pointers_old[node1], self.reachable_nodes_old[node1],
+             self.walking_nodes_old[node1]) = _fractional_cascading(sorted(out.items(), key=lambda x: x[1].size))
@@ -0,0 +1,119 @@
+import heapq
+import random
+import math
+from typing import Dict, List, Union
+
+import numpy as np
+
+from atf import ATF
+
+
+def lower_bound_distances(edges: Dict[int, Dict[int, float]], source: int, index: Dict[int, int]) -> np.ndarray:
+    """
+    Dijkstra over time independent lower bounds of travel time
+    :param edges: Dict[int, Dict[int, float]] Lower bound of travel time of every edge
+    :param source: int Start node
+    :param index: Dict[int, int] Position of every node in the result
+    :return: np.ndarray Distances from source to all nodes, np.inf for not reachable nodes
+    """
+    distances = np.full(len(index), np.inf)
+    settled = {}
+    queue = [(0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        settled[node] = distance
+        for next_node, weight in edges.get(node, {}).items():
+            if next_node not in settled:
+                heapq.heappush(queue, (distance + weight, next_node))
+    for node, distance in settled.items():
+        distances[index[node]] = distance
+    return distances
+
+
+class Landmarks:
+    def __init__(self, graph: Dict[int, Dict[int, ATF]], nodes: List[int], count: int = 16, seed: int = 0):
+        """
+        Landmarks for goal directed search (ALT: A*, landmarks and triangle inequality).
+        Lower bound of travel time over an edge is the fastest connection or walk (ATF.bounds), it does not depend on
+        the departure time, so for any landmark L and nodes v, t by triangle inequality
+            d(v, t) >= d(v, L) - d(t, L) and d(v, t) >= d(L, t) - d(L, v).
+        Landmarks are chosen one by one as the farthest node from already chosen landmarks.
+        More information could be found by the next link:
+        https://www.microsoft.com/en-us/research/publication/computing-the-shortest-path-a-search-meets-graph-theory/
+
+        :param graph: Dict[int, Dict[int, ATF]] Out-going edges of the graph
+        :param nodes: List[int] Nodes of the graph
+        :param count: int Count of landmarks
+        :param seed: int Random seed of the first landmark
+        """
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        out_bounds = {node: {next_node: f.bounds()[0] for next_node, f in out.items()} for node, out in graph.items()}
+        in_bounds = {}
+        for node, out in out_bounds.items():
+            for next_node, weight in out.items():
+                in_bounds.setdefault(next_node, {})[node] = weight
+
+        self.landmarks = []
+        from_landmarks = []
+        to_landmarks = []
+        # the first landmark is the farthest node from the random one
+        farthest = lower_bound_distances(out_bounds, random.Random(seed).choice(self.nodes), self.index)
+        while len(self.landmarks) < min(count, len(self.nodes)):
+            candidate = np.where(np.isfinite(farthest), farthest, -1)
+            candidate[[self.index[landmark] for landmark in self.landmarks]] = -math.inf
+            landmark = self.nodes[int(np.argmax(candidate))]
+            self.landmarks.append(landmark)
+            from_landmarks.append(lower_bound_distances(out_bounds, landmark, self.index))
+            to_landmarks.append(lower_bound_distances(in_bounds, landmark, self.index))
+            distances = from_landmarks[-1] + to_landmarks[-1]
+            farthest = distances if len(self.landmarks) == 1 else np.minimum(farthest, distances)
+        # distances of landmarks x nodes
+        self.from_landmarks = np.array(from_landmarks).reshape(len(self.landmarks), len(self.nodes))
+        self.to_landmarks = np.array(to_landmarks).reshape(len(self.landmarks), len(self.nodes))
+
+    def potentials(self, target: int) -> Dict[int, Union[int, float]]:
+        """
+        Lower bounds of travel time to the target for all nodes, used as A* potentials.
+        Potentials are feasible: lower bound of the edge is not less than difference of potentials of its nodes,
+        so arrival plus potential never decreases along the path and the first found path to the target is optimal.
+        Bounds are differences of integer travel times, so finite potentials are int and priorities stay
+        integer seconds as required by the radix queue. Infinite potential means, that the target
+        is not reachable from the node
+        :param target: int Target node
+        :return: Dict[int, Union[int, float]]
+        """
+        return dict(zip(self.nodes, self._potentials(target, np.arange(len(self.nodes)))))
+
+    def fill_potentials(self, target: int, potentials: List[Union[int, float]], positions: np.ndarray):
+        """
+        Fill preallocated list of potentials of the compiled graph in place, see potentials
+        :param target: int Target node
+        :param potentials: List Potentials by dense indexes of the graph
+        :param positions: np.ndarray Position in self.nodes of every dense index of the graph
+        :return:
+        """
+        potentials[:] = self._potentials(target, positions)
+
+    def _potentials(self, target: int, positions: np.ndarray) -> List[Union[int, float]]:
+        """
+        Potentials of nodes at positions, int for finite ones and math.inf for not reachable ones
+        :param target: int Target node
+        :param positions: np.ndarray Positions of nodes in self.nodes
+        :return: List[Union[int, float]]
+        """
+        if target not in self.index:
+            return [0] * len(positions)
+        t = self.index[target]
+        with np.errstate(invalid='ignore'):
+            bounds = np.concatenate((self.to_landmarks[:, positions] - self.to_landmarks[:, t:t + 1],
+                                     self.from_landmarks[:, t:t + 1] - self.from_landmarks[:, positions]))
+        # nan comes from landmarks not connected with both nodes, such landmarks give no bound
+        potentials = np.fmax(np.fmax.reduce(bounds, axis=0), 0) if len(bounds) else np.zeros(len(positions))
+        finite = np.isfinite(potentials)
+        result = np.where(finite, potentials, 0).astype(np.int64).tolist()
+        for i in np.flatnonzero(~finite).tolist():
+            result[i] = math.inf
+        return result
@@ -0,0 +1,135 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from typing import Dict
+
+from atf import ATF
+
+NodeStats = namedtuple('NodeStats', ['shortcuts', 'new_shortcuts', 'removed_edges', 'shortcuts_size',
+                                     'removed_size', 'contracted_neighbours', 'depth'])
+
+
+def composition_size(f: ATF, g: ATF) -> int:
+    """
+    Estimation of connections count in composition g(f) without calculating it.
+    Every connection of f is followed by a walk or a connection of g, and the other way round
+    :param f: ATF Function to the contracted node
+    :param g: ATF Function from the contracted node
+    :return:
+    """
+    if f.walk and g.walk:
+        return f.size + g.size
+    if g.walk:
+        return f.size
+    if f.walk:
+        return g.size
+    return min(f.size, g.size)
+
+
+def node_stats(graph: Dict[int, Dict[int, ATF]], in_nodes: Dict[int, Dict[int, ATF]], node: int,
+               contracted_neighbours: int = 0, depth: int = 0) -> NodeStats:
+    """
+    Simulate contraction of the node over not contracted part of the graph
+    :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+    :param in_nodes: Dict[int, Dict[int, ATF]] In-going edges of not contracted part of the graph
+    :param node: int Node for simulation
+    :param contracted_neighbours: int Count of already contracted neighbours of the node
+    :param depth: int Depth of the node in the hierarchy
+    :return:
+    """
+    shortcuts = 0
+    new_shortcuts = 0
+    shortcuts_size = 0
+    out = graph[node]
+    for previous_node, f in in_nodes[node].items():
+        previous_out = graph[previous_node]
+        for next_node, g in out.items():
+            if previous_node != next_node:
+                shortcuts += 1
+                new_shortcuts += next_node not in previous_out
+                shortcuts_size += composition_size(f, g)
+    removed_size = sum(f.size for f in out.values()) + sum(f.size for f in in_nodes[node].values())
+    return NodeStats(shortcuts=shortcuts,
+                     new_shortcuts=new_shortcuts,
+                     removed_edges=len(out) + len(in_nodes[node]),
+                     shortcuts_size=shortcuts_size,
+                     removed_size=removed_size,
+                     contracted_neighbours=contracted_neighbours,
+                     depth=depth)
+
+
+class Ordering(ABC):
+
+    def __init__(self, lazy: bool = True):
+        """
+        Order of nodes contraction.
+        Priority is calculated from the simulated contraction of the node (NodeStats), nodes with lower priority
+        are contracted first. Subclasses define priority.
+        Priorities of neighbours are recalculated once after contraction of the node
+        :param lazy: bool If True, priority of the popped node is recalculated as well
+                     and the node is pushed back if it is not the minimum anymore.
+                     It catches changes of existing edges between neighbours of the node
+        """
+        self.lazy = lazy
+
+    @abstractmethod
+    def priority(self, stats: NodeStats) -> float:
+        """
+        Priority of the node by its simulated contraction, nodes with lower priority are contracted first
+        :param stats: NodeStats Simulated contraction of the node
+        :return:
+        """
+
+
+class EdgeDifference(Ordering):
+    """
+    Count of shortcuts minus count of removed edges plus depth, as in the default contraction order
+    """
+
+    def priority(self, stats: NodeStats) -> float:
+        return stats.shortcuts - stats.removed_edges + stats.depth
+
+
+class SimulatedShortcuts(Ordering):
+    """
+    Edge difference, which does not count shortcuts for already existing edges,
+    with count of contracted neighbours for the uniform contraction over the graph
+    """
+
+    def priority(self, stats: NodeStats) -> float:
+        return stats.new_shortcuts - stats.removed_edges + stats.contracted_neighbours + stats.depth
+
+
+class ComplexityOrdering(Ordering):
+
+    def __init__(self, lazy: bool = True, edges_weight: float = 1., size_weight: float = 1.,
+                 contracted_weight: float = 1., depth_weight: float = 1.):
+        """
+        Weighted sum of edge difference, difference of connections count in new and removed functions,
+        count of contracted neighbours and depth. Connections difference is normalized by size of removed
+        functions, so it keeps the same scale as the count of edges
+        :param lazy: bool Lazy priority updates
+        :param edges_weight: float Weight of edge difference
+        :param size_weight: float Weight of connections count difference
+        :param contracted_weight: float Weight of count of contracted neighbours
+        :param depth_weight: float Weight of depth
+        """
+        super().__init__(lazy)
+        self.edges_weight = edges_weight
+        self.size_weight = size_weight
+        self.contracted_weight = contracted_weight
+        self.depth_weight = depth_weight
+
+    def priority(self, stats: NodeStats) -> float:
+        average_size = stats.removed_size / stats.removed_edges if stats.removed_edges else 1.
+        size_difference = (stats.shortcuts_size - stats.removed_size) / max(average_size, 1.)
+        return (self.edges_weight * (stats.new_shortcuts - stats.removed_edges)
+                + self.size_weight * size_difference
+                + self.contracted_weight * stats.contracted_neighbours
+                + self.depth_weight * stats.depth)
+
+
+ORDERINGS = {
+    'edge_difference': EdgeDifference,
+    'shortcuts': SimulatedShortcuts,
+    'complexity': ComplexityOrdering
+}
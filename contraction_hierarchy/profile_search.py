@@ -0,0 +1,201 @@
+from typing import Union, Dict, Any
+import heapq
+import time
+import math
+import logging
+
+from atf import ATF, min_atf
+from graph import ContactionTransportGraph
+from trip import Walk
+from bidirectional_search import backward_search, TCH
+from algorithms_wrapper import _check_running_time
+from utils import to_milliseconds
+
+
+class ProfileSearch:
+    def __init__(self, graph: ContactionTransportGraph, start_time: int, end_time: int, start_node: int, end_node: int):
+        """
+        Profile query over Contraction Hierarchy: earliest arrival function for departures between start_time
+        and end_time with all Pareto optimal journeys.
+        Arrival time functions from the source are propagated by composition and min_atf: first over up moves
+        in order of hierarchy, then over down moves inside of the corridor of the target in reversed order of hierarchy.
+        Both move directions form acyclic graphs, so every node is processed once.
+        Connections arriving after the earliest arrival for departure at end_time (point query), plus lower bound
+        of travel time to the target after down moves, could not be optimal and are dropped
+
+        :param graph: ContactionTransportGraph Contracted graph on which we run the search
+        :param start_time: int Earliest departure in unix time
+        :param end_time: int Latest departure in unix time
+        :param start_node: int Start node
+        :param end_node: int End node
+        """
+        self.graph = graph
+
+        self.source = start_node
+        self.target = end_node
+        self.start_time = start_time - graph.time_origin
+        self.end_time = end_time - graph.time_origin
+        self.latest_arrival = math.inf
+
+        self.up_functions = {}
+        self.down_functions = {}
+
+    def profile(self, duration: Union[float, None] = None) -> Dict[str, Any]:
+        """
+        Find profile query.
+        Shortcuts of composed functions are added to the unpacking table of the graph only for the time of the query
+
+        :param duration: Maximum allowed duration of process time in seconds
+        :return: {'journeys': [{'departure', 'arrival', 'path', 'routes'}] sorted by departure,
+                             the last one could depart after end_time, if it is optimal for departures before it,
+                  'walk': {'duration', 'path', 'routes'} or None, if walking is possible all the time,
+                  'profile': ATF between the nodes with times relative to graph.time_origin
+                             and indexes of journeys as payloads,
+                  'duration': process time in milliseconds}
+        """
+        exception = None
+        start_time = time.monotonic()
+
+        graph = self.graph
+        hierarchy = graph.hierarchy
+        table = graph.unpacking
+        table_size = len(table)
+        # rows of composed functions are removed from the shared table even if the search fails
+        try:
+            corridor, _ = backward_search(graph, self.target)
+            lower_bounds = self._up_lower_bounds(corridor)
+
+            f = None
+            if self.source != self.target:
+                end_time = self.end_time + graph.time_origin
+                self.latest_arrival = (TCH(graph, end_time, self.source, self.target).shortest_path(duration)['arrival']
+                                       - graph.time_origin)
+                # point query, which was stopped by duration, does not give a bound of optimal arrivals
+                exception = _check_running_time(start_time, duration, "Profile search")
+                # up moves from the source and down moves from it straight into the corridor
+                queue = []
+                if not exception:
+                    for node, g in graph.graph[self.source].items():
+                        if hierarchy[node] > hierarchy[self.source]:
+                            h = g.restricted(self.start_time, self.latest_arrival - lower_bounds[node])
+                            if h is not None:
+                                self.up_functions[node] = h
+                                heapq.heappush(queue, (hierarchy[node], node))
+                        elif node in corridor:
+                            h = g.restricted(self.start_time, self.latest_arrival - corridor[node])
+                            if h is not None:
+                                self.down_functions[node] = h
+                while queue and not exception:
+                    exception = _check_running_time(start_time, duration, "Profile search")
+                    _, winner_node = heapq.heappop(queue)
+                    winner_f = self.up_functions[winner_node]
+                    for node, g in graph.graph[winner_node].items():
+                        if hierarchy[node] > hierarchy[winner_node]:
+                            h = self._compose(winner_f, winner_node, g, lower_bounds[node])
+                            if h is not None:
+                                if node not in self.up_functions:
+                                    heapq.heappush(queue, (hierarchy[node], node))
+                                self._add(self.up_functions, node, h)
+
+                queue = [(-hierarchy[node], node) for node in corridor
+                         if node in self.up_functions or node in self.down_functions]
+                heapq.heapify(queue)
+                while queue and not exception:
+                    exception = _check_running_time(start_time, duration, "Profile search")
+                    _, winner_node = heapq.heappop(queue)
+                    winner_f = self._merge(self.up_functions.get(winner_node), self.down_functions.get(winner_node))
+                    if winner_node == self.target:
+                        f = winner_f
+                        break
+                    for node, g in graph.graph[winner_node].items():
+                        if hierarchy[node] < hierarchy[winner_node] and node in corridor:
+                            h = self._compose(winner_f, winner_node, g, corridor[node])
+                            if h is not None:
+                                if node not in self.up_functions and node not in self.down_functions:
+                                    heapq.heappush(queue, (-hierarchy[node], node))
+                                self._add(self.down_functions, node, h)
+
+            journeys = []
+            walk = None
+            profile = ATF()
+            if f is not None and not exception:
+                for i, payload in enumerate(f.p):
+                    path, routes = table.unpack(payload, self.source, self.target)
+                    journeys.append({'departure': f.d[i] + graph.time_origin, 'arrival': f.a[i] + graph.time_origin,
+                                     'path': path, 'routes': routes})
+                if f.walk:
+                    path, routes = table.unpack(f.walk.payload, self.source, self.target)
+                    walk = {'duration': f.walk.w, 'path': path, 'routes': routes}
+                profile = ATF(walk=f.walk and Walk(w=f.walk.w), d=f.d, a=f.a, p=range(f.size))
+            elif not exception and self.source != self.target:
+                logging.warning(f"Target {self.target} not reachable from node {self.source}")
+        finally:
+            table.truncate(table_size)
+        return {
+            'journeys': journeys,
+            'walk': walk,
+            'profile': profile,
+            'duration': to_milliseconds(time.monotonic() - start_time)
+        }
+
+    def _up_lower_bounds(self, corridor: Dict[int, float]) -> Dict[int, float]:
+        """
+        Lower bounds of travel time to the target for nodes reachable from the source by up moves.
+        Path from such node goes further up and then down inside of the corridor, so bounds are calculated
+        from the highest nodes down. Nodes, from which the corridor is not reachable, get infinite bound
+        :param corridor: Dict[int, float] Lower bounds of travel time to the target by down moves
+        :return:
+        """
+        hierarchy = self.graph.hierarchy
+        up_travel_time_bounds = self.graph.up_travel_time_bounds
+        nodes = [self.source]
+        visited = {self.source}
+        for node in nodes:
+            for next_node in up_travel_time_bounds.get(node, {}):
+                if next_node not in visited:
+                    visited.add(next_node)
+                    nodes.append(next_node)
+        lower_bounds = {}
+        for node in sorted(nodes, key=hierarchy.__getitem__, reverse=True):
+            lower_bound = corridor.get(node, math.inf)
+            for next_node, (edge_lower, _) in up_travel_time_bounds.get(node, {}).items():
+                if edge_lower + lower_bounds[next_node] < lower_bound:
+                    lower_bound = edge_lower + lower_bounds[next_node]
+            lower_bounds[node] = lower_bound
+        return lower_bounds
+
+    def _compose(self, f: ATF, node: int, g: ATF, lower_bound: float) -> Union[ATF, None]:
+        """
+        Function from the source over node and edge g without connections, which could not be optimal
+
+        :param f: ATF Function from the source to node
+        :param node: int Node between f and g
+        :param g: ATF Function of the edge from node
+        :param lower_bound: Lower bound of travel time from the end of g to the target
+        :return:
+        """
+        latest_arrival = self.latest_arrival - lower_bound
+        earliest_departure = min(f.a[0] if f.size else math.inf, self.start_time + f.walk.w if f.walk else math.inf)
+        # connections of g, which could not be caught or are too late anyway, are dropped before composition
+        g = g.restricted(earliest_departure, latest_arrival)
+        if g is None:
+            return None
+        h = g.composition(f, node, self.graph.unpacking)
+        return h and h.restricted(self.start_time, latest_arrival)
+
+    @staticmethod
+    def _merge(f: Union[ATF, None], g: Union[ATF, None]) -> Union[ATF, None]:
+        """
+        Minimum of functions, any of which could be absent
+        """
+        if f is None:
+            return g
+        if g is None:
+            return f
+        return min_atf(f, g)
+
+    def _add(self, functions: Dict[int, ATF], node: int, f: ATF):
+        """
+        Update function from the source to node by minimum with f
+        """
+        functions[node] = self._merge(functions.get(node), f)
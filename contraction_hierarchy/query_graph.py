@@ -0,0 +1,300 @@
+import math
+import time
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Dict, Union, Any, Tuple
+
+import numpy as np
+
+from atf import ATF
+from landmarks import Landmarks
+from queues import priority_queue
+from unpacking import follow_parents
+from algorithms_wrapper import _check_running_time
+from utils import to_milliseconds
+
+
+class QueryGraph:
+    def __init__(self, graph):
+        """
+        Compiled read only representation of the graph for queries.
+        Nodes are renumbered to dense indexes 0..n-1 in order of hierarchy, so for contracted graph
+        the move is up if and only if index of the next node is greater. Out-going edges are stored in CSR arrays:
+        edges of node v are offsets[v]..offsets[v + 1] - 1 with indexes of next nodes in targets and functions
+        in functions (with their departures, arrivals and walk durations in separate lists).
+        Down moves into the node are stored in the same way (down_offsets, down_sources),
+        they replace geometrical containers: nodes, from which the target is reachable by down moves,
+        are found once per query.
+        Labels of the query are kept in lists indexed by dense indexes instead of dictionaries
+
+        :param graph: TransportGraph or ContactionTransportGraph
+        """
+        hierarchy = getattr(graph, 'hierarchy', {})
+        self.contracted = bool(hierarchy)
+        self.nodes = sorted(graph.nodes, key=lambda node: (hierarchy.get(node, -1), node))
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.time_origin = graph.time_origin
+        self.unpacking = graph.unpacking
+        self.landmarks = graph.landmarks
+        # one Router by (queue, geometrical_containers) for queries of Dijkstra and FCH
+        self.routers: Dict[Tuple[str, bool], 'Router'] = {}
+
+        index = self.index
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.functions = []
+        # columns of functions by edges for the query loop
+        self.departures = []
+        self.arrivals = []
+        self.walks = []
+        self.down_offsets = array('i', [0])
+        self.down_sources = array('i')
+        for i, node in enumerate(self.nodes):
+            out = sorted((index[next_node], f) for next_node, f in graph.graph.get(node, {}).items())
+            self.targets.extend(next_node for next_node, _ in out)
+            self.functions.extend(f for _, f in out)
+            self.departures.extend(f.d for _, f in out)
+            self.arrivals.extend(f.a for _, f in out)
+            self.walks.extend(f.walk.w if f.walk else math.inf for _, f in out)
+            self.offsets.append(len(self.targets))
+            self.down_sources.extend(sorted(index[previous_node] for previous_node in graph.in_nodes.get(node, {})
+                                            if index[previous_node] > i))
+            self.down_offsets.append(len(self.down_sources))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def edges(self, node: int) -> Dict[int, ATF]:
+        """
+        Out-going edges of the node
+        :param node: int Original node
+        :return: Dict[int, ATF] Functions by original next nodes
+        """
+        i = self.index[node]
+        return {self.nodes[self.targets[e]]: self.functions[e] for e in range(self.offsets[i], self.offsets[i + 1])}
+
+    def landmarks_precomputation(self, count: int = 16):
+        """
+        Precalculate landmarks for goal directed search, the same as TransportGraph.landmarks_precomputation
+        :param count: int Count of landmarks
+        :return:
+        """
+        self.landmarks = Landmarks({node: self.edges(node) for node in self.nodes}, sorted(self.nodes), count)
+
+    def corridor(self, target: int) -> bytearray:
+        """
+        Nodes, from which the target is reachable by down moves, i.e. nodes with the target in geometrical container
+        :param target: int Dense index of the target
+        :return: bytearray Flag for every dense index
+        """
+        down_offsets, down_sources = self.down_offsets, self.down_sources
+        corridor = bytearray(len(self.nodes))
+        corridor[target] = 1
+        stack = [target]
+        while stack:
+            node = stack.pop()
+            for e in range(down_offsets[node], down_offsets[node + 1]):
+                previous_node = down_sources[e]
+                if not corridor[previous_node]:
+                    corridor[previous_node] = 1
+                    stack.append(previous_node)
+        return corridor
+
+    def shortest_path(self, start_time: int, start_node: int, end_node: int, duration: Union[float, None] = None,
+                      queue: str = 'heapq', goal_directed: bool = False, geometrical_containers: bool = True,
+                      algorithm: str = 'Dijkstra') -> Dict[str, Any]:
+        """
+        Earliest arrival query over the compiled graph: Dijkstra for the original graph
+        and Forward Search with up and down moves for the contracted one.
+        Called by Dijkstra and FCH, when they get QueryGraph. The search runs in Router,
+        which is kept by the graph for every queue and switcher of geometrical containers
+
+        :param start_time: int Start time relative to time_origin
+        :param start_node: int Original start node
+        :param end_node: int Original end node
+        :param duration: Maximum allowed duration of process time in seconds
+        :param queue: str Priority queue of labels, see queues.priority_queue
+        :param goal_directed: bool A* search with potentials from landmarks
+        :param geometrical_containers: bool Down moves of Forward Search only to nodes,
+                                       from which the target is reachable
+        :param algorithm: str Name of the algorithm for messages
+        :return: {'path', 'routes', 'roots', 'arrival', 'duration'} as in Dijkstra and FCH
+        """
+        router = self.routers.get((queue, geometrical_containers))
+        if router is None:
+            router = self.routers[queue, geometrical_containers] = Router(self, queue, geometrical_containers)
+        return router._search(start_time, start_node, end_node, duration, goal_directed, algorithm)
+
+
+class Router:
+    def __init__(self, graph, queue: str = 'heapq', geometrical_containers: bool = True, goal_directed: bool = False):
+        """
+        Long-lived search over the compiled graph for many queries: Dijkstra for the original graph
+        and Forward Search for the contracted one, the same as QueryGraph.shortest_path.
+        Labels are kept in lists indexed by dense indexes, which are allocated once.
+        Labels are not reset between queries: label of the node is valid only if its stamp
+        equals to version of the current query, the same for the corridor of geometrical containers
+
+        :param graph: QueryGraph, TransportGraph or ContactionTransportGraph, the last two are compiled by query_graph
+        :param queue: str Priority queue of labels, see queues.priority_queue
+        :param geometrical_containers: bool Down moves of Forward Search only to nodes,
+                                       from which the target is reachable
+        :param goal_directed: bool A* search with potentials from landmarks, see Dijkstra and FCH
+        """
+        self.graph = graph if isinstance(graph, QueryGraph) else graph.query_graph()
+        self.queue = queue
+        self.geometrical_containers = geometrical_containers
+        self.goal_directed = goal_directed
+        if goal_directed and self.graph.landmarks is None:
+            self.graph.landmarks_precomputation()
+        n = len(self.graph)
+        self.weights = [math.inf] * n
+        self.parents = [None] * n
+        self.payloads = [None] * n
+        self.down_move = bytearray(n)
+        self.stamps = [0] * n
+        self.corridor = [0] * n
+        self.potentials = [0] * n
+        self.zero_potentials = [0] * n
+        # landmarks of the filled potentials and positions of dense indexes in their nodes
+        self.potentials_landmarks = None
+        self.potentials_positions = None
+        self.version = 0
+
+    def query(self, source: int, target: int, start_time: int, duration: Union[float, None] = None
+              ) -> Dict[str, Any]:
+        """
+        Find shortest path query
+        :param source: int Start node
+        :param target: int End node
+        :param start_time: int Start time in unix time
+        :param duration: Maximum allowed duration of process time in seconds
+        :return: {'path', 'routes', 'roots', 'arrival', 'duration'} as in Dijkstra and FCH
+        """
+        return self._search(start_time - self.graph.time_origin, source, target, duration, self.goal_directed,
+                            'FCH' if self.graph.contracted else 'Dijkstra')
+
+    def _fill_potentials(self, target: int):
+        """
+        Fill potentials of the target in the preallocated list, see Landmarks.fill_potentials
+        :param target: int Original target node
+        :return:
+        """
+        landmarks = self.graph.landmarks
+        if landmarks is None:
+            self.graph.landmarks_precomputation()
+            landmarks = self.graph.landmarks
+        if self.potentials_landmarks is not landmarks:
+            self.potentials_landmarks = landmarks
+            self.potentials_positions = np.array([landmarks.index[node] for node in self.graph.nodes],
+                                                 dtype=np.int64)
+        landmarks.fill_potentials(target, self.potentials, self.potentials_positions)
+
+    def _mark_corridor(self, target: int, version: int):
+        """
+        Stamp nodes, from which the target is reachable by down moves, see QueryGraph.corridor
+        :param target: int Dense index of the target
+        :param version: int Version of the query
+        :return:
+        """
+        down_offsets, down_sources = self.graph.down_offsets, self.graph.down_sources
+        corridor = self.corridor
+        corridor[target] = version
+        stack = [target]
+        while stack:
+            node = stack.pop()
+            for e in range(down_offsets[node], down_offsets[node + 1]):
+                previous_node = down_sources[e]
+                if corridor[previous_node] != version:
+                    corridor[previous_node] = version
+                    stack.append(previous_node)
+
+    def _search(self, start_time: int, start_node: int, end_node: int, duration: Union[float, None],
+                goal_directed: bool, algorithm: str) -> Dict[str, Any]:
+        """
+        Earliest arrival query, see QueryGraph.shortest_path
+        :param start_time: int Start time relative to time_origin
+        :return:
+        """
+        exception = None
+        start = time.monotonic()
+
+        graph = self.graph
+        offsets, targets, functions = graph.offsets, graph.targets, graph.functions
+        departures, arrivals, walks = graph.departures, graph.arrivals, graph.walks
+        weights, parents, payloads, down_move = self.weights, self.parents, self.payloads, self.down_move
+        stamps, corridor = self.stamps, self.corridor
+        self.version += 1
+        version = self.version
+        source = graph.index[start_node]
+        target = graph.index[end_node]
+        contracted = graph.contracted
+        use_corridor = contracted and self.geometrical_containers
+        if use_corridor:
+            self._mark_corridor(target, version)
+        if goal_directed:
+            self._fill_potentials(end_node)
+        potentials = self.potentials if goal_directed else self.zero_potentials
+
+        priorities = priority_queue(self.queue)
+        weights[source] = start_time
+        parents[source] = None
+        down_move[source] = 0
+        stamps[source] = version
+
+        winner_node = source
+        winner_weight = start_time
+        while winner_node != target and not exception:
+            exception = _check_running_time(start, duration, algorithm)
+            winner_down_move = down_move[winner_node]
+            for e in range(offsets[winner_node], offsets[winner_node + 1]):
+                node = targets[e]
+                if contracted:
+                    if node > winner_node:
+                        if winner_down_move:
+                            continue
+                        move = 0
+                    elif not use_corridor or corridor[node] == version:
+                        move = 1
+                    else:
+                        continue
+                # ATF.arrival inlined, payload is taken only for improved labels
+                d = departures[e]
+                i = bisect_left(d, winner_weight)
+                new_weight = arrivals[e][i] if i < len(d) else math.inf
+                walk = walks[e]
+                if winner_weight + walk < new_weight:
+                    new_weight = winner_weight + walk
+                    i = -1
+                if new_weight < (weights[node] if stamps[node] == version else math.inf):
+                    priority = new_weight + potentials[node]
+                    if priority != math.inf:
+                        weights[node] = new_weight
+                        stamps[node] = version
+                        priorities[node] = priority
+                        parents[node] = winner_node
+                        payloads[node] = functions[e].p[i] if i >= 0 else functions[e].walk.payload
+                        if contracted:
+                            down_move[node] = move
+            try:
+                winner_node, _ = priorities.popitem()
+                winner_weight = weights[winner_node]
+            except IndexError:
+                logging.warning(f"Target {end_node} not reachable from node {start_node}")
+                return {
+                    'path': [],
+                    'routes': [],
+                    'roots': [],
+                    'arrival': math.inf,
+                    'duration': to_milliseconds(time.monotonic() - start)
+                }
+        roots, payloads = follow_parents(winner_node, parents, payloads, graph.nodes)
+        path, routes = graph.unpacking.unpack_path(roots, payloads)
+        return {
+            'path': path,
+            'routes': routes,
+            'roots': roots,
+            'arrival': winner_weight + graph.time_origin,
+            'duration': to_milliseconds(time.monotonic() - start)
+        }
@@ -0,0 +1,237 @@
+import heapq
+import operator
+from typing import Dict, Tuple, Any, Union
+
+import heapdict
+
+
+class LazyHeapQueue:
+    __slots__ = 'heap', 'priorities'
+
+    def __init__(self, items: Dict[Any, Union[int, float]] = None):
+        """
+        Priority queue over heapq with lazy deletion.
+        Update of priority pushes new entry, outdated entries are skipped, when they are popped
+        :param items: Dict Initial priorities of keys
+        """
+        self.priorities = dict(items or {})
+        self.heap = [(priority, key) for key, priority in self.priorities.items()]
+        heapq.heapify(self.heap)
+
+    def __len__(self) -> int:
+        return len(self.priorities)
+
+    def __contains__(self, key) -> bool:
+        return key in self.priorities
+
+    def __getitem__(self, key) -> Union[int, float]:
+        return self.priorities[key]
+
+    def __setitem__(self, key, priority: Union[int, float]):
+        self.priorities[key] = priority
+        heapq.heappush(self.heap, (priority, key))
+
+    def popitem(self) -> Tuple[Any, Union[int, float]]:
+        """
+        Remove and return key with the smallest priority, ties are broken by the smallest key
+        :return: (key, priority)
+        """
+        heap = self.heap
+        priorities = self.priorities
+        while heap:
+            priority, key = heapq.heappop(heap)
+            if priorities.get(key) == priority:
+                del priorities[key]
+                return key, priority
+        raise IndexError('popitem(): empty queue')
+
+
+class IndexedHeapQueue:
+    __slots__ = 'keys', 'priorities', 'positions'
+
+    def __init__(self, items: Dict[Any, Union[int, float]] = None):
+        """
+        Binary heap with positions of keys, so priority of the key is updated in place (decrease key)
+        and the heap never keeps outdated entries. Keys and priorities are kept in parallel lists
+        :param items: Dict Initial priorities of keys
+        """
+        self.keys = []
+        self.priorities = []
+        self.positions = {}
+        for key, priority in (items or {}).items():
+            self[key] = priority
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self.positions
+
+    def __getitem__(self, key) -> Union[int, float]:
+        return self.priorities[self.positions[key]]
+
+    def __setitem__(self, key, priority: Union[int, float]):
+        position = self.positions.get(key)
+        if position is None:
+            self.keys.append(key)
+            self.priorities.append(priority)
+            self._sift_up(len(self.keys) - 1, key, priority)
+        elif priority <= self.priorities[position]:
+            self._sift_up(position, key, priority)
+        else:
+            self._sift_down(position, key, priority)
+
+    def popitem(self) -> Tuple[Any, Union[int, float]]:
+        """
+        Remove and return key with the smallest priority, ties are broken by the smallest key
+        :return: (key, priority)
+        """
+        if not self.keys:
+            raise IndexError('popitem(): empty queue')
+        key, priority = self.keys[0], self.priorities[0]
+        del self.positions[key]
+        last_key, last_priority = self.keys.pop(), self.priorities.pop()
+        if self.keys:
+            self._sift_down(0, last_key, last_priority)
+        return key, priority
+
+    def _sift_up(self, position: int, key, priority: Union[int, float]):
+        """
+        Move the hole at position to the root, while parents are greater than (priority, key), and put key there
+        """
+        keys, priorities, positions = self.keys, self.priorities, self.positions
+        while position:
+            parent = (position - 1) >> 1
+            if (priorities[parent], keys[parent]) <= (priority, key):
+                break
+            keys[position] = keys[parent]
+            priorities[position] = priorities[parent]
+            positions[keys[position]] = position
+            position = parent
+        keys[position] = key
+        priorities[position] = priority
+        positions[key] = position
+
+    def _sift_down(self, position: int, key, priority: Union[int, float]):
+        """
+        Move the hole at position to the leaves, while children are less than (priority, key), and put key there
+        """
+        keys, priorities, positions = self.keys, self.priorities, self.positions
+        size = len(keys)
+        child = 2 * position + 1
+        while child < size:
+            if child + 1 < size and (priorities[child + 1], keys[child + 1]) < (priorities[child], keys[child]):
+                child += 1
+            if (priority, key) <= (priorities[child], keys[child]):
+                break
+            keys[position] = keys[child]
+            priorities[position] = priorities[child]
+            positions[keys[position]] = position
+            position = child
+            child = 2 * position + 1
+        keys[position] = key
+        priorities[position] = priority
+        positions[key] = position
+
+
+class RadixHeapQueue:
+    __slots__ = 'buckets', 'priorities', 'last'
+
+    def __init__(self, items: Dict[Any, int] = None):
+        """
+        Radix heap for monotone integer priorities: no priority is less than the last popped one,
+        as for earliest arrival times in seconds in Dijkstra and Forward Search.
+        Entry is kept in the bucket of the highest bit, in which its priority differs from the last popped one,
+        so every entry is moved to lower buckets only a few times. Entries of the last popped priority
+        are kept in heap to break ties by the smallest key. Outdated entries are skipped as in heapq queue
+        More information could be found by the next link:
+        https://doi.org/10.1145/77600.77615
+        :param items: Dict Initial priorities of keys
+        """
+        self.buckets = [[] for _ in range(65)]
+        self.priorities = {}
+        self.last = None
+        for key, priority in (items or {}).items():
+            self[key] = priority
+
+    def __len__(self) -> int:
+        return len(self.priorities)
+
+    def __contains__(self, key) -> bool:
+        return key in self.priorities
+
+    def __getitem__(self, key) -> int:
+        return self.priorities[key]
+
+    def _bucket(self, priority: int) -> int:
+        """
+        Bucket of priority: bit length of difference with the last popped priority,
+        the last bucket is used before the first pop and for priorities of the other sign
+        """
+        if self.last is None:
+            return 64
+        difference = priority ^ self.last
+        return difference.bit_length() if difference >= 0 else 64
+
+    def __setitem__(self, key, priority: int):
+        try:
+            # numpy integers, as start times taken from DataFrame rows, are kept as python int
+            priority = operator.index(priority)
+        except TypeError:
+            raise ValueError(f'Radix queue requires integer priorities, got {priority!r}') from None
+        if self.last is not None and priority < self.last:
+            raise ValueError(f'Priority {priority} is less than the last popped priority {self.last}')
+        self.priorities[key] = priority
+        bucket = self._bucket(priority)
+        if bucket:
+            self.buckets[bucket].append((priority, key))
+        else:
+            heapq.heappush(self.buckets[0], (priority, key))
+
+    def popitem(self) -> Tuple[Any, int]:
+        """
+        Remove and return key with the smallest priority, ties are broken by the smallest key
+        :return: (key, priority)
+        """
+        buckets = self.buckets
+        priorities = self.priorities
+        while True:
+            first = buckets[0]
+            while first:
+                priority, key = heapq.heappop(first)
+                if priorities.get(key) == priority:
+                    del priorities[key]
+                    return key, priority
+            for i in range(1, 65):
+                if buckets[i]:
+                    break
+            else:
+                raise IndexError('popitem(): empty queue')
+            entries = [entry for entry in buckets[i] if priorities.get(entry[1]) == entry[0]]
+            buckets[i] = []
+            if entries:
+                self.last = min(entries)[0]
+                for entry in entries:
+                    buckets[self._bucket(entry[0])].append(entry)
+                heapq.heapify(first)
+
+
+QUEUES = {
+    'heapdict': heapdict.heapdict,
+    'heapq': LazyHeapQueue,
+    'indexed': IndexedHeapQueue,
+    'radix': RadixHeapQueue,
+}
+
+
+def priority_queue(name: str, items: Dict[Any, Union[int, float]] = None):
+    """
+    Priority queue of search labels with heapdict interface: queue[key] = priority, popitem() and len()
+    :param name: str 'heapdict', 'heapq' (lazy deletion), 'indexed' (binary heap with decrease key)
+                 or 'radix' (radix heap for integer priorities, which never go below the last popped one)
+    :param items: Dict Initial priorities of keys
+    :return:
+    """
+    if name not in QUEUES:
+        raise ValueError(f'Unknown priority queue {name}, expected one of {", ".join(QUEUES)}')
+    return QUEUES[name](items or {})
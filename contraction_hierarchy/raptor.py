@@ -0,0 +1,181 @@
+import heapq
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Union, Dict, List, Set, Tuple
+
+from timetable import Timetable
+from algorithms_wrapper import _check_running_time
+from utils import to_milliseconds
+
+
+class Raptor:
+    def __init__(self, timetable: Timetable, start_time: int, start_node: int, end_node: int,
+                 max_rounds: int = None):
+        """
+        Round-based public transit routing (RAPTOR) over the raw timetable, no preprocessing is needed.
+        Round k scans route patterns through stops improved in the previous round and boards the earliest trip,
+        which could be caught at every stop by arrival of the previous round, then footpaths are relaxed,
+        so journeys found in round k have at most k trips. Footpaths are not transitively closed,
+        so they are relaxed by Dijkstra over walk connections from improved stops, as walk paths in TransportGraph.
+        Labels are the best known arrivals, which are pruned by arrival to the target.
+        More information could be found by the next link:
+        https://www.microsoft.com/en-us/research/publication/round-based-public-transit-routing/
+
+        :param timetable: Timetable Raw timetable of the city
+        :param start_time: int Start time in unix
+        :param start_node: int Start stop
+        :param end_node: int Target stop
+        :param max_rounds: int Maximum count of rounds (trips) or None for all
+        """
+        self.timetable = timetable
+        self.source = start_node
+        self.target = end_node
+        self.start_time = start_time - timetable.time_origin
+        self.max_rounds = max_rounds
+
+        n = len(timetable)
+        self.arrivals = [math.inf] * n
+        # parents of stops improved in every round:
+        # (previous stop, pattern, trip, boarding position, alighting position) or (previous stop, None, ...) for walk
+        self.parents = [{}]
+
+    def shortest_path(self, duration: Union[float, None] = None) -> Dict[str, Union[List[Union[int, str]], int]]:
+        """
+        Find shortest path query
+
+        :param duration: Maximum allowed duration of process time in seconds
+        :return: {'path', 'routes', 'roots', 'arrival', 'duration'} as in Dijkstra
+        """
+        start_time = time.monotonic()
+        exception = None
+        index = self.timetable.index
+        source = index.get(self.source)
+        target = index.get(self.target)
+        if source is not None and target is not None:
+            self.arrivals[source] = self.start_time
+            marked = self._footpaths({source}, target)
+            rounds = 0
+            while marked and not exception and (self.max_rounds is None or rounds < self.max_rounds):
+                exception = _check_running_time(start_time, duration, "RAPTOR")
+                self.parents.append({})
+                marked = self._footpaths(self._scan_patterns(marked, target), target)
+                rounds += 1
+
+        if target is None or self.arrivals[target] == math.inf:
+            message = f"Target {self.target} not reachable from node {self.source}"
+            logging.warning(message)
+            return {
+                'path': [],
+                'routes': [],
+                'roots': [],
+                'arrival': math.inf,
+                'duration': to_milliseconds(time.monotonic() - start_time)
+            }
+        path, routes = self._journey(source, target)
+        return {
+            'path': path,
+            'routes': routes,
+            'roots': path,
+            'arrival': self.arrivals[target] + self.timetable.time_origin,
+            'duration': to_milliseconds(time.monotonic() - start_time)
+        }
+
+    def _scan_patterns(self, marked: Set[int], target: int) -> Set[int]:
+        """
+        One round: scan every pattern from the first marked stop on it.
+        Trips are boarded by labels of the previous round, so stops improved earlier in this round
+        do not add one more trip to the round
+        :param marked: Set[int] Stops improved in the previous round
+        :param target: int Dense index of the target
+        :return: Set[int] Improved stops
+        """
+        timetable = self.timetable
+        arrivals, parents = self.arrivals, self.parents[-1]
+        previous_arrivals = arrivals.copy()
+        first_positions = {}
+        for stop in marked:
+            for pattern, position in timetable.stop_patterns[stop]:
+                if position < first_positions.get(pattern, math.inf):
+                    first_positions[pattern] = position
+
+        improved = set()
+        for pattern, first_position in first_positions.items():
+            p = timetable.patterns[pattern]
+            stops, departures, trip_arrivals = p.stops, p.departures, p.arrivals
+            trip = boarding_stop = boarding_position = None
+            for position in range(first_position, len(stops)):
+                stop = stops[position]
+                if trip is not None:
+                    arrival = trip_arrivals[position][trip]
+                    if arrival < arrivals[stop] and arrival < arrivals[target]:
+                        arrivals[stop] = arrival
+                        parents[stop] = (boarding_stop, pattern, trip, boarding_position, position)
+                        improved.add(stop)
+                # earlier trip of the pattern could be caught at this stop
+                label = previous_arrivals[stop]
+                if label != math.inf and (trip is None or label <= departures[position][trip]):
+                    earliest = bisect_left(departures[position], label)
+                    if earliest < len(departures[position]) and (trip is None or earliest < trip):
+                        trip = earliest
+                        boarding_stop = stop
+                        boarding_position = position
+        return improved
+
+    def _footpaths(self, marked: Set[int], target: int) -> Set[int]:
+        """
+        Relax walk connections from marked stops by Dijkstra, so walk paths of many connections are found
+        :param marked: Set[int] Improved stops
+        :param target: int Dense index of the target
+        :return: Set[int] Marked stops together with stops improved by walk
+        """
+        footpaths = self.timetable.footpaths
+        arrivals, parents = self.arrivals, self.parents[-1]
+        improved = set(marked)
+        queue = [(arrivals[stop], stop) for stop in marked]
+        heapq.heapify(queue)
+        while queue:
+            arrival, stop = heapq.heappop(queue)
+            if arrival > arrivals[stop]:
+                continue
+            for next_stop, walk_duration in footpaths[stop]:
+                new_arrival = arrival + walk_duration
+                if new_arrival < arrivals[next_stop] and new_arrival < arrivals[target]:
+                    arrivals[next_stop] = new_arrival
+                    parents[next_stop] = (stop, None, None, None, None)
+                    improved.add(next_stop)
+                    heapq.heappush(queue, (new_arrival, next_stop))
+        return improved
+
+    def _journey(self, source: int, target: int) -> Tuple[List[int], List[str]]:
+        """
+        Restore stops and route names of the path from parents of labels
+        :param source: int Dense index of the source
+        :param target: int Dense index of the target
+        :return: (stops, route names of every move between consecutive stops)
+        """
+        timetable = self.timetable
+        legs = []
+        stop = target
+        k = len(self.parents) - 1
+        while stop != source:
+            # label of the stop was set in the last round, which improved it
+            while stop not in self.parents[k]:
+                k -= 1
+            previous_stop, pattern, _, boarding_position, alighting_position = self.parents[k][stop]
+            if pattern is None:
+                legs.append(([stop], ['walk']))
+            else:
+                # trip was boarded by arrival of the previous round
+                k -= 1
+                p = timetable.patterns[pattern]
+                stops = p.stops[boarding_position + 1:alighting_position + 1].tolist()
+                legs.append((stops, [p.route_name] * len(stops)))
+            stop = previous_stop
+        path = [timetable.stops[source]]
+        routes = []
+        for stops, route_names in reversed(legs):
+            path.extend(timetable.stops[stop] for stop in stops)
+            routes.extend(route_names)
+        return path, routes
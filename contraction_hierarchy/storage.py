@@ -0,0 +1,421 @@
+import hashlib
+import inspect
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, List, Callable, Any, Tuple
+
+import numpy as np
+
+from atf import ATF, int_array
+from containers import Container, IntervalContainer, BitsetContainer
+from graph import TransportGraph, ContactionTransportGraph
+from ordering import Ordering
+from trip import Walk
+from unpacking import UnpackingTable
+
+MAGIC = b'PFCH'
+VERSION = 2
+_PREFIX = struct.Struct('<4sII')
+_ALIGNMENT = 8
+
+
+def source_checksum(*paths: str) -> str:
+    """
+    Checksum of input csv files, which is stored with the contracted graph to find stale files
+    :param paths: str Paths to the input files
+    :return: str sha256 hex digest
+    """
+    checksum = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2 ** 20), b''):
+                checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class LazyNodes(dict):
+
+    def __init__(self, index: Dict[int, int], decode: Callable[[int], Any], default: Callable[[], Any] = None):
+        """
+        Dictionary of per node values, which are decoded from the graph file on the first access
+        :param index: Dict[int, int] Position of each stored node in the file
+        :param decode: Callable[[int], Any] Decode value by position of the node
+        :param default: Callable[[], Any] Factory of values for not stored nodes, as in defaultdict
+        """
+        super().__init__()
+        self._index = index
+        self._decode = decode
+        self._default = default
+
+    def __missing__(self, node: int) -> Any:
+        position = self._index.get(node)
+        if position is not None:
+            value = self[node] = self._decode(position)
+        elif self._default is not None:
+            value = self[node] = self._default()
+        else:
+            raise KeyError(node)
+        return value
+
+    def get(self, node: int, default: Any = None) -> Any:
+        if dict.__contains__(self, node) or node in self._index:
+            return self[node]
+        return default
+
+    def __contains__(self, node: int) -> bool:
+        return dict.__contains__(self, node) or node in self._index
+
+    def _decode_all(self):
+        for node in self._index:
+            if not dict.__contains__(self, node):
+                self.__missing__(node)
+
+    def __iter__(self):
+        self._decode_all()
+        return dict.__iter__(self)
+
+    def __len__(self) -> int:
+        self._decode_all()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._decode_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._decode_all()
+        return dict.values(self)
+
+    def items(self):
+        self._decode_all()
+        return dict.items(self)
+
+
+def _aligned(size: int) -> int:
+    """
+    Size rounded up to the alignment of sections
+    :param size: int Size in bytes
+    :return:
+    """
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    """
+    Offsets of consecutive blocks with given lengths, CSR style
+    :param lengths: List[int] Lengths of blocks
+    :return: np.ndarray of len(lengths) + 1 offsets
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _concatenate(blocks: List[Any], dtype) -> np.ndarray:
+    """
+    Concatenate blocks of values into one flat array
+    :param blocks: List[Any] Sequences of values
+    :param dtype: Type of result array
+    :return:
+    """
+    blocks = [np.asarray(block, dtype=dtype).ravel() for block in blocks]
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=dtype)
+
+
+def _graph_sections(graph: ContactionTransportGraph) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Flat arrays of all graph structures
+    :param graph: ContactionTransportGraph Contracted graph
+    :return: (sections, metadata)
+    """
+    nodes = sorted(graph.nodes)
+    sections = {'nodes': np.array(nodes, dtype=np.int64),
+                'hierarchy': np.array([graph.hierarchy.get(node, -1) for node in nodes], dtype=np.int64)}
+
+    out = [list(graph.graph.get(node, {}).items()) for node in nodes]
+    edges = [f for node_out in out for _, f in node_out]
+    edge_ids = {(node, next_node): i
+                for i, (node, next_node) in enumerate((node, next_node) for node, node_out in zip(nodes, out)
+                                                      for next_node, _ in node_out)}
+    sections['out_offsets'] = _offsets([len(node_out) for node_out in out])
+    sections['out_targets'] = np.array([next_node for node_out in out for next_node, _ in node_out], dtype=np.int64)
+    sections['walk'] = np.array([f.walk.w if f.walk else -1 for f in edges], dtype=np.int32)
+    sections['walk_payload'] = np.array([f.walk.payload if f.walk else 0 for f in edges], dtype=np.int32)
+    sections['connection_offsets'] = _offsets([f.size for f in edges])
+    for column in ['d', 'a', 'p']:
+        sections[column] = _concatenate([getattr(f, column) for f in edges], np.int32)
+
+    in_nodes = [list(graph.in_nodes.get(node, {})) for node in nodes]
+    sections['in_offsets'] = _offsets([len(previous_nodes) for previous_nodes in in_nodes])
+    sections['in_sources'] = np.array([previous_node for previous_nodes in in_nodes
+                                       for previous_node in previous_nodes], dtype=np.int64)
+    sections['in_edges'] = np.array([edge_ids[(previous_node, node)] for node, previous_nodes in zip(nodes, in_nodes)
+                                     for previous_node in previous_nodes], dtype=np.int64)
+
+    for column in ['middle', 'first', 'second']:
+        sections[column] = np.frombuffer(getattr(graph.unpacking, column), dtype=np.int32)
+
+    metadata = {'time_origin': int(graph.time_origin),
+                'route_names': graph.unpacking.route_names,
+                'geometrical_containers': bool(graph.geometrical_containers),
+                'ttn': bool(graph.position_in_edge),
+                'fractional_cascading': bool(graph.m_arr_fractional)}
+
+    if metadata['geometrical_containers']:
+        # intervals are stored as int32 starts and ends, bitsets as bytes, base of the bitset or -1 for intervals
+        containers = [graph.geometrical_containers[node] for node in nodes]
+        numbers = containers[0].numbers if containers else {}
+        sections['container_numbers'] = np.array([numbers.get(node, -1) for node in nodes], dtype=np.int32)
+        sections['container_bases'] = np.array([container.base if isinstance(container, BitsetContainer) else -1
+                                                for container in containers], dtype=np.int32)
+        data = [container.bits.to_bytes(container.nbytes(), 'little') if isinstance(container, BitsetContainer)
+                else (container.starts + container.ends).tobytes() for container in containers]
+        sections['container_offsets'] = _offsets([len(container) for container in data])
+        sections['container_data'] = np.frombuffer(b''.join(data), dtype=np.uint8)
+
+    if metadata['ttn']:
+        schedules = [graph.nodes_schedule.get(node, []) for node in nodes]
+        sections['schedule_offsets'] = _offsets([len(schedule) for schedule in schedules])
+        sections['schedule'] = _concatenate(schedules, np.int32)
+        # columns of TTN matrices are in order of out-going edges, as in the file
+        positions = [graph.position_in_edge.get(node, []) for node in nodes]
+        sections['position_offsets'] = _offsets([len(matrix) for matrix in positions])
+        sections['positions'] = _concatenate(positions, np.int32)
+
+    if metadata['fractional_cascading']:
+        m_arr = [graph.m_arr_fractional.get(node, []) for node in nodes]
+        levels = [level for node_m_arr in m_arr for level in node_m_arr]
+        sections['cascade_offsets'] = _offsets([len(node_m_arr) for node_m_arr in m_arr])
+        sections['level_offsets'] = _offsets([len(level) for level in levels])
+        sections['m_arr'] = _concatenate(levels, np.int64)
+        sections['cascade_pointers'] = _concatenate([level for node in nodes for level in graph.pointers.get(node, [])],
+                                                    np.int32)
+        sections['reachable_nodes'] = _concatenate([graph.reachable_nodes.get(node, []) for node in nodes], np.int64)
+        walking_nodes = [graph.walking_nodes.get(node, []) for node in nodes]
+        sections['walking_offsets'] = _offsets([len(node_walking) for node_walking in walking_nodes])
+        sections['walking_nodes'] = _concatenate(walking_nodes, np.int64)
+
+    return sections, metadata
+
+
+def build_parameters(precompute: bool = True, **kwargs) -> Dict[str, Any]:
+    """
+    Parameters of load_or_build, which change the stored graph, in the form of the file header.
+    Defaults of TransportGraph.contraction_hierarchy are filled in, ordering is described by its class and attributes.
+    Count of processes is not kept, as it does not change, which queries the graph supports
+    :param precompute: bool Calculate geometrical containers, TTN and fractional cascading indexes
+    :param kwargs: Parameters of TransportGraph.contraction_hierarchy
+    :return:
+    """
+    arguments = inspect.signature(TransportGraph.contraction_hierarchy).bind(None, **kwargs)
+    arguments.apply_defaults()
+    parameters = {'precompute': precompute}
+    for name, value in arguments.arguments.items():
+        if name in ('self', 'processes'):
+            continue
+        if isinstance(value, Ordering):
+            value = dict(vars(value), name=type(value).__name__)
+        parameters[name] = value
+    # the same form as read back from the json header
+    return json.loads(json.dumps(parameters))
+
+
+def save_graph(graph: ContactionTransportGraph, path: str, checksum: str = '', build: Dict[str, Any] = None):
+    """
+    Save contracted graph into the binary file.
+    File starts with magic bytes, format version and length of json header, which describes flat array sections.
+    Sections are aligned, so they could be used straight from the memory map
+    :param graph: ContactionTransportGraph Contracted graph
+    :param path: str Path to the file
+    :param checksum: str Checksum of input files (source_checksum)
+    :param build: Dict[str, Any] Parameters, with which the graph was built (build_parameters)
+    :return:
+    """
+    sections, metadata = _graph_sections(graph)
+    layout = {}
+    offset = 0
+    for name, values in sections.items():
+        layout[name] = [offset, values.dtype.str, len(values)]
+        offset += _aligned(values.nbytes)
+    header = json.dumps(dict(metadata, version=VERSION, checksum=checksum, build=build, sections=layout)).encode()
+    data_start = _aligned(_PREFIX.size + len(header))
+
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, values in sections.items():
+            f.seek(data_start + layout[name][0])
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(temporary_path, path)
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """
+    Read json header of the graph file.
+    ValueError is raised for files of other format and for truncated files
+    :param path: str Path to the file
+    :return:
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f'{path} is truncated')
+        magic, version, length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a contracted graph file')
+        if version != VERSION:
+            raise ValueError(f'{path} has format version {version}, expected {VERSION}')
+        data = f.read(length)
+        if len(data) < length:
+            raise ValueError(f'{path} is truncated')
+        header = json.loads(data)
+        header['data_start'] = _aligned(_PREFIX.size + length)
+        end = max((offset + _aligned(np.dtype(dtype).itemsize * size)
+                   for offset, dtype, size in header['sections'].values()), default=0)
+        if os.fstat(f.fileno()).st_size < header['data_start'] + end:
+            raise ValueError(f'{path} is truncated')
+    return header
+
+
+def load_graph(path: str, checksum: str = None) -> ContactionTransportGraph:
+    """
+    Open contracted graph file through memory map.
+    Only node ids, hierarchy and unpacking table are read at once, edges, containers and TTN/fractional cascading
+    indexes are decoded per node on the first access. Pages of the file are shared between processes.
+    Old fractional cascading indexes (fractional_cascading_precomputation_old) are not stored
+    :param path: str Path to the file
+    :param checksum: str Expected checksum of input files, ValueError is raised for the stale file
+    :return:
+    """
+    header = read_header(path)
+    if checksum is not None and header['checksum'] != checksum:
+        raise ValueError(f'{path} was built from different input files')
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def section(name: str) -> np.ndarray:
+        offset, dtype, length = header['sections'][name]
+        return np.frombuffer(buffer, dtype=dtype, count=length, offset=header['data_start'] + offset)
+
+    nodes = section('nodes').tolist()
+    index = {node: i for i, node in enumerate(nodes)}
+
+    unpacking = UnpackingTable()
+    # empty arrays are shared by int_array, table gets its own ones as queries could append rows to it
+    unpacking.middle, unpacking.first, unpacking.second = (int_array(section(column)) or array('i')
+                                                           for column in ['middle', 'first', 'second'])
+    unpacking.route_names = header['route_names']
+    unpacking.route_payloads = {route_name: ~i for i, route_name in enumerate(unpacking.route_names)}
+
+    graph = ContactionTransportGraph({}, {}, set(), header['time_origin'])
+    graph.unpacking = unpacking
+    graph.nodes = set(nodes)
+    graph.hierarchy = {node: rank for node, rank in zip(nodes, section('hierarchy').tolist()) if rank >= 0}
+
+    out_offsets, out_targets = section('out_offsets'), section('out_targets')
+    walk, walk_payload, connection_offsets = section('walk'), section('walk_payload'), section('connection_offsets')
+    d, a, p = section('d'), section('a'), section('p')
+    edges = {}
+
+    def edge(e: int) -> ATF:
+        f = edges.get(e)
+        if f is None:
+            start, end = connection_offsets[e], connection_offsets[e + 1]
+            f = edges[e] = ATF(walk=Walk(w=int(walk[e]), payload=int(walk_payload[e])) if walk[e] >= 0 else None,
+                               d=d[start:end], a=a[start:end], p=p[start:end])
+        return f
+
+    def out_edges(i: int) -> Dict[int, ATF]:
+        start, end = out_offsets[i], out_offsets[i + 1]
+        return {next_node: edge(e) for e, next_node in enumerate(out_targets[start:end].tolist(), start)}
+
+    in_offsets, in_sources, in_edges = section('in_offsets'), section('in_sources'), section('in_edges')
+
+    def in_going_edges(i: int) -> Dict[int, ATF]:
+        start, end = in_offsets[i], in_offsets[i + 1]
+        return {previous_node: edge(e) for previous_node, e in zip(in_sources[start:end].tolist(),
+                                                                   in_edges[start:end].tolist())}
+
+    graph.graph = LazyNodes(index, out_edges, dict)
+    graph.in_nodes = LazyNodes(index, in_going_edges, dict)
+
+    if header['geometrical_containers']:
+        numbers = {node: number for node, number in zip(nodes, section('container_numbers').tolist()) if number >= 0}
+        container_bases, container_offsets = section('container_bases'), section('container_offsets')
+        container_data = section('container_data')
+
+        def container(i: int) -> Container:
+            data = container_data[container_offsets[i]:container_offsets[i + 1]].tobytes()
+            if container_bases[i] >= 0:
+                return BitsetContainer(numbers, int(container_bases[i]), int.from_bytes(data, 'little'))
+            bounds = array('i', data)
+            return IntervalContainer(numbers, bounds[:len(bounds) // 2], bounds[len(bounds) // 2:])
+
+        graph.geometrical_containers = LazyNodes(index, container)
+
+    if header['ttn']:
+        schedule_offsets, schedule = section('schedule_offsets'), section('schedule')
+        position_offsets, positions = section('position_offsets'), section('positions')
+
+        graph.nodes_schedule = LazyNodes(
+            index, lambda i: int_array(schedule[schedule_offsets[i]:schedule_offsets[i + 1]]), list)
+        graph.position_in_edge = LazyNodes(
+            index, lambda i: int_array(positions[position_offsets[i]:position_offsets[i + 1]]), dict)
+
+    if header['fractional_cascading']:
+        cascade_offsets, level_offsets = section('cascade_offsets'), section('level_offsets')
+        m_arr, cascade_pointers = section('m_arr'), section('cascade_pointers')
+        reachable_nodes = section('reachable_nodes')
+        walking_offsets, walking_nodes = section('walking_offsets'), section('walking_nodes')
+
+        def levels(i: int) -> range:
+            return range(cascade_offsets[i], cascade_offsets[i + 1])
+
+        graph.m_arr_fractional = LazyNodes(
+            index, lambda i: [array('q', m_arr[level_offsets[level]:level_offsets[level + 1]].tobytes())
+                              for level in levels(i)])
+        graph.pointers = LazyNodes(
+            index, lambda i: [int_array(cascade_pointers[2 * level_offsets[level]:2 * level_offsets[level + 1]])
+                              for level in levels(i)])
+        graph.reachable_nodes = LazyNodes(
+            index, lambda i: reachable_nodes[cascade_offsets[i]:cascade_offsets[i + 1]].tolist())
+        graph.walking_nodes = LazyNodes(
+            index, lambda i: walking_nodes[walking_offsets[i]:walking_offsets[i + 1]].tolist())
+    return graph
+
+
+def load_or_build(path: str, transport_path: str, walk_path: str, precompute: bool = True, **kwargs
+                  ) -> ContactionTransportGraph:
+    """
+    Load contracted graph from the file, if it was built from the same input files with the same parameters.
+    Otherwise build it again with all precomputations for Forward Search and save into the file
+    :param path: str Path to the contracted graph file
+    :param transport_path: str Path to network_temporal_day.csv
+    :param walk_path: str Path to network_walk.csv
+    :param precompute: bool Calculate geometrical containers, TTN and fractional cascading indexes
+    :param kwargs: Parameters of TransportGraph.contraction_hierarchy
+    :return:
+    """
+    checksum = source_checksum(transport_path, walk_path)
+    build = build_parameters(precompute, **kwargs)
+    if os.path.exists(path):
+        try:
+            header = read_header(path)
+            if header['checksum'] == checksum and header.get('build') == build:
+                return load_graph(path)
+        except ValueError as error:
+            logging.warning(f'{error}, graph will be rebuilt')
+    logging.info(f'Build contracted graph {path}')
+    graph = TransportGraph.from_csv(transport_path, walk_path).contraction_hierarchy(**kwargs)
+    if precompute:
+        graph.geometrical_container()
+        graph.optimize_binary_search()
+        graph.fractional_cascading_precomputation()
+    save_graph(graph, path, checksum, build)
+    return graph
@@ -0,0 +1,82 @@
+import os
+import random
+import sys
+
+import pytest
+
+# modules of contraction_hierarchy import each other by plain names, as when run from its folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'kuopio')
+# one hour of the Kuopio feed keeps contraction of the whole network within seconds
+WINDOW = (7 * 3600, 8 * 3600)
+QUERIES = 30
+
+
+@pytest.fixture(scope='session')
+def kuopio():
+    """
+    Connections of the Kuopio feed departing in WINDOW after the start of the service day
+    and symmetric walk connections, as in Run_pathfinding.ipynb
+    :return: (transport connections, walk connections, time origin)
+    """
+    pd = pytest.importorskip('pandas')
+    from graph import SECONDS_IN_DAY
+
+    transport_connections = pd.read_csv(os.path.join(DATA, 'network_temporal_day.csv'), sep=';')
+    time_origin = int(transport_connections['dep_time_ut'].min()) // SECONDS_IN_DAY * SECONDS_IN_DAY
+    departure = transport_connections['dep_time_ut'] - time_origin
+    transport_connections = transport_connections[(departure >= WINDOW[0]) & (departure < WINDOW[1])]
+    walk_connections = pd.read_csv(os.path.join(DATA, 'network_walk.csv'), sep=';')
+    walk_connections_invert = walk_connections.rename(columns={'from_stop_I': 'to_stop_I',
+                                                               'to_stop_I': 'from_stop_I'})
+    return transport_connections, pd.concat((walk_connections, walk_connections_invert)), time_origin
+
+
+@pytest.fixture(scope='session')
+def tg(kuopio):
+    from graph import TransportGraph
+
+    graph = TransportGraph(*kuopio[:2])
+    graph.optimize_binary_search()
+    graph.fractional_cascading_precomputation()
+    return graph
+
+
+@pytest.fixture(scope='session')
+def ch_tg(tg):
+    graph = tg.contraction_hierarchy()
+    graph.geometrical_container()
+    graph.optimize_binary_search()
+    graph.fractional_cascading_precomputation()
+    return graph
+
+
+@pytest.fixture(scope='session')
+def timetable(kuopio):
+    from timetable import Timetable
+
+    return Timetable(*kuopio[:2])
+
+
+@pytest.fixture(scope='session')
+def queries(kuopio, tg):
+    """
+    Random (source, target, start time in unix) queries with start times in the first half of WINDOW
+    """
+    time_origin = kuopio[2]
+    generator = random.Random(0)
+    nodes = sorted(tg.nodes)
+    return [(*generator.sample(nodes, 2), time_origin + generator.randint(WINDOW[0], (WINDOW[0] + WINDOW[1]) // 2))
+            for _ in range(QUERIES)]
+
+
+@pytest.fixture(scope='session')
+def expected(tg, queries):
+    """
+    Arrivals of Dijkstra over the original graph for every query
+    """
+    from dijkstra import Dijkstra
+
+    return [Dijkstra(tg, start_time, source, target).shortest_path(optimized_binary_search=False)['arrival']
+            for source, target, start_time in queries]
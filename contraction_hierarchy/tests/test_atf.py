@@ -0,0 +1,78 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from atf import ATF, cut_mask, min_atf  # noqa: E402
+from trip import Walk  # noqa: E402
+from unpacking import UnpackingTable  # noqa: E402
+
+TIMES = range(-100, 700)
+
+
+def columns(f):
+    return list(f.d), list(f.a), f.walk and f.walk.w
+
+
+@pytest.fixture
+def table():
+    return UnpackingTable()
+
+
+def test_composition(table):
+    first, second = table.route('1'), table.route('2')
+    f = ATF(walk=Walk(100), d=[0, 200], a=[50, 260], p=[first, first])
+    g = ATF(walk=Walk(300), d=[60, 100, 400], a=[120, 150, 500], p=[second] * 3)
+    h = g.composition(f, 5, table)
+    assert columns(h) == ([0, 300], [120, 500], 400)
+    assert table.unpack(h.p[0], 4, 6) == ([4, 5, 6], ['1', '2'])
+    assert table.unpack(h.p[1], 4, 6) == ([4, 5, 6], ['walk', '2'])
+    assert table.unpack(h.walk.payload, 4, 6) == ([4, 5, 6], ['walk', 'walk'])
+    for t in TIMES:
+        assert h.arrival(t)[0] == g.arrival(f.arrival(t)[0])[0]
+
+
+def test_composition_without_walk(table):
+    f = ATF(d=[0, 100, 150], a=[50, 120, 300], p=[table.route('1')] * 3)
+    g = ATF(d=[40, 60, 130, 200], a=[70, 90, 140, 350], p=[table.route('2')] * 4)
+    h = g.composition(f, 5, table)
+    assert columns(h) == ([0, 100], [90, 140], None)
+    for t in TIMES:
+        assert h.arrival(t)[0] == g.arrival(f.arrival(t)[0])[0]
+
+
+def test_composition_not_connected(table):
+    f = ATF(d=[100], a=[150], p=[table.route('1')])
+    g = ATF(d=[120], a=[130], p=[table.route('2')])
+    assert g.composition(f, 5, table) is None
+    assert len(table) == 0
+
+
+def test_cut(table):
+    bus = table.route('1')
+    d, a = [0, 0, 10, 20, 30, 40], [50, 40, 200, 60, 90, 200]
+    f = ATF(walk=Walk(100), d=d, a=a, p=[bus] * 6)
+    f.cut()
+    assert columns(f) == ([0, 20, 30], [40, 60, 90], 100)
+    for t in TIMES:
+        assert f.arrival(t)[0] == min([t + 100] + [arrival for departure, arrival in zip(d, a) if departure >= t])
+
+
+def test_cut_mask_of_many_edges():
+    d = np.array([0, 0, 10, 20, 5, 15, 15])
+    a = np.array([50, 40, 30, 60, 100, 90, 80])
+    mask = cut_mask(d, a, np.array([100, 100, 100, 100, 70, 70, 70]), edges=np.array([0, 0, 0, 0, 1, 1, 1]))
+    assert mask.tolist() == [False, False, True, True, False, False, True]
+    assert mask[:4].tolist() == cut_mask(d[:4], a[:4], 100).tolist()
+    assert mask[4:].tolist() == cut_mask(d[4:], a[4:], 70).tolist()
+
+
+def test_min_atf(table):
+    first, second = table.route('1'), table.route('2')
+    f1 = ATF(walk=Walk(300), d=[0, 50], a=[100, 120], p=[first] * 2)
+    f2 = ATF(walk=Walk(200), d=[10, 60], a=[90, 200], p=[second] * 2)
+    h = min_atf(f1, f2)
+    assert columns(h) == ([10, 50, 60], [90, 120, 200], 200)
+    assert list(h.p) == [second, first, second]
+    for t in TIMES:
+        assert h.arrival(t)[0] == min(f1.arrival(t)[0], f2.arrival(t)[0])
+    assert columns(min_atf(f1, ATF())) == columns(f1)
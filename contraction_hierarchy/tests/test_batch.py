@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from batch import QUERY_COLUMNS, batch_shortest_paths  # noqa: E402
+from storage import save_graph  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def rows(queries):
+    return [(start_time, source, target) for source, target, start_time in queries]
+
+
+def arrivals(results):
+    return [result['arrival'] for result in results]
+
+
+@pytest.mark.parametrize('algorithm', ['fch', 'tch'])
+@pytest.mark.parametrize('processes', [0, 2])
+def test_batch(ch_tg, rows, expected, algorithm, processes):
+    results = batch_shortest_paths(ch_tg, rows, algorithm, processes=processes, chunksize=7)
+    assert arrivals(results) == expected
+
+
+def test_batch_dijkstra_data_frame(tg, rows, expected):
+    queries = pd.DataFrame(rows, columns=QUERY_COLUMNS)
+    assert arrivals(batch_shortest_paths(tg, queries, 'dijkstra', processes=0)) == expected
+
+
+def test_batch_graph_file(ch_tg, rows, expected, tmp_path):
+    path = str(tmp_path / 'graph.bin')
+    save_graph(ch_tg, path)
+    assert arrivals(batch_shortest_paths(path, rows, 'fch', processes=2, chunksize=7)) == expected
+
+
+def test_batch_invalid_queries(ch_tg, rows):
+    with pytest.raises(ValueError):
+        list(batch_shortest_paths(ch_tg, pd.DataFrame(rows, columns=['start_time', 'source', 'target'])))
+    with pytest.raises(ValueError):
+        list(batch_shortest_paths(ch_tg, [row[1:] for row in rows]))
+    with pytest.raises(ValueError):
+        list(batch_shortest_paths(ch_tg, rows, 'raptor'))
+    assert list(batch_shortest_paths(ch_tg, [], processes=0)) == []
@@ -0,0 +1,18 @@
+import math
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from bidirectional_search import TCH  # noqa: E402
+
+
+@pytest.mark.parametrize('queue', ['heapq', 'radix'])
+def test_tch(ch_tg, queries, expected, queue):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        result = TCH(ch_tg, start_time, source, target, queue=queue).shortest_path()
+        assert result['arrival'] == arrival
+        if arrival != math.inf:
+            assert result['path'][0] == source and result['path'][-1] == target
+            assert len(result['routes']) == len(result['path']) - 1
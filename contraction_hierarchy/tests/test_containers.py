@@ -0,0 +1,70 @@
+import pytest
+
+from containers import BitsetContainer, IntervalContainer, compact_container, geometrical_containers
+
+# lower neighbours of every node of a small downward graph and its nodes from the highest one
+DOWN = {1: [2, 3], 2: [4, 5], 3: [5, 6], 4: [7], 5: [7, 8], 6: [8], 9: [6, 10]}
+ORDER = [1, 9, 2, 3, 4, 5, 6, 10, 7, 8]
+
+
+def reachable(down, node):
+    """
+    Nodes reachable from the node by down moves, including the node itself
+    """
+    nodes = {node}
+    stack = [node]
+    while stack:
+        for child in down.get(stack.pop(), ()):
+            if child not in nodes:
+                nodes.add(child)
+                stack.append(child)
+    return nodes
+
+
+def down_graph(graph):
+    return {node: [neighbour for neighbour in out if graph.hierarchy[neighbour] < graph.hierarchy[node]]
+            for node, out in graph.graph.items()}
+
+
+def test_compact_container():
+    numbers = {node: node for node in range(200)}
+    # one interval of 100 numbers is smaller than their bitset
+    container = compact_container(numbers, ((1 << 100) - 1) << 3)
+    assert isinstance(container, IntervalContainer)
+    assert container.post_order() == list(range(3, 103))
+    assert 3 in container and 102 in container and 2 not in container and 103 not in container
+    container = compact_container(numbers, 0b10101010100)
+    assert isinstance(container, BitsetContainer)
+    assert container.post_order() == [2, 4, 6, 8, 10]
+    assert 4 in container and 5 not in container and 150 not in container and -1 not in container
+
+
+def test_geometrical_containers():
+    containers = geometrical_containers(DOWN, ORDER)
+    for node in ORDER:
+        assert {other for other in ORDER if other in containers[node]} == reachable(DOWN, node)
+
+
+def test_contracted_graph_containers(ch_tg):
+    pytest.importorskip('pandas')
+    down = down_graph(ch_tg)
+    for node in ch_tg.nodes:
+        nodes = reachable(down, node)
+        assert len(ch_tg.geometrical_containers[node].post_order()) == len(nodes)
+        assert all(other in ch_tg.geometrical_containers[node] for other in nodes)
+
+
+def test_parallel_containers(ch_tg):
+    pytest.importorskip('pandas')
+    order = sorted(ch_tg.nodes, key=lambda node: (ch_tg.hierarchy[node], node), reverse=True)
+    down = down_graph(ch_tg)
+    serial = geometrical_containers(down, order)
+    parallel = geometrical_containers(down, order, processes=2)
+    assert parallel.keys() == serial.keys()
+    for node, container in serial.items():
+        assert type(parallel[node]) is type(container)
+        assert parallel[node].post_order() == container.post_order()
+        assert parallel[node].numbers == container.numbers
+    small = geometrical_containers(DOWN, ORDER, processes=2)
+    for node in ORDER:
+        assert {other for other in ORDER if other in small[node]} == reachable(DOWN, node)
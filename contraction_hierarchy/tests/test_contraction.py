@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from forward_search import FCH  # noqa: E402
+from ordering import ORDERINGS, Ordering  # noqa: E402
+
+
+def fch_arrivals(graph, queries):
+    graph.geometrical_container()
+    return [FCH(graph, start_time, source, target).shortest_path(optimized_binary_search=False)['arrival']
+            for source, target, start_time in queries]
+
+
+def test_serial_contraction(ch_tg, queries, expected):
+    assert [FCH(ch_tg, start_time, source, target).shortest_path()['arrival']
+            for source, target, start_time in queries] == expected
+
+
+def test_parallel_contraction(tg, queries, expected):
+    assert fch_arrivals(tg.contraction_hierarchy(processes=2), queries) == expected
+
+
+def test_witness_contraction(tg, queries, expected):
+    assert fch_arrivals(tg.contraction_hierarchy(witness_search=True), queries) == expected
+
+
+@pytest.mark.parametrize('name', sorted(ORDERINGS))
+@pytest.mark.parametrize('lazy', [True, False])
+def test_ordering_contraction(tg, queries, expected, name, lazy):
+    assert fch_arrivals(tg.contraction_hierarchy(ordering=ORDERINGS[name](lazy=lazy)), queries) == expected
+
+
+def test_ordering_is_abstract():
+    with pytest.raises(TypeError):
+        Ordering()
@@ -0,0 +1,29 @@
+import math
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from csa import CSA  # noqa: E402
+from dijkstra import Dijkstra  # noqa: E402
+
+
+def test_csa(timetable, queries, expected):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        result = CSA(timetable, start_time, source, target).shortest_path()
+        assert result['arrival'] == arrival
+        if arrival != math.inf:
+            assert result['path'][0] == source and result['path'][-1] == target
+            assert len(result['routes']) == len(result['path']) - 1
+
+
+def test_earliest_arrivals(timetable, tg, queries):
+    targets = [target for _, target, _ in queries]
+    for source, _, start_time in queries[:5]:
+        arrivals = CSA(timetable, start_time, source).earliest_arrivals()
+        assert arrivals[source] == start_time
+        for target in targets:
+            if target != source:
+                arrival = Dijkstra(tg, start_time, source, target).shortest_path(optimized_binary_search=False)
+                assert arrivals.get(target, math.inf) == arrival['arrival']
@@ -0,0 +1,31 @@
+from bisect import bisect_left
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from dijkstra import Dijkstra  # noqa: E402
+from forward_search import FCH  # noqa: E402
+
+
+@pytest.mark.parametrize('graph_name', ['tg', 'ch_tg'])
+def test_positions(request, graph_name):
+    graph = request.getfixturevalue(graph_name)
+    for node, out in graph.graph.items():
+        assert {next_node for next_node, f in out.items() if f.size} == set(graph.reachable_nodes[node])
+        assert {next_node for next_node, f in out.items() if not f.size} == set(graph.walking_nodes[node])
+        departures = sorted({t for f in out.values() for t in f.d})
+        for t in {0, 10 ** 6} | {t + shift for t in departures for shift in (-1, 0, 1)}:
+            assert graph.get_positions_fractional_cascading(t, node) == {
+                next_node: bisect_left(out[next_node].d, t) for next_node in graph.reachable_nodes[node]}
+
+
+def test_fractional_cascading_queries(tg, ch_tg, queries, expected):
+    ch_tg.fractional_cascading_precomputation_old()
+    for (source, target, start_time), arrival in zip(queries, expected):
+        assert Dijkstra(tg, start_time, source, target).shortest_path(fractional_cascading=True)['arrival'] == arrival
+        for fractional_cascading, fractional_cascading_old in [(True, False), (False, True)]:
+            assert FCH(ch_tg, start_time, source, target).shortest_path(
+                fractional_cascading=fractional_cascading,
+                fractional_cascading_old=fractional_cascading_old)['arrival'] == arrival
@@ -0,0 +1,28 @@
+import math
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from dijkstra import Dijkstra  # noqa: E402
+from forward_search import FCH  # noqa: E402
+
+
+@pytest.mark.parametrize('queue', ['heapq', 'radix'])
+def test_goal_directed(tg, ch_tg, queries, expected, queue):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        assert Dijkstra(tg, start_time, source, target, queue=queue, goal_directed=True).shortest_path(
+            optimized_binary_search=False)['arrival'] == arrival
+        assert FCH(ch_tg, start_time, source, target, queue=queue, goal_directed=True).shortest_path(
+            optimized_binary_search=False)['arrival'] == arrival
+
+
+def test_potentials(tg, queries, expected):
+    tg.landmarks_precomputation()
+    for (source, target, start_time), arrival in zip(queries, expected):
+        potentials = tg.landmarks.potentials(target)
+        assert potentials[target] == 0
+        assert potentials[source] <= arrival - start_time
+        if arrival != math.inf:
+            assert isinstance(potentials[source], int)
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from dijkstra import Dijkstra  # noqa: E402
+from profile_search import ProfileSearch  # noqa: E402
+
+WINDOW = 1200
+
+
+def test_profile(ch_tg, tg, queries):
+    table_size = len(ch_tg.unpacking)
+    for source, target, start_time in queries[:10]:
+        result = ProfileSearch(ch_tg, start_time, start_time + WINDOW, source, target).profile()
+        assert len(ch_tg.unpacking) == table_size
+        for t in range(start_time, start_time + WINDOW + 1, WINDOW // 4):
+            arrival = Dijkstra(tg, t, source, target).shortest_path(optimized_binary_search=False)['arrival']
+            assert result['profile'].arrival(t - ch_tg.time_origin)[0] + ch_tg.time_origin == arrival
+        for journey in result['journeys']:
+            assert journey['path'][0] == source and journey['path'][-1] == target
+            if journey['departure'] <= start_time + WINDOW:
+                assert journey['arrival'] == Dijkstra(tg, journey['departure'], source, target).shortest_path(
+                    optimized_binary_search=False)['arrival']
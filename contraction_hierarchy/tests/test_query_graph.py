@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from dijkstra import Dijkstra  # noqa: E402
+from forward_search import FCH  # noqa: E402
+from query_graph import Router  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def query_graph(tg):
+    return tg.query_graph()
+
+
+@pytest.fixture(scope='module')
+def ch_query_graph(ch_tg):
+    return ch_tg.query_graph()
+
+
+def test_compiled_edges(tg, ch_tg, query_graph, ch_query_graph):
+    for graph, compiled in [(tg, query_graph), (ch_tg, ch_query_graph)]:
+        assert len(compiled) == len(graph.nodes)
+        for node in graph.nodes:
+            assert compiled.edges(node) == graph.graph.get(node, {})
+    hierarchy = [ch_tg.hierarchy[node] for node in ch_query_graph.nodes]
+    assert hierarchy == sorted(hierarchy)
+
+
+def test_compiled_corridor(ch_tg, ch_query_graph, queries):
+    for _, target, _ in queries:
+        corridor = ch_query_graph.corridor(ch_query_graph.index[target])
+        assert {node for node, flag in zip(ch_query_graph.nodes, corridor) if flag} == {
+            node for node in ch_tg.nodes if node == target or target in ch_tg.geometrical_containers.get(node, ())}
+
+
+@pytest.mark.parametrize('queue', ['heapq', 'radix'])
+def test_compiled_queries(query_graph, ch_query_graph, queries, expected, queue):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        result = Dijkstra(query_graph, start_time, source, target, queue=queue).shortest_path()
+        assert result['arrival'] == arrival
+        if arrival != math.inf:
+            assert result['path'][0] == source and result['path'][-1] == target
+        for geometrical_containers in [True, False]:
+            assert FCH(ch_query_graph, start_time, source, target, queue=queue).shortest_path(
+                geometrical_containers=geometrical_containers)['arrival'] == arrival
+
+
+@pytest.mark.parametrize('goal_directed', [False, True])
+def test_router(query_graph, ch_query_graph, queries, expected, goal_directed):
+    routers = [Router(query_graph, goal_directed=goal_directed),
+               Router(ch_query_graph, goal_directed=goal_directed),
+               Router(ch_query_graph, queue='radix', geometrical_containers=False, goal_directed=goal_directed)]
+    for router in routers:
+        results = [router.query(source, target, start_time) for source, target, start_time in queries]
+        assert [result['arrival'] for result in results] == expected
+        # labels of the previous queries are not reset, but they are not valid for the next ones
+        for (source, target, start_time), result in zip(reversed(queries), reversed(results)):
+            assert router.query(source, target, start_time)['path'] == result['path']
+
+
+def test_router_of_graph(tg, queries, expected):
+    router = Router(tg)
+    assert [router.query(source, target, start_time)['arrival'] for source, target, start_time in queries] == expected
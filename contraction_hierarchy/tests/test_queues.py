@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from dijkstra import Dijkstra  # noqa: E402
+from forward_search import FCH  # noqa: E402
+from graph import TransportGraph  # noqa: E402
+from queues import priority_queue  # noqa: E402
+
+START = 1481529300
+
+
+@pytest.fixture(scope='module')
+def tg():
+    transport_connections = pd.DataFrame({'from_stop_I': [1, 1, 2, 2, 3],
+                                          'to_stop_I': [2, 2, 3, 4, 4],
+                                          'dep_time_ut': [START, START + 600, START + 120, START + 900, START + 400],
+                                          'arr_time_ut': [START + 60, START + 660, START + 300, START + 1000,
+                                                          START + 500],
+                                          'route_I': [7, 7, 8, 9, 8]})
+    walk_connections = pd.DataFrame({'from_stop_I': [1, 4], 'to_stop_I': [4, 1], 'd_walk': [3000, 3000]})
+    return TransportGraph(transport_connections, walk_connections)
+
+
+@pytest.mark.parametrize('name', ['heapdict', 'heapq', 'indexed', 'radix'])
+def test_numpy_priorities(name):
+    queue = priority_queue(name, {'a': np.int64(5)})
+    queue['b'] = np.int64(3)
+    queue['c'] = np.int32(9)
+    assert [queue.popitem() for _ in range(3)] == [('b', 3), ('a', 5), ('c', 9)]
+
+
+def test_radix_rejects_float_priorities():
+    queue = priority_queue('radix')
+    with pytest.raises(ValueError):
+        queue['a'] = 1.5
+
+
+def test_numpy_start_time(tg):
+    ch_tg = tg.contraction_hierarchy()
+    ch_tg.geometrical_container()
+    for start_time in [START, START + 200]:
+        expected = Dijkstra(tg, start_time, 1, 4).shortest_path(optimized_binary_search=False)
+        assert expected['path']
+        for queue in ['heapq', 'radix']:
+            path = Dijkstra(tg, np.int64(start_time), 1, 4, queue=queue).shortest_path(optimized_binary_search=False)
+            assert path['arrival'] == expected['arrival']
+            path = FCH(ch_tg, np.int64(start_time), 1, 4, queue=queue).shortest_path(optimized_binary_search=False)
+            assert path['arrival'] == expected['arrival']
@@ -0,0 +1,36 @@
+import math
+from itertools import groupby
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from raptor import Raptor  # noqa: E402
+
+
+def trips(routes):
+    """
+    Count of runs of transport routes in the journey, which is not greater than count of its trips
+    """
+    return sum(1 for route, _ in groupby(routes) if route != 'walk')
+
+
+def test_raptor(timetable, queries, expected):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        result = Raptor(timetable, start_time, source, target).shortest_path()
+        assert result['arrival'] == arrival
+        if arrival != math.inf:
+            assert result['path'][0] == source and result['path'][-1] == target
+            assert len(result['routes']) == len(result['path']) - 1
+
+
+def test_max_rounds(timetable, queries, expected):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        arrivals = []
+        for max_rounds in range(1, 8):
+            result = Raptor(timetable, start_time, source, target, max_rounds=max_rounds).shortest_path()
+            assert trips(result['routes']) <= max_rounds
+            arrivals.append(result['arrival'])
+        assert arrivals == sorted(arrivals, reverse=True)
+        assert arrivals[-1] == arrival
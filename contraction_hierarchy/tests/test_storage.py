@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from bidirectional_search import TCH  # noqa: E402
+from forward_search import FCH  # noqa: E402
+from ordering import ComplexityOrdering  # noqa: E402
+from storage import build_parameters, load_graph, load_or_build, read_header, save_graph  # noqa: E402
+
+MODES = [{'optimized_binary_search': False},
+         {'optimized_binary_search': True},
+         {'optimized_binary_search': True, 'fractional_cascading': True}]
+
+
+@pytest.fixture
+def csv_paths(kuopio, tmp_path):
+    transport_path = tmp_path / 'network_temporal_day.csv'
+    walk_path = tmp_path / 'network_walk.csv'
+    transport_connections, walk_connections, _ = kuopio
+    transport_connections.to_csv(transport_path, sep=';', index=False)
+    # from_csv adds inverted walk connections itself
+    walk_connections.iloc[:len(walk_connections) // 2].to_csv(walk_path, sep=';', index=False)
+    return str(transport_path), str(walk_path)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_round_trip(ch_tg, queries, expected, tmp_path, mode):
+    path = str(tmp_path / 'graph.bin')
+    save_graph(ch_tg, path, 'checksum')
+    graph = load_graph(path, 'checksum')
+    assert graph.hierarchy == ch_tg.hierarchy
+    assert [FCH(graph, start_time, source, target).shortest_path(**mode)['arrival']
+            for source, target, start_time in queries] == expected
+    assert [TCH(graph, start_time, source, target).shortest_path()['arrival']
+            for source, target, start_time in queries] == expected
+    with pytest.raises(ValueError):
+        load_graph(path, 'other checksum')
+
+
+def test_truncated_file(ch_tg, tmp_path):
+    path = str(tmp_path / 'graph.bin')
+    save_graph(ch_tg, path)
+    size = os.path.getsize(path)
+    for length in [4, 100, size - 1]:
+        with open(path, 'r+b') as f:
+            f.truncate(length)
+        with pytest.raises(ValueError):
+            read_header(path)
+
+
+def test_load_or_build(csv_paths, tmp_path, queries, expected):
+    path = str(tmp_path / 'graph.bin')
+    graph = load_or_build(path, *csv_paths)
+    assert read_header(path)['build'] == build_parameters()
+    modified = os.path.getmtime(path)
+    assert [FCH(graph, start_time, source, target).shortest_path()['arrival']
+            for source, target, start_time in queries] == expected
+
+    load_or_build(path, *csv_paths)
+    assert os.path.getmtime(path) == modified
+
+    ordering = ComplexityOrdering(lazy=False)
+    load_or_build(path, *csv_paths, ordering=ordering)
+    assert read_header(path)['build'] == build_parameters(ordering=ordering)
+
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+    graph = load_or_build(path, *csv_paths, ordering=ordering)
+    assert read_header(path)['build'] == build_parameters(ordering=ordering)
+    assert [FCH(graph, start_time, source, target).shortest_path()['arrival']
+            for source, target, start_time in queries] == expected
@@ -0,0 +1,23 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from bidirectional_search import TCH  # noqa: E402
+
+
+def test_travel_time_matrix(ch_tg, queries):
+    sources = [source for source, _, _ in queries[:5]]
+    targets = [target for _, target, _ in queries[5:11]] + sources[:1]
+    departure_times = [start_time for _, _, start_time in queries[:5]]
+    matrix = ch_tg.travel_time_matrix(sources, targets, departure_times)
+    assert matrix.shape == (len(sources), len(targets))
+    for i, (source, start_time) in enumerate(zip(sources, departure_times)):
+        for j, target in enumerate(targets):
+            if source == target:
+                assert matrix[i, j] == start_time
+            else:
+                assert matrix[i, j] == TCH(ch_tg, start_time, source, target).shortest_path()['arrival']
+
+    matrix = ch_tg.travel_time_matrix(sources, targets, departure_times[0])
+    assert np.array_equal(matrix, ch_tg.travel_time_matrix(sources, targets, [departure_times[0]] * len(sources)))
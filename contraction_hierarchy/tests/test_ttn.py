@@ -0,0 +1,30 @@
+from bisect import bisect_left
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from dijkstra import Dijkstra  # noqa: E402
+from forward_search import FCH  # noqa: E402
+
+
+@pytest.mark.parametrize('graph_name', ['tg', 'ch_tg'])
+def test_ttn_index(request, graph_name):
+    graph = request.getfixturevalue(graph_name)
+    for node, out in graph.graph.items():
+        schedule = list(graph.nodes_schedule[node])
+        assert schedule == sorted({t for f in out.values() for t in f.d})
+        positions = graph.position_in_edge[node]
+        assert len(positions) == len(schedule) * len(out)
+        for k, t in enumerate(schedule):
+            assert list(positions[k * len(out):(k + 1) * len(out)]) == [bisect_left(f.d, t) for f in out.values()]
+
+
+@pytest.mark.parametrize('queue', ['heapq', 'radix'])
+def test_ttn_queries(tg, ch_tg, queries, expected, queue):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        assert Dijkstra(tg, start_time, source, target, queue=queue).shortest_path()['arrival'] == arrival
+        for geometrical_containers in [True, False]:
+            assert FCH(ch_tg, start_time, source, target, queue=queue).shortest_path(
+                geometrical_containers=geometrical_containers)['arrival'] == arrival
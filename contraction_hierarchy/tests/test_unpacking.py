@@ -0,0 +1,51 @@
+import math
+from bisect import bisect_left
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from forward_search import FCH  # noqa: E402
+from unpacking import UnpackingTable, WALK  # noqa: E402
+
+
+def replay(tg, path, routes, start_time):
+    """
+    Arrival of the path over the original graph, when the earliest connection of the given route is taken on every edge
+    """
+    t = start_time - tg.time_origin
+    for node, next_node, route in zip(path, path[1:], routes):
+        f = tg.graph[node][next_node]
+        if route == 'walk':
+            t += f.walk.w
+            continue
+        payload = tg.unpacking.route_payloads[route]
+        index = bisect_left(f.d, t)
+        while f.p[index] != payload:
+            index += 1
+        t = f.a[index]
+    return t + tg.time_origin
+
+
+def test_unpack_nested_shortcuts():
+    table = UnpackingTable()
+    bus = table.route('7')
+    first = table.shortcut(2, bus, WALK)
+    second = table.shortcut(3, first, bus)
+    assert table.unpack(second, 1, 4) == ([1, 2, 3, 4], ['7', 'walk', '7'])
+    assert table.unpack_path([1, 4, 5], [second, WALK]) == ([1, 2, 3, 4, 5], ['7', 'walk', '7', 'walk'])
+    table.truncate(first + 1)
+    assert len(table) == 1
+
+
+def test_unpacked_paths(ch_tg, tg, queries, expected):
+    for (source, target, start_time), arrival in zip(queries, expected):
+        result = FCH(ch_tg, start_time, source, target).shortest_path(optimized_binary_search=False)
+        assert result['arrival'] == arrival
+        if arrival == math.inf:
+            continue
+        path, routes = result['path'], result['routes']
+        assert path[0] == source and path[-1] == target
+        assert len(routes) == len(path) - 1
+        assert replay(tg, path, routes, start_time) == arrival
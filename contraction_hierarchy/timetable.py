@@ -0,0 +1,249 @@
+from array import array
+from collections import defaultdict
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from atf import int_array
+from graph import SECONDS_IN_DAY, WALK_COLUMNS
+
+TIMETABLE_COLUMNS = ['from_stop_I', 'to_stop_I', 'dep_time_ut', 'arr_time_ut', 'route_I', 'trip_I', 'seq']
+
+
+class Pattern:
+    __slots__ = 'route_name', 'stops', 'departures', 'arrivals'
+
+    def __init__(self, route_name: str, stops: array, departures: List[array], arrivals: List[array]):
+        """
+        Route pattern: trips of one route over the same sequence of stops, which never overtake each other
+        :param route_name: str Name of the route
+        :param stops: array Dense indexes of stops of the pattern
+        :param departures: List[array] Departure times of trips, sorted, for every position of the stop
+        :param arrivals: List[array] Arrival times of trips for every position of the stop
+        """
+        self.route_name = route_name
+        self.stops = stops
+        self.departures = departures
+        self.arrivals = arrivals
+
+
+class Connections:
+    __slots__ = ('from_stops', 'to_stops', 'departures', 'arrivals', 'trips', 'routes', 'trip_order', 'positions',
+                 'trip_count')
+
+    def __init__(self, from_stops: np.ndarray, to_stops: np.ndarray, departures: np.ndarray, arrivals: np.ndarray,
+                 trips: np.ndarray, routes: np.ndarray, trip_order: np.ndarray, positions: np.ndarray,
+                 trip_count: int):
+        """
+        Connections as columns sorted by departure for the connection scan
+        :param from_stops: np.ndarray Dense indexes of departure stops
+        :param to_stops: np.ndarray Dense indexes of arrival stops
+        :param departures: np.ndarray Departure times, sorted
+        :param arrivals: np.ndarray Arrival times
+        :param trips: np.ndarray Dense indexes of trips, trip is split as for patterns
+        :param routes: np.ndarray route_I of connections
+        :param trip_order: np.ndarray Indexes of connections sorted by trip and sequence
+        :param positions: np.ndarray Position of every connection in trip_order
+        :param trip_count: int Count of trips
+        """
+        self.from_stops = from_stops
+        self.to_stops = to_stops
+        self.departures = departures
+        self.arrivals = arrivals
+        self.trips = trips
+        self.routes = routes
+        self.trip_order = trip_order
+        self.positions = positions
+        self.trip_count = trip_count
+
+    def __len__(self) -> int:
+        return len(self.departures)
+
+
+def _split_overtaking(trips: List[Tuple[Tuple[int, ...], Tuple[int, ...]]]
+                      ) -> List[List[Tuple[Tuple[int, ...], Tuple[int, ...]]]]:
+    """
+    Split trips of the same stops into groups without overtaking: every trip of the group departs
+    and arrives not earlier than the previous one at every stop
+    :param trips: [(departures, arrivals)] Times of trips at every stop
+    :return: Groups of trips sorted by departures
+    """
+    groups = []
+    for departures, arrivals in sorted(trips):
+        for group in groups:
+            last_departures, last_arrivals = group[-1]
+            if (all(x <= y for x, y in zip(last_departures, departures))
+                    and all(x <= y for x, y in zip(last_arrivals, arrivals))):
+                group.append((departures, arrivals))
+                break
+        else:
+            groups.append([(departures, arrivals)])
+    return groups
+
+
+def _order_zero_durations(from_stop: np.ndarray, to_stop: np.ndarray, departures: np.ndarray,
+                          arrivals: np.ndarray) -> np.ndarray:
+    """
+    Order of connections by departure for the connection scan. Connections of zero duration go first
+    among connections with the same departure and are ordered topologically by stops:
+    connection to the stop is scanned before connections from it, though they belong to different trips
+    :param from_stop: np.ndarray Departure stops
+    :param to_stop: np.ndarray Arrival stops
+    :param departures: np.ndarray Departure times
+    :param arrivals: np.ndarray Arrival times
+    :return: np.ndarray Indexes of connections
+    """
+    order = np.lexsort((arrivals, departures))
+    zero = departures[order] == arrivals[order]
+    # runs of zero duration connections with the same departure
+    breaks = np.flatnonzero(~zero[1:] | ~zero[:-1] | (departures[order][1:] != departures[order][:-1])) + 1
+    for start, end in zip(np.concatenate(([0], breaks)).tolist(), np.concatenate((breaks, [len(order)])).tolist()):
+        if end - start < 2 or not zero[start]:
+            continue
+        run = order[start:end].tolist()
+        incoming = defaultdict(list)
+        for connection in run:
+            incoming[int(to_stop[connection])].append(connection)
+        topological = []
+        visited = set()
+        for root in run:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(incoming[int(from_stop[root])]))]
+            while stack:
+                connection, previous = stack[-1]
+                for previous_connection in previous:
+                    if previous_connection not in visited:
+                        visited.add(previous_connection)
+                        stack.append((previous_connection, iter(incoming[int(from_stop[previous_connection])])))
+                        break
+                else:
+                    stack.pop()
+                    topological.append(connection)
+        order[start:end] = topological
+    return order
+
+
+class Timetable:
+    def __init__(self, transport_connections: pd.DataFrame, walk_connections: pd.DataFrame):
+        """
+        Timetable of the raw connection data for engines without preprocessing.
+        Stops are renumbered to dense indexes. Consecutive connections of the trip form the sequence of stops,
+        trips with the same route and sequence of stops form route patterns, see Pattern.
+        The same connections are kept as columns sorted by departure, see Connections.
+        Times are stored relative to the start of the service day (time_origin) as in TransportGraph.
+        Walk connections are footpaths, zero walks are skipped as in TransportGraph
+        :param transport_connections: pd.DataFrame. File format related to network_temporal_day.csv
+        :param walk_connections: pd.DataFrame File format related to network_walk.csv
+        """
+        self._build(*[transport_connections[column].to_numpy() for column in TIMETABLE_COLUMNS], walk_connections)
+
+    @classmethod
+    def from_csv(cls,
+                 transport_path: str,
+                 walk_path: str,
+                 sep: str = ';',
+                 chunksize: int = 100000,
+                 symmetric_walk: bool = True) -> 'Timetable':
+        """
+        Build timetable straight from the csv files, the same as TransportGraph.from_csv
+        :param transport_path: str Path to network_temporal_day.csv
+        :param walk_path: str Path to network_walk.csv
+        :param sep: str Separator used in csv files
+        :param chunksize: int Count of rows in one chunk of connections file
+        :param symmetric_walk: bool Add inverted walk connections, as walk network is stored in one direction
+        :return:
+        """
+        columns = {column: [] for column in TIMETABLE_COLUMNS}
+        for chunk in pd.read_csv(transport_path, sep=sep, usecols=TIMETABLE_COLUMNS, chunksize=chunksize):
+            for column in TIMETABLE_COLUMNS:
+                columns[column].append(chunk[column].to_numpy())
+        arrays = [np.concatenate(columns[column]) if columns[column] else np.array([], dtype=np.int64)
+                  for column in TIMETABLE_COLUMNS]
+
+        walk_connections = pd.read_csv(walk_path, sep=sep, usecols=WALK_COLUMNS)
+        if symmetric_walk:
+            walk_connections_invert = walk_connections.rename(columns={'from_stop_I': 'to_stop_I',
+                                                                       'to_stop_I': 'from_stop_I'})
+            walk_connections = pd.concat((walk_connections, walk_connections_invert))
+
+        timetable = cls.__new__(cls)
+        timetable._build(*arrays, walk_connections)
+        return timetable
+
+    def _build(self,
+               from_stop: np.ndarray,
+               to_stop: np.ndarray,
+               dep_time: np.ndarray,
+               arr_time: np.ndarray,
+               route: np.ndarray,
+               trip: np.ndarray,
+               seq: np.ndarray,
+               walk_connections: pd.DataFrame):
+        """
+        Build stops, route patterns, connections and footpaths from columns of connections
+        :return:
+        """
+        self.time_origin = int(dep_time.min()) // SECONDS_IN_DAY * SECONDS_IN_DAY if len(dep_time) else 0
+        walk_durations = walk_connections.set_index(['from_stop_I', 'to_stop_I'])['d_walk'].to_dict()
+
+        self.stops = np.unique(np.concatenate((from_stop, to_stop, walk_connections['from_stop_I'].to_numpy(),
+                                               walk_connections['to_stop_I'].to_numpy()))).tolist()
+        self.index = {stop: i for i, stop in enumerate(self.stops)}
+        index = self.index
+
+        self.footpaths = [[] for _ in self.stops]
+        for (stop, next_stop), walk_duration in walk_durations.items():
+            if walk_duration:
+                self.footpaths[index[stop]].append((index[next_stop], int(walk_duration)))
+
+        order = np.lexsort((seq, trip))
+        sorted_stops = np.array(self.stops)
+        from_stop = np.searchsorted(sorted_stops, from_stop[order]).astype(np.int32)
+        to_stop = np.searchsorted(sorted_stops, to_stop[order]).astype(np.int32)
+        dep_time = (dep_time[order] - self.time_origin).astype(np.int32)
+        arr_time = (arr_time[order] - self.time_origin).astype(np.int32)
+        route = route[order]
+        trip = trip[order]
+        # trip is split, where the next connection does not start at the end of the previous one
+        starts = np.flatnonzero((trip[1:] != trip[:-1]) | (to_stop[:-1] != from_stop[1:])) + 1
+        starts = np.concatenate(([0], starts, [len(order)])) if len(order) else np.zeros(1, dtype=np.int64)
+
+        by_departure = _order_zero_durations(from_stop, to_stop, dep_time, arr_time)
+        trip_order = np.empty(len(order), dtype=np.int32)
+        trip_order[by_departure] = np.arange(len(order), dtype=np.int32)
+        connection_trips = np.repeat(np.arange(len(starts) - 1, dtype=np.int32), np.diff(starts))
+        self.connections = Connections(from_stop[by_departure], to_stop[by_departure], dep_time[by_departure],
+                                       arr_time[by_departure], connection_trips[by_departure], route[by_departure],
+                                       trip_order, by_departure.astype(np.int32), len(starts) - 1)
+
+        from_stop = from_stop.tolist()
+        to_stop = to_stop.tolist()
+        dep_time = dep_time.tolist()
+        arr_time = arr_time.tolist()
+        route = route.tolist()
+
+        trips = defaultdict(list)
+        for start, end in zip(starts[:-1].tolist(), starts[1:].tolist()):
+            stops = (from_stop[start],) + tuple(to_stop[start:end])
+            # departure from the last stop and arrival to the first one are never used
+            departures = tuple(dep_time[start:end]) + (arr_time[end - 1],)
+            arrivals = (dep_time[start],) + tuple(arr_time[start:end])
+            trips[(route[start], stops)].append((departures, arrivals))
+
+        self.patterns = []
+        self.stop_patterns = [[] for _ in self.stops]
+        for (route_name, stops), route_trips in trips.items():
+            for group in _split_overtaking(route_trips):
+                departures = np.array([departures for departures, _ in group], dtype=np.int32)
+                arrivals = np.array([arrivals for _, arrivals in group], dtype=np.int32)
+                for position, stop in enumerate(stops):
+                    self.stop_patterns[stop].append((len(self.patterns), position))
+                self.patterns.append(Pattern(str(route_name), array('i', stops),
+                                             [int_array(column) for column in departures.T],
+                                             [int_array(column) for column in arrivals.T]))
+
+    def __len__(self) -> int:
+        return len(self.stops)
@@ -1,51 +1,14 @@
-from typing import Tuple, List
-from functools import total_ordering
-
-
-@total_ordering
-class Bus:
-
-    def __init__(self, nodes: List[int], route_names: List[str], c: Tuple[int, int]):
-        """
-        Bus profile for transportation between the nodes
-        :param nodes: [start_node, end_node]
-        :param route_names: Names of public transport, which we use for transferring
-        :param c: (departure_time, arrival_time)
-        """
-
-        self.nodes = nodes
-        self.d, self.a = c
-        self.route_names = route_names
-
-    def __lt__(self, other):
-        """
-        Lower means that one bus has smaller departure_time
-        :param other:
-        :return:
-        """
-        return self.d < other.d
-
-    def __eq__(self, other):
-        """
-        Equality means that 2 busses have the same start_time
-        :param other:
-        :return:
-        """
-        return self.d == other.d
+from unpacking import WALK
 
 
 class Walk:
 
-    def __init__(self, nodes: List[int], w: int):
+    def __init__(self, w: int, payload: int = WALK):
         """
         Walk profile between nodes
-        :param nodes: [start_node, end_node]
         :param w: duration in seconds for walk between stations
+        :param payload: Payload of the walk in UnpackingTable, by default walk between adjacent nodes
         """
 
-        self.nodes = nodes
         self.w = w
-        self.route_names = ['walk'] * (len(nodes) - 1)
-
-
-
+        self.payload = payload
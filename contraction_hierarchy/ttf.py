@@ -1,5 +1,4 @@
 from bisect import bisect_left
-from typing import List
 import math
 from functools import total_ordering
 
@@ -9,24 +8,22 @@ from atf import ATF
 @total_ordering
 class Transportation:
 
-    def __init__(self, nodes: List[int], route_names: List[str], k: int, b: int, d: int):
+    def __init__(self, payload: int, k: int, b: int, d: int):
         """
         Class responsible to different ways of transportation from node1 to node2
         Global formula looks in the next way:
                         travel_time = k * start_time + b
 
-        :param nodes: [start_node, end_node] of transportation
-        :param route_names: Names of sequence of public transport or "walk" in case of walking, which we need to use
-                            for transferring from start_node to end_node
+        :param payload: Payload of transportation in UnpackingTable, route or walk, which we need to use
+                        for transferring from start_node to end_node
         :param k: k in formula for calculation travel_time
         :param b: b in formula for calculation travel_time
         :param d: Departure time of the sector for which we use calculation formula
         """
-        self.nodes = nodes
+        self.payload = payload
         self.k = k
         self.b = b
         self.d = d
-        self.route_names = route_names
 
     def travel_time(self, t: int) -> int:
         """
@@ -44,53 +41,48 @@ class Transportation:
         return self.d == other.d
 
 
-def populate_transports(buses, walk):
+def populate_transports(atf: ATF):
     d = 0
+    walk = atf.walk
     transports = []
 
-    for i, bus in enumerate(buses):
+    for bus_d, bus_a, payload in zip(atf.d, atf.a, atf.p):
         if walk:
-            if d < bus.a - walk.w:
-                d = bus.a - walk.w
-                transports.append(Transportation(nodes=walk.nodes,
-                                                 route_names=walk.route_names,
+            if d < bus_a - walk.w:
+                d = bus_a - walk.w
+                transports.append(Transportation(payload=walk.payload,
                                                  k=0,
                                                  b=walk.w,
                                                  d=d
                                                  ))
-                d = bus.d
-                transports.append(Transportation(nodes=bus.nodes,
-                                                 route_names=bus.route_names,
+                d = bus_d
+                transports.append(Transportation(payload=payload,
                                                  k=-1,
-                                                 b=bus.a,
+                                                 b=bus_a,
                                                  d=d
                                                  ))
             else:
-                d = bus.d
-                transports.append(Transportation(nodes=bus.nodes,
-                                                 route_names=bus.route_names,
+                d = bus_d
+                transports.append(Transportation(payload=payload,
                                                  k=-1,
-                                                 b=bus.a,
+                                                 b=bus_a,
                                                  d=d
                                                  ))
 
         else:
-            transports.append(Transportation(nodes=bus.nodes,
-                                             route_names=bus.route_names,
+            transports.append(Transportation(payload=payload,
                                              k=-1,
-                                             b=bus.a,
-                                             d=bus.d
+                                             b=bus_a,
+                                             d=bus_d
                                              ))
     if walk:
-        transports.append(Transportation(nodes=walk.nodes,
-                                         route_names=walk.route_names,
+        transports.append(Transportation(payload=walk.payload,
                                          k=0,
                                          b=walk.w,
                                          d=math.inf
                                          ))
     else:
-        transports.append(Transportation(nodes=[],
-                                         route_names=[],
+        transports.append(Transportation(payload=None,
                                          k=math.inf,
                                          b=math.inf,
                                          d=math.inf
@@ -107,7 +99,7 @@ class TTF:
         :param atf: ATF : ATF which we would like to convert into TTF
         """
 
-        self.transports = populate_transports(atf.buses, atf.walk)
+        self.transports = populate_transports(atf)
         self.size = len(self.transports)
 
     def arrival(self, t: int):
@@ -120,7 +112,6 @@ class TTF:
 
         start_index = bisect_left(self.transports, t, key=lambda x: x.d, lo=0, hi=self.size)
         l = t + self.transports[start_index].travel_time(t)
-        sequence_nodes = self.transports[start_index].nodes
-        route_names = self.transports[start_index].route_names
+        payload = self.transports[start_index].payload
 
-        return l, sequence_nodes, route_names
+        return l, payload
@@ -0,0 +1,210 @@
+from array import array
+from typing import List, Tuple, Sequence, Union, Dict
+
+import numpy as np
+
+WALK = ~0
+
+
+def follow_parents(label: int, parents: Union[Dict[int, int], List[int]], payloads: Union[Dict[int, int], List[int]],
+                   nodes: Sequence[int] = None) -> Tuple[List[int], List[int]]:
+    """
+    Restore the path of the search from parent pointers, which are kept instead of whole paths of labels
+    :param label: int Label of the last node of the path
+    :param parents: Parent label of every label, None for the label of the source
+    :param payloads: Payload of connection from the parent node for every label
+    :param nodes: Node of every label, if labels are not nodes themselves
+    :return: (roots, payloads of connections between consecutive roots)
+    """
+    labels = []
+    while label is not None:
+        labels.append(label)
+        label = parents[label]
+    labels.reverse()
+    roots = labels if nodes is None else [nodes[label] for label in labels]
+    return roots, [payloads[label] for label in labels[1:]]
+
+
+class UnpackingTable:
+
+    def __init__(self):
+        """
+        Unpacking table of shortcut connections.
+        Every connection in ATF keeps only an integer payload:
+            - negative payload ~i is a connection of an original edge by route route_names[i],
+              WALK = ~0 is walking between adjacent nodes
+            - non-negative payload k is a shortcut over the node middle[k],
+              composed of connections with payloads first[k] and second[k]
+        Full path and route names are restored recursively only for the found shortest path
+        """
+        self.middle = array('i')
+        self.first = array('i')
+        self.second = array('i')
+        self.route_names = ['walk']
+        self.route_payloads = {'walk': WALK}
+
+    def __len__(self) -> int:
+        return len(self.middle)
+
+    def copy(self) -> 'UnpackingTable':
+        """
+        Copy of the table, which could be extended independently
+        :return:
+        """
+        table = UnpackingTable()
+        table.middle = array('i', self.middle)
+        table.first = array('i', self.first)
+        table.second = array('i', self.second)
+        table.route_names = list(self.route_names)
+        table.route_payloads = dict(self.route_payloads)
+        return table
+
+    def extend(self, table: 'UnpackingTable') -> int:
+        """
+        Append rows of another table, built in worker process over the same route payloads.
+        Rows of the appended table get ids shifted by the returned offset
+        :param table: UnpackingTable Table with new shortcut rows
+        :return: Offset of appended rows
+        """
+        offset = len(self)
+        self.middle.extend(table.middle)
+        self.first.extend(table.first)
+        self.second.extend(table.second)
+        return offset
+
+    def compact(self, payloads: np.ndarray) -> np.ndarray:
+        """
+        Drop shortcut rows, which could not be reached from given payloads.
+        Rows are renumbered keeping their order, children always have smaller ids than their shortcut
+        :param payloads: np.ndarray Payloads of all connections still used in the graph
+        :return: np.ndarray New id for each old row id, -1 for dropped rows
+        """
+        middle = np.frombuffer(self.middle, dtype=np.int32)
+        first = np.frombuffer(self.first, dtype=np.int32)
+        second = np.frombuffer(self.second, dtype=np.int32)
+        # boolean masks of rows instead of sorted id arrays keep temporary memory small for big tables
+        marked = np.zeros(len(middle), dtype=bool)
+        marked[payloads[payloads >= 0]] = True
+        frontier = marked.copy()
+        while True:
+            children = np.concatenate((first[frontier], second[frontier]))
+            frontier[:] = False
+            frontier[children[children >= 0]] = True
+            del children
+            frontier &= ~marked
+            if not frontier.any():
+                break
+            marked |= frontier
+        del frontier
+
+        remap = np.cumsum(marked, dtype=np.int32)
+        remap -= 1
+        remap[~marked] = -1
+        size = int(marked.sum())
+        # rows are moved in place and arrays are truncated, so old and new tables are not kept together
+        middle[:size] = middle[marked]
+        first[:size] = self.remap(first[marked], remap)
+        second[:size] = self.remap(second[marked], remap)
+        del middle, first, second, marked
+        del self.middle[size:], self.first[size:], self.second[size:]
+        return remap
+
+    @staticmethod
+    def remap(payloads: np.ndarray, remap: np.ndarray) -> np.ndarray:
+        """
+        Apply renumbering of shortcut rows to payloads, route payloads stay the same
+        :param payloads: np.ndarray Payloads
+        :param remap: np.ndarray New id for each old row id
+        :return:
+        """
+        return np.where(payloads >= 0, remap[np.maximum(payloads, 0)], payloads)
+
+    def route(self, route_name: str) -> int:
+        """
+        Payload of connection of an original edge by the route
+        :param route_name: str Name of public transport route
+        :return:
+        """
+        payload = self.route_payloads.get(route_name)
+        if payload is None:
+            payload = self.route_payloads[route_name] = ~len(self.route_names)
+            self.route_names.append(route_name)
+        return payload
+
+    def shortcut(self, middle: int, first: int, second: int) -> int:
+        """
+        Add shortcut connection: connection with payload first to the node middle
+        and then connection with payload second from it
+        :param middle: int Contracted node
+        :param first: int Payload of connection to the middle node
+        :param second: int Payload of connection from the middle node
+        :return: Payload of shortcut connection
+        """
+        self.middle.append(middle)
+        self.first.append(first)
+        self.second.append(second)
+        return len(self.middle) - 1
+
+    def shortcuts(self, middle: int, first: List[int], second: List[int]) -> range:
+        """
+        Add shortcut connections over the same node, as shortcut() for every pair of payloads
+        :param middle: int Contracted node
+        :param first: List[int] Payloads of connections to the middle node
+        :param second: List[int] Payloads of connections from the middle node
+        :return: Payloads of shortcut connections
+        """
+        start = len(self.middle)
+        self.middle.extend([middle] * len(first))
+        self.first.extend(first)
+        self.second.extend(second)
+        return range(start, len(self.middle))
+
+    def truncate(self, size: int):
+        """
+        Drop rows added after the table had given size, e.g. temporary shortcuts of a query
+        :param size: int Count of rows to keep
+        :return:
+        """
+        del self.middle[size:], self.first[size:], self.second[size:]
+
+    def unpack(self, payload: int, node1: int, node2: int) -> Tuple[List[int], List[str]]:
+        """
+        Restore sequence of nodes and route names of connection between node1 and node2
+        :param payload: int Payload of connection
+        :param node1: int Start node of connection
+        :param node2: int End node of connection
+        :return:
+        """
+        nodes = [node1]
+        route_names = []
+        self._unpack(payload, node2, nodes, route_names)
+        return nodes, route_names
+
+    def unpack_path(self, roots: List[int], payloads: List[int]) -> Tuple[List[int], List[str]]:
+        """
+        Restore sequence of nodes and route names of the path over the graph
+        :param roots: List[int] Nodes of the graph visited by the path
+        :param payloads: List[int] Payloads of connections between consecutive roots
+        :return:
+        """
+        nodes = roots[:1]
+        route_names = []
+        for payload, node in zip(payloads, roots[1:]):
+            self._unpack(payload, node, nodes, route_names)
+        return nodes, route_names
+
+    def _unpack(self, payload: int, node: int, nodes: List[int], route_names: List[str]):
+        """
+        Unpack connection, which ends in node, appending its nodes after the start node to nodes.
+        Explicit stack is used, as shortcuts could be nested deeper than the recursion limit
+        :return:
+        """
+        stack = [(payload, node)]
+        while stack:
+            payload, node = stack.pop()
+            if payload < 0:
+                nodes.append(node)
+                route_names.append(self.route_names[~payload])
+            else:
+                stack.append((self.second[payload], node))
+                stack.append((self.first[payload], self.middle[payload]))
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from typing import Dict, Set, List, Tuple
+import math
+
+from atf import ATF
+
+
+def witness_paths(graph: Dict[int, Dict[int, ATF]], source: int, excluded: Set[int], targets: Dict[int, ATF]
+                  ) -> Dict[int, List[Tuple[ATF, ...]]]:
+    """
+    Bounded witness search: paths from source to targets with at most 2 edges,
+    which do not go through excluded (contracted) nodes
+    :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+    :param source: int Start node of witness paths
+    :param excluded: Set[int] Nodes, which could not be used by witness paths
+    :param targets: Dict[int, ATF] Out-going edges of contracted node, keys are targets of witness paths
+    :return: Dict[int, List[Tuple[ATF, ...]]] Functions of edges of each witness path for each target
+    """
+    paths = defaultdict(list)
+    for node, f in graph[source].items():
+        if node == source or node in excluded:
+            continue
+        if node in targets:
+            paths[node].append((f,))
+        out = graph.get(node, {})
+        for next_node in (targets if len(targets) < len(out) else out):
+            if next_node != source and next_node in targets and next_node in out:
+                paths[next_node].append((f, out[next_node]))
+    return paths
+
+
+def _path_arrival(path: Tuple[ATF, ...], t: int) -> int:
+    """
+    Arrival time over the path of edges
+    :param path: Tuple[ATF, ...] Functions of path edges
+    :param t: int Departure time
+    :return:
+    """
+    for f in path:
+        t = f.arrival(t)[0]
+        if t == math.inf:
+            break
+    return t
+
+
+def _path_walk(path: Tuple[ATF, ...]) -> int:
+    """
+    Duration of walking over the whole path
+    :param path: Tuple[ATF, ...] Functions of path edges
+    :return:
+    """
+    if all(f.walk for f in path):
+        return sum(f.walk.w for f in path)
+    return math.inf
+
+
+def witnessed(paths: List[Tuple[ATF, ...]], f: ATF) -> bool:
+    """
+    Check that shortcut function f is dominated by the witness paths.
+    Witness profile is min of FIFO functions, so it is enough to compare it in departures of f connections
+    and to compare the shortest walk over witness paths with walk of f
+    :param paths: List[Tuple[ATF, ...]] Witness paths between the ends of shortcut
+    :param f: ATF Shortcut function
+    :return:
+    """
+    if not paths:
+        return False
+    if f.walk and min(_path_walk(path) for path in paths) > f.walk.w:
+        return False
+    for d, a in zip(f.d, f.a):
+        if all(_path_arrival(path, d) > a for path in paths):
+            return False
+    return True
+
+
+def witness_subgraph(graph: Dict[int, Dict[int, ATF]], sources: Dict[int, ATF], excluded: Set[int],
+                     targets: Dict[int, ATF]) -> Dict[int, Dict[int, ATF]]:
+    """
+    Part of the graph, which could be visited by witness_paths from sources.
+    Used to send witness search into worker process of parallel contraction
+    :param graph: Dict[int, Dict[int, ATF]] Out-going edges of not contracted part of the graph
+    :param sources: Dict[int, ATF] In-going edges of contracted node, keys are sources of witness paths
+    :param excluded: Set[int] Nodes, which could not be used by witness paths
+    :param targets: Dict[int, ATF] Out-going edges of contracted node, keys are targets of witness paths
+    :return:
+    """
+    subgraph = {}
+    for source in sources:
+        subgraph[source] = {node: f for node, f in graph[source].items() if node not in excluded}
+    for source in sources:
+        for node in subgraph[source]:
+            if node not in subgraph:
+                subgraph[node] = {next_node: graph[node][next_node] for next_node in targets
+                                  if next_node in graph[node]}
+    return subgraph